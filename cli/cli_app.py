@@ -1,21 +1,255 @@
 import argparse
 from model import raster_handler
+from model.catalog import RasterCatalog, DEFAULT_CATALOG_PATH
+from model import stacking
+from model import pipeline
+from model import patches
+from model.reproject import ReprojectOptions, RESAMPLING_METHODS
+from model.packing import PackingOptions, PACKED_DTYPES
+from model.chunkstore import ChunkStoreOptions, CHUNK_COMPRESSORS, DEFAULT_CHUNK_SIZE
+from model.governor import set_memory_budget
+from model.parallel import BACKENDS
+from model.checkpoint import CHECKPOINT_INTERVAL
+from model.result_cache import ResultCache, DEFAULT_RESULT_CACHE_DIR, DEFAULT_RESULT_CACHE_SIZE
+from model.gdal_env import GDAL_CONFIG_ENV, DEFAULT_CONFIG_PATH, set_config_path, set_env_overrides, parse_env_options
+from model.windowing import DEFAULT_MEMORY_BUDGET, MEMORY_BUDGET_ENV
 import os
 import sys
-from exceptions import CLIError, ValidationError, FileOperationError, RasterHandlerError
+from exceptions import CLIError, ValidationError, FileOperationError, RasterHandlerError, CatalogError
+
+def run_index(args):
+    """Crawls the given directories into the catalog and prints a summary"""
+    with RasterCatalog(args.catalog) as catalog:
+        result = catalog.scan(args.index, workers=args.workers)
+
+    print(f"Catalog: {args.catalog}")
+    print(f"Files found: {result['found']}")
+    print(f"Indexed: {result['indexed']}  Unchanged: {result['unchanged']}  Removed: {result['removed']}")
+    for error in result['errors']:
+        print(f"Warning: {error}")
+
+def run_stack(args):
+    """Stacks bands from several aligned inputs into the output file"""
+    if not args.output:
+        raise ValidationError("Please specify output file with --output")
+
+    inputs = [stacking.parse_stack_input(spec) for spec in args.stack]
+    memory_budget = int(args.memory_budget * 1024 * 1024)
+
+    try:
+        band_names = stacking.stack_rasters(inputs, args.output, memory_budget=memory_budget)
+    except RasterHandlerError as e:
+        raise CLIError(f"Error stacking rasters: {e}")
+
+    print("Stacked bands:")
+    for idx, name in enumerate(band_names):
+        print(f"{idx+1}: {name}")
+    print(f"File exported successfully: {args.output}")
+
+def run_query(args):
+    """Queries the catalog and returns the matching files"""
+    if not os.path.exists(args.catalog):
+        raise FileOperationError(f"Catalog not found: {args.catalog}. Use --index to create it.")
+
+    with RasterCatalog(args.catalog) as catalog:
+        matches = catalog.query(
+            band_name=args.find_band,
+            crs=args.find_crs,
+            resolution=args.find_res,
+            dtype=args.find_dtype
+        )
+
+    print(f"Catalog matches: {len(matches)}")
+    for match in matches:
+        bands = ", ".join(f"{idx}: {name}" for idx, name in match['bands'])
+        print(f"{match['path']} [{match['crs']}, {match['res_x']:g} x {match['res_y']:g}] -> {bands}")
+    return matches
+
+def packing_options(args):
+    """Builds the output data type conversion from --dtype/--scale/--offset/--out-nodata (None without --dtype)"""
+    if not args.dtype:
+        if args.scale or args.offset or args.out_nodata is not None:
+            raise ValidationError("--scale, --offset and --out-nodata require --dtype")
+        return None
+    try:
+        return PackingOptions(args.dtype, scale=args.scale, offset=args.offset, nodata=args.out_nodata)
+    except RasterHandlerError as e:
+        raise ValidationError(str(e))
+
+def run_patches(args, selected_indices):
+    """Cuts the selected bands into patches and writes their manifest"""
+    if args.dst_crs or args.resolution:
+        raise ValidationError("--patches can't be combined with --dst-crs/--resolution; reproject first")
+    packing = packing_options(args)
+
+    def show_progress(done, total):
+        print(f"\rRows of patches: {done}/{total}", end='', flush=True)
+
+    try:
+        manifest = patches.extract_patches(
+            args.input, selected_indices, args.patches,
+            size=args.patch_size, overlap=args.patch_overlap, fmt=args.patch_format,
+            min_valid=args.min_valid, window=args.window, bbox=args.bbox, packing=packing,
+            pad_edges=args.pad_edges, memory_budget=int(args.memory_budget * 1024 * 1024),
+            backend=args.backend or 'thread', workers=args.workers, progress_callback=show_progress
+        )
+    except RasterHandlerError as e:
+        print()
+        raise CLIError(f"Error extracting patches: {e}")
+    print()
+    print(f"Patches written: {manifest['count']} of {manifest['candidates']} "
+          f"({manifest['candidates'] - manifest['count']} below {args.min_valid:.0%} valid pixels)")
+    print(f"Manifest: {os.path.join(args.patches, patches.MANIFEST_NAME)}")
+    return manifest
+
+def _megabytes(size):
+    return f"{size / (1024 * 1024):.1f} MB"
+
+def run_pipeline_spec(args):
+    """Runs (or, with --dry-run, plans) a declarative pipeline spec"""
+    try:
+        spec = pipeline.load_pipeline_spec(args.pipeline)
+        if args.input:
+            spec['input'] = args.input
+        if args.output:
+            spec['output'] = args.output
+        if 'memory_budget' not in spec:
+            spec['memory_budget'] = args.memory_budget
+        if args.autotune:
+            spec['autotune'] = True
+        if args.backend:
+            spec['backend'] = args.backend
+        if args.workers:
+            spec['workers'] = args.workers
+        job = pipeline.Pipeline(spec)
+        plan = pipeline.plan_pipeline(job)
+    except RasterHandlerError as e:
+        raise ValidationError(f"Invalid pipeline: {e}")
+
+    print(f"Pipeline: {args.pipeline}")
+    for step, description in enumerate(plan['stages'], start=1):
+        print(f"  {step}. {description}")
+    print(f"Output: {plan['output'] or '-'} ({plan['width']} x {plan['height']}, "
+          f"{plan['bands_written']} band(s), {plan['dtype']})")
+    print(f"Windows: {plan['windows']} of up to {plan['rows_per_window']} rows, "
+          f"{plan['workers']} {plan['backend']} worker(s)")
+    print(f"Estimated read: {_megabytes(plan['bytes_read'])} decoded ({plan['interleave'] or 'unknown'} interleave)")
+    print(f"Estimated write: {_megabytes(plan['bytes_written'])} uncompressed, no intermediate files")
+    print(f"Estimated peak memory: {_megabytes(plan['peak_memory'])}")
+    print("GDAL environment: " + ", ".join(f"{key}={value}" for key, value in sorted(plan['gdal_env'].items())))
+
+    if args.dry_run:
+        return plan
+
+    if not job.output:
+        raise ValidationError("Please specify output file with --output or in the pipeline spec")
+    try:
+        band_names = pipeline.run_pipeline(job)
+    except RasterHandlerError as e:
+        raise CLIError(f"Error running pipeline: {e}")
+    print("Written bands:")
+    for idx, name in enumerate(band_names):
+        print(f"{idx+1}: {name}")
+    print(f"File exported successfully: {job.output}")
+    return plan
 
 def main(argv=None):
     try:
         parser = argparse.ArgumentParser(
             description="IGCVRasterTool CLI: select and export bands from GeoTIFF rasters"
         )
-        parser.add_argument('--input', '-i', required=True, help="Input GeoTIFF file path")
+        parser.add_argument('--input', '-i', help="Input GeoTIFF file path")
         parser.add_argument('--bands', '-b', nargs='+', type=int, help="Bands to export (1-based, e.g.: 1 3 4). Omit to list bands.")
         parser.add_argument('--output', '-o', help="Output GeoTIFF file path")
         parser.add_argument('--list', action='store_true', help="Only list bands from file")
+        parser.add_argument('--bbox', nargs=4, type=float, metavar=('LEFT', 'BOTTOM', 'RIGHT', 'TOP'), help="Export only this bounding box (in the raster's CRS)")
+        parser.add_argument('--window', nargs=4, type=int, metavar=('COL', 'ROW', 'WIDTH', 'HEIGHT'), help="Export only this pixel window")
+        parser.add_argument('--dst-crs', help="Reproject the output to this CRS (e.g.: EPSG:4326)")
+        parser.add_argument('--resolution', nargs='+', type=float, metavar='RES', help="Output pixel size (one value, or X and Y)")
+        parser.add_argument('--resampling', default='nearest', choices=list(RESAMPLING_METHODS), help="Resampling method used by --dst-crs/--resolution (default: nearest)")
+        parser.add_argument('--warp-threads', type=int, help="Number of warp threads (default: CPU count)")
+        parser.add_argument('--dtype', choices=list(PACKED_DTYPES), help="Output data type; integer types pack values with a scale/offset computed from each band's range (e.g.: uint16)")
+        parser.add_argument('--scale', nargs='+', type=float, help="With --dtype: packing scale, one value or one per band (physical = stored * scale + offset)")
+        parser.add_argument('--offset', nargs='+', type=float, help="With --dtype and --scale: packing offset, one value or one per band")
+        parser.add_argument('--out-nodata', type=float, help="With --dtype: stored NoData value (default: type maximum for unsigned, minimum for signed, NaN for float32)")
+        parser.add_argument('--format', default='gtiff', choices=['gtiff', 'chunks'], help="Output format: GeoTIFF, or a directory of compressed chunks (Zarr v2 layout) for random patch reads (default: gtiff)")
+        parser.add_argument('--chunk-size', type=int, nargs='+', default=[DEFAULT_CHUNK_SIZE], metavar='SIZE', help=f"With --format chunks: chunk rows and columns, one value for square chunks (default: {DEFAULT_CHUNK_SIZE})")
+        parser.add_argument('--chunk-compressor', default='zlib', choices=list(CHUNK_COMPRESSORS), help="With --format chunks: chunk compression (default: zlib)")
+        parser.add_argument('--patches', metavar='DIR', help="Cut the selected bands into fixed-size patches in this directory, with a manifest.json index")
+        parser.add_argument('--patch-size', type=int, default=patches.DEFAULT_PATCH_SIZE, help=f"With --patches: patch size in pixels (default: {patches.DEFAULT_PATCH_SIZE})")
+        parser.add_argument('--patch-overlap', type=int, default=0, help="With --patches: pixels shared by neighbouring patches (default: 0)")
+        parser.add_argument('--patch-format', default='tif', choices=list(patches.PATCH_FORMATS), help="With --patches: one GeoTIFF or PNG per patch, or fixed-size records in one binary file (default: tif)")
+        parser.add_argument('--min-valid', type=float, default=patches.DEFAULT_MIN_VALID, help=f"With --patches: skip patches with a smaller fraction of valid pixels (default: {patches.DEFAULT_MIN_VALID})")
+        parser.add_argument('--pad-edges', action='store_true', help="With --patches: also write the partial patches at the right and bottom edges, padded with NoData")
+        parser.add_argument('--stack', nargs='+', metavar='INPUT[:BANDS]', help="Stack bands from aligned rasters into --output (e.g.: B04.tif B08.tif scene.tif:1,3)")
+        parser.add_argument('--memory-budget', type=float, help=f"Memory budget in MB for streaming operations, shared by concurrent windows (default: {MEMORY_BUDGET_ENV} or 256)")
+        parser.add_argument('--autotune', action='store_true', help="Benchmark window heights on the first rows and reuse the fastest per block layout (export and --pipeline)")
+        parser.add_argument('--gdal-config', nargs='+', metavar='KEY=VALUE', help="GDAL options applied on top of every operation profile (e.g.: GDAL_CACHEMAX=1024 GDAL_NUM_THREADS=4)")
+        parser.add_argument('--gdal-config-file', metavar='JSON', help=f"GDAL profile overrides file (default: {GDAL_CONFIG_ENV} or {DEFAULT_CONFIG_PATH})")
+        parser.add_argument('--no-resume', action='store_true', help="Restart an interrupted export instead of continuing from its checkpoint")
+        parser.add_argument('--checkpoint-interval', type=float, default=CHECKPOINT_INTERVAL, metavar='SECONDS', help=f"Seconds between export checkpoints, 0 to disable (default: {CHECKPOINT_INTERVAL:g})")
+        parser.add_argument('--cache', nargs='?', const=DEFAULT_RESULT_CACHE_DIR, metavar='DIR', help=f"Reuse (copy) the output of an identical earlier export and cache new ones (default directory: {DEFAULT_RESULT_CACHE_DIR})")
+        parser.add_argument('--cache-size', type=float, default=DEFAULT_RESULT_CACHE_SIZE / (1024 * 1024), help=f"With --cache: disk space in MB kept before the least recently used results are evicted (default: {DEFAULT_RESULT_CACHE_SIZE // (1024 * 1024)})")
+        parser.add_argument('--cache-link', action='store_true', help="With --cache: hardlink outputs into and out of the cache instead of copying them (editing an output in place then invalidates its cache entry)")
+        parser.add_argument('--no-stats', action='store_true', help="Do not embed STATISTICS_* tags computed during export")
+        parser.add_argument('--histograms', type=int, nargs='?', const=256, metavar='BINS', help="Also write band histograms (default: 256 bins) to the output .aux.xml")
+        parser.add_argument('--pipeline', metavar='SPEC', help="Run a JSON/YAML pipeline spec (select, reproject, correct, index stages) without intermediate files")
+        parser.add_argument('--dry-run', action='store_true', help="With --pipeline: only validate the spec and print estimated I/O and memory")
+        parser.add_argument('--catalog', default=DEFAULT_CATALOG_PATH, help=f"Catalog database path (default: {DEFAULT_CATALOG_PATH})")
+        parser.add_argument('--index', nargs='+', metavar='DIR', help="Index rasters found in the given directories into the catalog")
+        parser.add_argument('--workers', type=int, help="Number of parallel readers used by --index, or workers of the --pipeline/--patches window kernels")
+        parser.add_argument('--backend', choices=BACKENDS, help="Execution backend of the --pipeline (default: serial) and --patches (default: thread) window kernels")
+        parser.add_argument('--find-band', help="Select input from the catalog by band name (e.g.: B08)")
+        parser.add_argument('--find-crs', help="Select input from the catalog by CRS (e.g.: EPSG:32723)")
+        parser.add_argument('--find-res', type=float, help="Select input from the catalog by pixel size")
+        parser.add_argument('--find-dtype', help="Select input from the catalog by data type (e.g.: uint16)")
 
         args = parser.parse_args(argv)
 
+        # The budget sizes windows and worker counts and caps the windows in flight
+        if args.memory_budget is None:
+            args.memory_budget = DEFAULT_MEMORY_BUDGET / (1024 * 1024)
+        elif args.memory_budget <= 0:
+            raise ValidationError("--memory-budget must be positive")
+        else:
+            set_memory_budget(int(args.memory_budget * 1024 * 1024))
+
+        # GDAL environment profiles: config file, then command line options
+        try:
+            if args.gdal_config_file:
+                set_config_path(args.gdal_config_file)
+            if args.gdal_config:
+                set_env_overrides(parse_env_options(args.gdal_config))
+        except RasterHandlerError as e:
+            raise ValidationError(str(e))
+
+        if args.index:
+            run_index(args)
+            return
+
+        if args.stack:
+            run_stack(args)
+            return
+
+        if args.pipeline:
+            run_pipeline_spec(args)
+            return
+
+        # Select input by catalog query
+        if any([args.find_band, args.find_crs, args.find_res, args.find_dtype]):
+            matches = run_query(args)
+            if args.input or not (args.bands or args.output):
+                return
+            if len(matches) != 1:
+                raise ValidationError(f"The query matched {len(matches)} files. Refine it or use --input.")
+            args.input = matches[0]['path']
+            if args.find_band and not args.bands:
+                args.bands = [idx for idx, _ in matches[0]['bands']]
+            print()
+
+        if not args.input:
+            raise ValidationError("Please specify input file with --input or select it with --find-* options")
+
         # Input file validation
         if not os.path.exists(args.input):
             raise FileOperationError(f"Input file not found: {args.input}")
@@ -46,6 +280,13 @@ def main(argv=None):
             if b < 0 or b >= len(band_names):
                 raise ValidationError(f"Invalid band: {b+1}. Valid bands: 1-{len(band_names)}")
 
+        if args.bbox and args.window:
+            raise ValidationError("Use either --bbox or --window, not both")
+
+        if args.patches:
+            run_patches(args, selected_indices)
+            return
+
         # Output file validation
         if not args.output:
             raise ValidationError("Please specify output file with --output")
@@ -55,17 +296,53 @@ def main(argv=None):
         if output_dir and not os.path.exists(output_dir):
             raise FileOperationError(f"Output directory does not exist: {output_dir}")
 
-        # Read selected bands
-        try:
-            bands, meta, selected_band_names, band_metadata, file_metadata = raster_handler.read_selected_bands(args.input, selected_indices)
-        except RasterHandlerError as e:
-            raise CLIError(f"Error reading selected bands: {e}")
-        except Exception as e:
-            raise CLIError(f"Unexpected error reading bands: {e}")
+        # Optional reprojection/resampling stage
+        reproject = None
+        if args.dst_crs or args.resolution:
+            try:
+                reproject = ReprojectOptions(
+                    dst_crs=args.dst_crs,
+                    resolution=args.resolution,
+                    resampling=args.resampling,
+                    num_threads=args.warp_threads
+                )
+            except RasterHandlerError as e:
+                raise ValidationError(str(e))
+
+        # Optional data type conversion, packing values with scale/offset
+        packing = packing_options(args)
+
+        # Optional chunked array store output instead of a GeoTIFF
+        store = None
+        if args.format == 'chunks':
+            try:
+                store = ChunkStoreOptions(args.chunk_size, compressor=args.chunk_compressor)
+            except RasterHandlerError as e:
+                raise ValidationError(str(e))
+        if args.checkpoint_interval < 0:
+            raise ValidationError("--checkpoint-interval can't be negative")
+        cache = None
+        if args.cache:
+            try:
+                cache = ResultCache(args.cache, int(args.cache_size * 1024 * 1024), link=args.cache_link)
+            except RasterHandlerError as e:
+                raise ValidationError(str(e))
 
-        # Export file
+        # Export selected bands, streaming one strip at a time
         try:
-            raster_handler.export_tif(args.output, bands, meta, selected_band_names, band_metadata, file_metadata)
+            raster_handler.stream_export(
+                args.input, selected_indices, args.output,
+                window=args.window, bbox=args.bbox, reproject=reproject,
+                memory_budget=int(args.memory_budget * 1024 * 1024),
+                compute_statistics=not args.no_stats,
+                histogram_bins=None if args.no_stats else args.histograms,
+                autotune=args.autotune,
+                packing=packing,
+                store=store,
+                resume=not args.no_resume,
+                checkpoint_interval=args.checkpoint_interval or None,
+                cache=cache
+            )
             print(f"File exported successfully: {args.output}")
         except RasterHandlerError as e:
             raise CLIError(f"Error exporting file: {e}")
@@ -78,7 +355,7 @@ def main(argv=None):
     except SystemExit:
         # Re-raise SystemExit to maintain correct exit codes
         raise
-    except (CLIError, ValidationError, FileOperationError, RasterHandlerError) as e:
+    except (CLIError, ValidationError, FileOperationError, RasterHandlerError, CatalogError) as e:
         print(f"Error: {e}")
         sys.exit(1)
     except Exception as e:
@@ -0,0 +1,61 @@
+import threading
+from PyQt5.QtCore import QThread, pyqtSignal
+
+class IteratorWorker(QThread):
+    """
+    Executa um gerador do model em uma thread separada, emitindo cada resultado parcial.
+
+    O gerador é criado por `factory(cancel_event, progress_callback)`, de modo que
+    o model possa interromper o processamento quando a tarefa é cancelada e
+    informar o progresso sem depender do Qt.
+    """
+
+    # Resultado parcial ou final produzido pelo gerador
+    result_ready = pyqtSignal(object)
+    # Progresso (concluído, total)
+    progress = pyqtSignal(int, int)
+    # Mensagem de erro
+    failed = pyqtSignal(str)
+    # Emitido quando o gerador termina sem erro nem cancelamento
+    completed = pyqtSignal()
+
+    def __init__(self, factory, parent=None):
+        super().__init__(parent)
+        self._factory = factory
+        self.cancel_event = threading.Event()
+
+    def run(self):
+        try:
+            for result in self._factory(self.cancel_event, self.progress.emit):
+                if self.cancel_event.is_set():
+                    return
+                self.result_ready.emit(result)
+            if not self.cancel_event.is_set():
+                self.completed.emit()
+        except Exception as e:
+            if not self.cancel_event.is_set():
+                self.failed.emit(str(e))
+
+    def cancel(self):
+        """Solicita a interrupção da tarefa (o gerador para na próxima verificação)"""
+        self.cancel_event.set()
+
+class WorkerPool:
+    """Mantém referências às tarefas em execução até que terminem"""
+
+    def __init__(self):
+        self._workers = set()
+
+    def start(self, worker):
+        self._workers.add(worker)
+        worker.finished.connect(lambda w=worker: self._workers.discard(w))
+        worker.start()
+        return worker
+
+    def cancel_all(self, wait=False):
+        """Cancela todas as tarefas; com `wait`, aguarda o término delas"""
+        for worker in list(self._workers):
+            worker.cancel()
+        if wait:
+            for worker in list(self._workers):
+                worker.wait()
@@ -1,7 +1,9 @@
-from model import raster_handler
+from model import raster_handler, histogram, statistics, gdal_env
+from controller.background import IteratorWorker, WorkerPool
 from PyQt5.QtWidgets import QFileDialog, QListWidgetItem, QMessageBox
 from exceptions import RasterHandlerError, ControllerError
 from view.band_reorder_window import BandReorderWindow
+from view.gdal_env_dialog import GdalEnvDialog
 
 class MainController:
     def __init__(self, view):
@@ -10,6 +12,12 @@ class MainController:
         self.band_names = []
         self.meta = None
         self.reordered_indices = None  # Armazena a ordem reordenada das bandas
+        self.subset_window = None  # Área selecionada no preview (col_off, row_off, width, height)
+        self.preview_window = None  # Área representada pelo preview atual
+        self.workers = WorkerPool()  # Tarefas em segundo plano (histograma, estatísticas, verificação de dados)
+        self.histogram_worker = None
+        self.statistics_worker = None
+        self.issues_worker = None
 
     def open_raster(self):
         """Opens a raster file and loads its information"""
@@ -45,15 +53,24 @@ class MainController:
             
             self.view.export_button.setEnabled(True)
             self.view.preview_button.setEnabled(True)
+            self.view.check_data_button.setEnabled(True)
             self.view.reorder_button.setEnabled(True)
             self.view.status_label.setText(self.view.tr(f"Raster carregado: {filepath}"))
             
-            # Reset reordered indices
+            # Reset reordered indices and selected area
             self.reordered_indices = None
+            self.subset_window = None
+            self.preview_window = None
+            self.view.clear_selection_button.setEnabled(False)
             
             # Update metadata display
             self.view.update_metadata_display(self.meta, self.band_names)
             
+            # Histogram of the first band and statistics of all bands (computed in the background)
+            self.view.histogram_panel.set_bands(self.band_names)
+            self.view.statistics_panel.set_bands(self.band_names)
+            self.show_statistics(self.view.statistics_panel.write_tags)
+            
         except Exception as e:
             QMessageBox.critical(self.view, self.view.tr("Erro"), f"{self.view.tr('Erro inesperado ao abrir raster:')}\n{str(e)}")
 
@@ -78,16 +95,6 @@ class MainController:
             else:
                 selected_indices = [self.view.band_list.row(item) for item in selected_items]
             
-            # Read selected bands
-            try:
-                bands, meta, selected_band_names, band_metadata, file_metadata = raster_handler.read_selected_bands(self.raster_path, selected_indices)
-            except RasterHandlerError as e:
-                QMessageBox.critical(self.view, self.view.tr("Erro"), f"{self.view.tr('Erro ao ler bandas selecionadas:')}\n{str(e)}")
-                return
-            except Exception as e:
-                QMessageBox.critical(self.view, self.view.tr("Erro"), f"{self.view.tr('Erro inesperado ao ler bandas:')}\n{str(e)}")
-                return
-            
             # Request output path
             out_path, _ = QFileDialog.getSaveFileName(
                 self.view, 
@@ -100,9 +107,9 @@ class MainController:
                 self.view.status_label.setText(self.view.tr("Exportação cancelada."))
                 return
             
-            # Export file
+            # Export file, streaming the selected bands strip by strip
             try:
-                raster_handler.export_tif(out_path, bands, meta, selected_band_names, band_metadata, file_metadata)
+                raster_handler.stream_export(self.raster_path, selected_indices, out_path, window=self.subset_window)
                 self.view.status_label.setText(f"{self.view.tr('Arquivo exportado:')} {out_path}")
                 QMessageBox.information(self.view, self.view.tr("Sucesso"), f"{self.view.tr('Arquivo exportado com sucesso:')}\n{out_path}")
             except RasterHandlerError as e:
@@ -133,14 +140,18 @@ class MainController:
             # Get indices of selected bands
             selected_indices = [self.view.band_list.row(item) for item in selected_items]
             
-            # Check for data issues before generating preview
-            issues = raster_handler.detect_data_issues(self.raster_path, selected_indices)
+            # Quick look at a sample (overview and random blocks): the preview never waits for a full scan
+            issues = raster_handler.detect_data_issues(self.raster_path, selected_indices, quick_look=True)
             
             if issues['has_issues']:
+                # The sample found a problem: confirm it with a full scan in the background
+                self.scan_data_issues(selected_indices, report=False)
+                
                 # Show warning with issues and offer corrections
                 warning_text = f"{self.view.tr('Problemas detectados nos dados:')}\n\n"
                 for issue in issues['issues']:
                     warning_text += f"• {issue}\n"
+                warning_text += f"\n{self.view.tr('Resultado de uma amostra (overview e blocos aleatórios); a verificação completa continua em segundo plano.')}\n"
                 
                 warning_text += f"\n{self.view.tr('Recomendações:')}\n"
                 for rec in issues['recommendations']:
@@ -163,8 +174,11 @@ class MainController:
                         corrected_path = raster_handler.apply_data_corrections(self.raster_path, selected_indices)
                         
                         # Generate preview with corrected file
-                        preview_array = raster_handler.generate_preview_image(corrected_path, selected_indices)
+                        preview_array = raster_handler.generate_preview_image(
+                            corrected_path, selected_indices, window=self.subset_window
+                        )
                         self.view.update_preview_image(preview_array)
+                        self.preview_window = self.subset_window
                         self.view.status_label.setText(self.view.tr("Preview gerado com arquivo corrigido!"))
                         
                         # Show info about corrected file
@@ -181,8 +195,11 @@ class MainController:
             
             # Generate preview normally
             try:
-                preview_array = raster_handler.generate_preview_image(self.raster_path, selected_indices)
+                preview_array = raster_handler.generate_preview_image(
+                    self.raster_path, selected_indices, window=self.subset_window
+                )
                 self.view.update_preview_image(preview_array)
+                self.preview_window = self.subset_window
                 self.view.status_label.setText(self.view.tr("Preview gerado com sucesso!"))
             except RasterHandlerError as e:
                 # Show debug information for preview errors
@@ -204,6 +221,190 @@ class MainController:
             QMessageBox.critical(self.view, self.view.tr("Erro"), f"{self.view.tr('Erro inesperado durante preview:')}\n{str(e)}")
             self.view.status_label.setText(self.view.tr("Erro no preview."))
 
+    def select_preview_region(self, x0, y0, x1, y1):
+        """Converte a área selecionada no preview (normalizada 0-1) em uma janela de pixels do raster"""
+        try:
+            if not self.meta:
+                return
+            
+            # The preview shows either the whole raster or the previously selected area
+            if self.preview_window is not None:
+                base_col, base_row, base_width, base_height = self.preview_window
+            else:
+                base_col, base_row = 0, 0
+                base_width, base_height = self.meta['width'], self.meta['height']
+            
+            col_off = base_col + int(x0 * base_width)
+            row_off = base_row + int(y0 * base_height)
+            width = max(1, int(round((x1 - x0) * base_width)))
+            height = max(1, int(round((y1 - y0) * base_height)))
+            
+            self.subset_window = (col_off, row_off, width, height)
+            self.view.clear_selection_button.setEnabled(True)
+            self.view.status_label.setText(
+                f"{self.view.tr('Área selecionada (col, lin, largura, altura):')} {col_off}, {row_off}, {width}, {height}"
+            )
+        except Exception as e:
+            QMessageBox.critical(self.view, self.view.tr("Erro"), f"{self.view.tr('Erro ao selecionar área:')}\n{str(e)}")
+
+    def clear_subset(self):
+        """Remove a área selecionada, voltando a usar a extensão completa do raster"""
+        self.subset_window = None
+        self.view.clear_selection_button.setEnabled(False)
+        self.view.status_label.setText(self.view.tr("Seleção removida. A extensão completa será usada."))
+
+    def show_histogram(self, band_index):
+        """Calcula em segundo plano o histograma de uma banda: aproximações primeiro, depois o exato"""
+        if not self.raster_path:
+            return
+        
+        # Only the most recent request is kept running
+        if self.histogram_worker is not None:
+            self.histogram_worker.cancel()
+        
+        raster_path = self.raster_path
+        worker = IteratorWorker(
+            lambda cancel_event, progress_callback: histogram.iter_band_histogram(
+                raster_path, band_index, cancel_event=cancel_event, progress_callback=progress_callback
+            )
+        )
+        worker.result_ready.connect(lambda result, w=worker: self._on_histogram_result(w, result))
+        worker.progress.connect(lambda done, total, w=worker: self._on_histogram_progress(w, done, total))
+        worker.failed.connect(lambda message, w=worker: self._on_histogram_failed(w, message))
+        self.histogram_worker = worker
+        self.view.histogram_panel.show_loading()
+        self.workers.start(worker)
+
+    def _on_histogram_result(self, worker, result):
+        """Exibe um histograma parcial ou final (resultados de tarefas canceladas são ignorados)"""
+        if worker is not self.histogram_worker:
+            return
+        self.view.histogram_panel.show_histogram(result.counts, result.edges, result.approximate,
+                                                 result.level, result.clipped)
+
+    def _on_histogram_progress(self, worker, done, total):
+        if worker is self.histogram_worker:
+            self.view.histogram_panel.show_progress(done, total)
+
+    def _on_histogram_failed(self, worker, message):
+        if worker is self.histogram_worker:
+            self.view.histogram_panel.show_error(message)
+
+    def show_statistics(self, write_tags=False):
+        """Calcula em segundo plano as estatísticas de todas as bandas: estimativas primeiro, depois as exatas"""
+        if not self.raster_path:
+            return
+        
+        if self.statistics_worker is not None:
+            self.statistics_worker.cancel()
+        
+        raster_path = self.raster_path
+        band_indices = list(range(len(self.band_names)))
+        worker = IteratorWorker(
+            lambda cancel_event, progress_callback: statistics.iter_band_statistics(
+                raster_path, band_indices, write_tags=write_tags,
+                cancel_event=cancel_event, progress_callback=progress_callback
+            )
+        )
+        worker.result_ready.connect(lambda result, w=worker: self._on_statistics_result(w, result))
+        worker.progress.connect(lambda done, total, w=worker: self._on_statistics_progress(w, done, total))
+        worker.failed.connect(lambda message, w=worker: self._on_statistics_failed(w, message))
+        worker.completed.connect(lambda w=worker: self._on_statistics_completed(w, write_tags))
+        self.statistics_worker = worker
+        self.workers.start(worker)
+
+    def _on_statistics_result(self, worker, result):
+        """Exibe estatísticas estimadas ou exatas (resultados de tarefas canceladas são ignorados)"""
+        if worker is not self.statistics_worker:
+            return
+        self.view.statistics_panel.show_statistics(
+            result.band_index, result.minimum, result.maximum, result.mean, result.std,
+            result.approximate, result.source, result.coverage, result.mean_margin
+        )
+
+    def _on_statistics_progress(self, worker, done, total):
+        if worker is self.statistics_worker:
+            self.view.statistics_panel.show_progress(done, total)
+
+    def _on_statistics_failed(self, worker, message):
+        if worker is self.statistics_worker:
+            self.view.statistics_panel.show_error(message)
+
+    def _on_statistics_completed(self, worker, write_tags):
+        if worker is self.statistics_worker:
+            self.view.statistics_panel.show_completed(write_tags)
+
+    def scan_data_issues(self, band_indices=None, report=True):
+        """
+        Verifica em segundo plano todos os pixels das bandas (confirmação da amostragem
+        ou pedido de certeza do usuário); com `report`, exibe o resultado em um diálogo
+        """
+        if not self.raster_path:
+            return
+        
+        if band_indices is None:
+            band_indices = [self.view.band_list.row(item) for item in self.view.band_list.selectedItems()]
+            if not band_indices:
+                band_indices = list(range(len(self.band_names)))
+        
+        if self.issues_worker is not None:
+            self.issues_worker.cancel()
+        
+        raster_path = self.raster_path
+        
+        def scan(cancel_event, progress_callback):
+            yield raster_handler.detect_data_issues(raster_path, band_indices, cancel_event=cancel_event,
+                                                    progress_callback=progress_callback)
+        
+        worker = IteratorWorker(scan)
+        worker.result_ready.connect(lambda result, w=worker: self._on_issues_result(w, result, report))
+        worker.progress.connect(lambda done, total, w=worker: self._on_issues_progress(w, done, total))
+        worker.failed.connect(lambda message, w=worker: self._on_issues_failed(w, message))
+        self.issues_worker = worker
+        self.workers.start(worker)
+
+    def _on_issues_result(self, worker, result, report):
+        """Exibe o resultado da verificação completa (resultados de tarefas canceladas são ignorados)"""
+        if worker is not self.issues_worker:
+            return
+        details = "\n".join(f"• {issue}" for issue in result['issues'])
+        if result['has_issues']:
+            self.view.status_label.setText(
+                f"{self.view.tr('Verificação completa:')} {len(result['issues'])} {self.view.tr('problema(s) encontrado(s).')}"
+            )
+        else:
+            self.view.status_label.setText(self.view.tr("Verificação completa: nenhum problema encontrado."))
+        self.view.status_label.setToolTip(details)
+        
+        if report:
+            if result['has_issues']:
+                QMessageBox.warning(
+                    self.view, self.view.tr("Verificação Completa"),
+                    f"{self.view.tr('Problemas detectados nos dados:')}\n\n{details}"
+                )
+            else:
+                QMessageBox.information(
+                    self.view, self.view.tr("Verificação Completa"),
+                    self.view.tr("Nenhum problema encontrado em todos os pixels das bandas verificadas.")
+                )
+
+    def _on_issues_progress(self, worker, done, total):
+        if worker is self.issues_worker:
+            self.view.status_label.setText(
+                f"{self.view.tr('Verificando todos os pixels...')} {100 * done // max(1, total)}%"
+            )
+
+    def _on_issues_failed(self, worker, message):
+        if worker is self.issues_worker:
+            self.view.status_label.setText(f"{self.view.tr('Erro na verificação completa:')} {message}")
+
+    def cancel_background_tasks(self):
+        """Cancela as tarefas em segundo plano e aguarda o término delas"""
+        self.histogram_worker = None
+        self.statistics_worker = None
+        self.issues_worker = None
+        self.workers.cancel_all(wait=True)
+
     def open_reorder_window(self):
         """Abre a janela de reordenação de bandas"""
         try:
@@ -241,6 +442,21 @@ class MainController:
             QMessageBox.critical(self.view, self.view.tr("Erro"), f"{self.view.tr('Erro inesperado ao abrir janela de reordenação:')}\n{str(e)}")
             self.view.status_label.setText(self.view.tr("Erro na reordenação."))
 
+    def open_gdal_settings(self):
+        """Abre a janela de configuração do ambiente GDAL e grava as alterações no arquivo de configuração"""
+        try:
+            config = gdal_env.load_env_config()
+            dialog = GdalEnvDialog(
+                parent=self.view,
+                settings=gdal_env.configured_settings(config),
+                config_path=gdal_env.config_path()
+            )
+            if dialog.exec_() == GdalEnvDialog.Accepted:
+                gdal_env.save_env_config(gdal_env.config_for_settings(dialog.get_settings(), config))
+                self.view.status_label.setText(self.view.tr("Configuração do GDAL salva."))
+        except RasterHandlerError as e:
+            QMessageBox.critical(self.view, self.view.tr("Erro"), f"{self.view.tr('Erro na configuração do GDAL:')}\n{str(e)}")
+
     def _on_bands_reordered(self, reordered_indices):
         """Callback chamado quando as bandas são reordenadas"""
         try:
@@ -28,4 +28,8 @@ class ValidationError(IGCVRasterError):
 
 class FileOperationError(IGCVRasterError):
     """Exceção para erros de operações com arquivos"""
-    pass 
\ No newline at end of file
+    pass 
+
+class CatalogError(IGCVRasterError):
+    """Exceção para erros relacionados ao catálogo de rasters"""
+    pass
@@ -34,7 +34,13 @@ def main():
             argv = sys.argv[:]
             argv.remove('--cli')
             import cli.cli_app
-            cli.cli_app.main(*argv)
+            cli.cli_app.main(argv[1:])
+        elif '--serve' in sys.argv:
+            logger.info("Running tile server mode")
+            argv = sys.argv[:]
+            argv.remove('--serve')
+            import server.tile_server
+            server.tile_server.main(argv[1:])
         else:
             logger.info("Running GUI mode")
             app = QApplication(sys.argv)
@@ -0,0 +1,269 @@
+import os
+import asyncio
+import threading
+import functools
+from concurrent.futures import ThreadPoolExecutor
+import rasterio
+from model import raster_handler, statistics, histogram
+from model.windowing import DEFAULT_MEMORY_BUDGET, resolve_window, rows_for_budget, iter_row_windows, read_bands
+
+# Blocking calls running at once in the whole process, and on the same file
+DEFAULT_MAX_CONCURRENCY = min(32, (os.cpu_count() or 1) + 4)
+DEFAULT_PER_FILE_CONCURRENCY = 2
+# Results buffered between a worker thread and the consumer of an async iterator
+ITERATOR_QUEUE_SIZE = 4
+
+class _Done:
+    """Marks the end of the items produced by a worker thread"""
+
+    def __init__(self, error=None):
+        self.error = error
+
+class AsyncRasterHandler:
+    """
+    Asyncio facade over raster_handler, statistics and histogram.
+
+    Every blocking call runs on a bounded thread pool, behind a process-wide
+    semaphore and a per-file semaphore, so many concurrent requests share
+    `max_concurrency` threads instead of creating one each. Cancelling the
+    awaiting task sets the cancel event of the operations that support one
+    (export, statistics, histograms, window iteration); the semaphore slot
+    is only released when the worker thread has actually finished.
+
+    An instance must be used from a single event loop.
+
+    Args:
+        max_concurrency (int): Maximum blocking calls running at once
+        per_file_concurrency (int): Maximum blocking calls on the same file at once
+        memory_budget (int): Default memory budget of streaming operations
+    """
+
+    def __init__(self, max_concurrency=DEFAULT_MAX_CONCURRENCY, per_file_concurrency=DEFAULT_PER_FILE_CONCURRENCY,
+                 memory_budget=DEFAULT_MEMORY_BUDGET):
+        self.max_concurrency = max_concurrency
+        self.per_file_concurrency = per_file_concurrency
+        self.memory_budget = memory_budget
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='raster')
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        # Per-file semaphores, kept only while the file has users: path -> [semaphore, users]
+        self._file_semaphores = {}
+
+    async def close(self):
+        """Waits for the running calls and shuts the thread pool down"""
+        await asyncio.get_running_loop().run_in_executor(None, self._executor.shutdown)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    def _acquire_file(self, filepath):
+        key = os.path.abspath(filepath)
+        entry = self._file_semaphores.get(key)
+        if entry is None:
+            entry = self._file_semaphores[key] = [asyncio.Semaphore(self.per_file_concurrency), 0]
+        entry[1] += 1
+        return key, entry[0]
+
+    def _release_file(self, key):
+        entry = self._file_semaphores[key]
+        entry[1] -= 1
+        if entry[1] == 0:
+            del self._file_semaphores[key]
+
+    async def _run(self, filepath, function, *args, cancel_event=None, **kwargs):
+        """Runs a blocking call within the concurrency limits"""
+        key, file_semaphore = self._acquire_file(filepath)
+        try:
+            async with file_semaphore, self._semaphore:
+                future = asyncio.get_running_loop().run_in_executor(
+                    self._executor, lambda: function(*args, **kwargs)
+                )
+                try:
+                    return await asyncio.shield(future)
+                except asyncio.CancelledError:
+                    # Ask the call to stop and keep the slot until its thread is free again
+                    if cancel_event is not None:
+                        cancel_event.set()
+                    await asyncio.wait([future])
+                    raise
+        finally:
+            self._release_file(key)
+
+    async def _iterate(self, filepath, factory):
+        """
+        Runs `factory(cancel_event, progress_callback)` (a generator, as used by the
+        GUI workers) on one thread and yields ('result', item) and
+        ('progress', done, total) events as they are produced.
+        """
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(ITERATOR_QUEUE_SIZE)
+        cancel_event = threading.Event()
+
+        def put(event):
+            # Blocks the worker thread while the consumer is behind (backpressure)
+            if not cancel_event.is_set():
+                asyncio.run_coroutine_threadsafe(queue.put(event), loop).result()
+
+        def produce():
+            try:
+                for item in factory(cancel_event, lambda done, total: put(('progress', done, total))):
+                    if cancel_event.is_set():
+                        break
+                    put(('result', item))
+            except Exception as e:
+                put(_Done(e))
+                return
+            put(_Done())
+
+        task = asyncio.ensure_future(self._run(filepath, produce, cancel_event=cancel_event))
+        try:
+            while True:
+                getter = asyncio.ensure_future(queue.get())
+                await asyncio.wait([getter, task], return_when=asyncio.FIRST_COMPLETED)
+                if not getter.done():
+                    # The worker finished without posting its end marker (it failed to start)
+                    getter.cancel()
+                    await task
+                    return
+                event = getter.result()
+                if isinstance(event, _Done):
+                    if event.error is not None:
+                        raise event.error
+                    return
+                yield event
+        finally:
+            cancel_event.set()
+            # Unblock a worker waiting for queue space, then wait for it
+            while not queue.empty():
+                queue.get_nowait()
+            if not task.done():
+                try:
+                    await asyncio.shield(task)
+                except Exception:
+                    pass
+
+    # Awaitable versions of the model operations
+
+    async def load_raster(self, filepath):
+        """Awaitable raster_handler.load_raster: returns (meta, band_names)"""
+        return await self._run(filepath, raster_handler.load_raster, filepath)
+
+    async def generate_preview(self, filepath, band_indices, **kwargs):
+        """Awaitable raster_handler.generate_preview_image (same keyword arguments)"""
+        return await self._run(filepath, raster_handler.generate_preview_image, filepath, band_indices, **kwargs)
+
+    async def detect_data_issues(self, filepath, band_indices, **kwargs):
+        """Awaitable raster_handler.detect_data_issues (same keyword arguments)"""
+        cancel_event = threading.Event()
+        detect = functools.partial(raster_handler.detect_data_issues, cancel_event=cancel_event)
+        return await self._run(filepath, detect, filepath, band_indices, cancel_event=cancel_event, **kwargs)
+
+    async def stream_export(self, filepath, selected_indices, out_path, progress_callback=None, **kwargs):
+        """
+        Awaitable raster_handler.stream_export; cancelling the task stops the
+        export between strips and removes the partial output.
+
+        Args:
+            progress_callback (callable, optional): Called on the event loop with (done, total)
+            **kwargs: Other stream_export keyword arguments
+
+        Returns:
+            list: Names of the exported bands
+        """
+        kwargs.setdefault('memory_budget', self.memory_budget)
+        band_names = None
+        async for event in self._iterate(filepath, lambda cancel_event, progress: _single(
+                raster_handler.stream_export, filepath, selected_indices, out_path,
+                progress_callback=progress, cancel_event=cancel_event, **kwargs)):
+            if event[0] == 'progress':
+                if progress_callback:
+                    progress_callback(event[1], event[2])
+            else:
+                band_names = event[1]
+        return band_names
+
+    async def band_statistics(self, filepath, band_indices, **kwargs):
+        """
+        Awaitable exact statistics of the bands (see iter_band_statistics).
+
+        Returns:
+            list: BandStatistics per band, in the order of `band_indices`
+        """
+        final = {}
+        async for result in self.iter_band_statistics(filepath, band_indices, **kwargs):
+            if not result.approximate:
+                final[result.band_index] = result
+        return [final.get(band_index) for band_index in band_indices]
+
+    # Async iterators
+
+    async def iter_band_statistics(self, filepath, band_indices, **kwargs):
+        """Async version of statistics.iter_band_statistics: estimates first, then exact values"""
+        kwargs.setdefault('memory_budget', self.memory_budget)
+        async for event in self._iterate(filepath, lambda cancel_event, progress: statistics.iter_band_statistics(
+                filepath, band_indices, cancel_event=cancel_event, progress_callback=progress, **kwargs)):
+            if event[0] == 'result':
+                yield event[1]
+
+    async def iter_band_histogram(self, filepath, band_index, **kwargs):
+        """Async version of histogram.iter_band_histogram: approximations first, then the exact histogram"""
+        kwargs.setdefault('memory_budget', self.memory_budget)
+        async for event in self._iterate(filepath, lambda cancel_event, progress: histogram.iter_band_histogram(
+                filepath, band_index, cancel_event=cancel_event, progress_callback=progress, **kwargs)):
+            if event[0] == 'result':
+                yield event[1]
+
+    async def iter_windows(self, filepath, band_indices, window=None, bbox=None, memory_budget=None):
+        """
+        Async iterator over the strips of a region, read on a worker thread.
+
+        Args:
+            filepath (str): Path to the raster file
+            band_indices (list): Band indices (0-based) to read
+            window (tuple, optional): Pixel window (col_off, row_off, width, height)
+            bbox (tuple, optional): Bounding box (left, bottom, right, top) in the raster's CRS
+            memory_budget (int, optional): Maximum bytes per strip (default: the facade's budget)
+
+        Yields:
+            tuple: (Window, ndarray) - strip window in file coordinates and its
+                   (bands, rows, cols) data
+        """
+        budget = memory_budget or self.memory_budget
+        async for event in self._iterate(filepath, lambda cancel_event, progress: _read_windows(
+                filepath, band_indices, window, bbox, budget, cancel_event)):
+            yield event[1]
+
+    async def export_progress(self, filepath, selected_indices, out_path, **kwargs):
+        """
+        Async iterator running stream_export and yielding its progress as (done, total);
+        closing the iterator early cancels the export.
+        """
+        kwargs.setdefault('memory_budget', self.memory_budget)
+        async for event in self._iterate(filepath, lambda cancel_event, progress: _single(
+                raster_handler.stream_export, filepath, selected_indices, out_path,
+                progress_callback=progress, cancel_event=cancel_event, **kwargs)):
+            if event[0] == 'progress':
+                yield event[1], event[2]
+
+def _single(function, *args, **kwargs):
+    """Generator yielding the result of one blocking call"""
+    yield function(*args, **kwargs)
+
+def _read_windows(filepath, band_indices, window, bbox, memory_budget, cancel_event):
+    """Reads the strips of a region, stopping when `cancel_event` is set"""
+    with rasterio.open(filepath) as src:
+        band_list = [idx + 1 for idx in band_indices]
+        read_window = resolve_window(src, window, bbox)
+        if read_window is None:
+            col_off, row_off, width, height = 0, 0, src.width, src.height
+        else:
+            col_off, row_off = int(read_window.col_off), int(read_window.row_off)
+            width, height = int(read_window.width), int(read_window.height)
+        rows = rows_for_budget(width, len(band_list), src.dtypes[band_list[0] - 1], memory_budget,
+                               block_height=src.block_shapes[0][0], buffers=ITERATOR_QUEUE_SIZE + 1)
+        for strip in iter_row_windows(width, height, rows, col_off=col_off, row_off=row_off):
+            if cancel_event.is_set():
+                return
+            yield strip, read_bands(src, band_list, window=strip)
@@ -0,0 +1,191 @@
+import os
+import json
+import math
+import time
+import threading
+from rasterio.windows import Window
+from model.governor import get_governor
+from model.windowing import read_bands
+
+# File where the best window height found per block layout is kept between runs
+PROFILE_PATH = os.path.join(os.path.expanduser('~'), '.igcv', 'window_profiles.json')
+# Window heights tried, as fractions of the largest height the memory budget allows
+CANDIDATE_FRACTIONS = (1, 2, 4, 8, 16)
+# Windows read (and timed) per candidate
+SAMPLE_WINDOWS = 2
+# Regions smaller than this many largest windows are not benchmarked (the sample would be most of the work)
+MIN_TUNED_WINDOWS = 8
+
+_profiles_lock = threading.Lock()
+
+def layout_signature(src, band_list, width):
+    """
+    Describes what makes window reads of a dataset fast or slow: driver,
+    compression, interleave, block shape, data type, bands read out of the
+    bands stored, and the window width (rounded up to a power of 2).
+
+    Files with the same signature get the same tuned window height.
+
+    Args:
+        src: Open rasterio dataset
+        band_list (list): Bands read (1-based)
+        width (int): Window width in pixels
+
+    Returns:
+        str: The signature
+    """
+    block_height, block_width = src.block_shapes[band_list[0] - 1]
+    compression = src.compression.value if src.compression is not None else 'none'
+    interleave = src.interleaving.value if src.interleaving is not None else 'none'
+    width_class = 2 ** max(0, math.ceil(math.log2(max(1, width))))
+    return "|".join([
+        src.driver, compression.lower(), interleave.lower(), f"{block_width}x{block_height}",
+        src.dtypes[band_list[0] - 1], f"{len(set(band_list))}/{src.count}", f"w{width_class}",
+    ])
+
+def load_profiles(path=PROFILE_PATH):
+    """Returns the stored profiles ({signature: {'rows', 'throughput'}}), empty when unreadable"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            profiles = json.load(f)
+        return profiles if isinstance(profiles, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+def save_profile(signature, rows, throughput, path=PROFILE_PATH):
+    """Stores the tuned window height of a signature (the file is replaced atomically)"""
+    with _profiles_lock:
+        profiles = load_profiles(path)
+        profiles[signature] = {'rows': int(rows), 'throughput': float(throughput)}
+        tmp_path = path + '.tmp'
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(profiles, f, indent=1, sort_keys=True)
+            os.replace(tmp_path, path)
+        except OSError:
+            # The profile cache is only an optimization
+            pass
+
+def candidate_rows(max_rows, block_height):
+    """
+    Window heights to benchmark, aligned so no window straddles a block
+    boundary: whole multiples of the block height (fractions of `max_rows`)
+    or, when not even one block row fits, heights dividing the block height.
+
+    Returns:
+        list: Distinct heights, largest first
+    """
+    block_height = max(1, block_height)
+    candidates = []
+    if max_rows >= block_height:
+        for fraction in CANDIDATE_FRACTIONS:
+            rows = max_rows // fraction
+            rows -= rows % block_height
+            if rows >= block_height and rows not in candidates:
+                candidates.append(rows)
+    else:
+        rows = block_height
+        while rows > 1 and len(candidates) < len(CANDIDATE_FRACTIONS):
+            rows //= 2
+            if rows <= max_rows:
+                candidates.append(rows)
+    return candidates or [max(1, min(max_rows, block_height))]
+
+def benchmark_windows(src, band_list, candidates, window=None, sample_windows=SAMPLE_WINDOWS):
+    """
+    Times full-width window reads of each candidate height on the first rows
+    of a region.
+
+    Every candidate starts on a block row not read before and reads whole
+    block rows, so windows shorter than a block are timed with the block
+    decodes they share through the GDAL block cache, and blocks left in the
+    cache by one candidate don't speed up the next one.
+
+    Args:
+        src: Open rasterio dataset
+        band_list (list): Bands to read (1-based)
+        candidates (list): Window heights
+        window (Window, optional): Region (default: the whole dataset)
+        sample_windows (int): Minimum windows read per candidate
+
+    Returns:
+        dict: Pixels per second of each candidate that could be measured
+    """
+    if window is None:
+        window = Window(0, 0, src.width, src.height)
+    col_off, row_off = int(window.col_off), int(window.row_off)
+    width, height = int(window.width), int(window.height)
+    block_height = max(1, src.block_shapes[band_list[0] - 1][0])
+
+    def next_block_row(offset):
+        # Offset in the region of the next block boundary of the source
+        absolute = row_off + offset
+        return offset + (-absolute) % block_height
+
+    # Warm-up: the first read also pays for headers and offsets
+    offset = next_block_row(1)
+    if offset > height:
+        return {}
+    read_bands(src, band_list, window=Window(col_off, row_off, width, offset))
+
+    throughput = {}
+    for rows in candidates:
+        count = max(sample_windows, math.ceil(block_height / rows))
+        if offset + rows * count > height:
+            continue
+        start = time.perf_counter()
+        for _ in range(count):
+            read_bands(src, band_list, window=Window(col_off, row_off + offset, width, rows))
+            offset += rows
+        elapsed = time.perf_counter() - start
+        throughput[rows] = rows * count * width / max(elapsed, 1e-9)
+        offset = next_block_row(offset)
+    return throughput
+
+def tune_plan(src, band_list, plan, window=None, benchmark=True, profile_path=PROFILE_PATH):
+    """
+    Picks the window height with the best read throughput for a plan.
+
+    The largest window the budget allows isn't always the fastest: big
+    windows fall out of the CPU caches and delay the first write, and small
+    ones pay per-read overhead. The first time a block layout is seen, a few
+    candidate heights are benchmarked on the first rows of the region and
+    the winner is stored per layout signature in `profile_path`; later runs
+    reuse it without benchmarking. Heights never exceed the plan's.
+
+    Args:
+        src: Open rasterio dataset (not a warped view)
+        band_list (list): Bands read per window (1-based)
+        plan (WindowPlan): Plan from plan_windows
+        window (Window, optional): Region processed (default: the whole dataset)
+        benchmark (bool): Benchmark unknown layouts; otherwise only stored profiles are used
+        profile_path (str): Profile cache file
+
+    Returns:
+        WindowPlan: The plan with the tuned height (the same plan when not tuned)
+    """
+    width = int(window.width) if window is not None else src.width
+    height = int(window.height) if window is not None else src.height
+    signature = layout_signature(src, band_list, width)
+
+    stored = load_profiles(profile_path).get(signature)
+    if stored is not None:
+        return plan.with_rows(min(plan.rows, max(1, int(stored.get('rows', plan.rows)))))
+
+    if not benchmark or height < plan.rows * MIN_TUNED_WINDOWS:
+        return plan
+
+    block_height = src.block_shapes[band_list[0] - 1][0]
+    candidates = candidate_rows(plan.rows, block_height)
+    if len(candidates) < 2:
+        return plan
+    # The benchmark reads hold at most one full window
+    with get_governor().reserve(plan.window_bytes):
+        throughput = benchmark_windows(src, band_list, candidates, window)
+    if len(throughput) < 2:
+        return plan
+
+    rows = max(throughput, key=throughput.get)
+    save_profile(signature, rows, throughput[rows], profile_path)
+    return plan.with_rows(rows)
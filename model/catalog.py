@@ -0,0 +1,316 @@
+import os
+import json
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from rasterio.crs import CRS
+from model import raster_handler
+from exceptions import CatalogError, RasterHandlerError
+
+DEFAULT_CATALOG_PATH = os.path.join(os.path.expanduser('~'), '.igcv', 'catalog.sqlite')
+RASTER_EXTENSIONS = ('.tif', '.tiff')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    size INTEGER,
+    mtime REAL,
+    driver TEXT,
+    width INTEGER,
+    height INTEGER,
+    count INTEGER,
+    crs TEXT,
+    res_x REAL,
+    res_y REAL,
+    left REAL,
+    bottom REAL,
+    right REAL,
+    top REAL,
+    block_x INTEGER,
+    block_y INTEGER,
+    interleave TEXT,
+    compress TEXT,
+    overviews TEXT,
+    indexed_at REAL
+);
+CREATE TABLE IF NOT EXISTS bands (
+    file_id INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+    band_index INTEGER NOT NULL,
+    name TEXT,
+    description TEXT,
+    dtype TEXT,
+    nodata REAL,
+    block_x INTEGER,
+    block_y INTEGER,
+    overviews TEXT,
+    PRIMARY KEY (file_id, band_index)
+);
+CREATE INDEX IF NOT EXISTS idx_bands_name ON bands(name);
+CREATE INDEX IF NOT EXISTS idx_files_crs ON files(crs);
+"""
+
+def normalize_crs(crs):
+    """
+    Normalizes a user supplied CRS to the string stored in the catalog.
+
+    Args:
+        crs (str): CRS in any form accepted by rasterio (e.g. 'EPSG:4326', '4326')
+
+    Returns:
+        str: Normalized CRS string
+    """
+    try:
+        if isinstance(crs, str) and crs.isdigit():
+            crs = f"EPSG:{crs}"
+        return CRS.from_user_input(crs).to_string()
+    except Exception:
+        return str(crs)
+
+class RasterCatalog:
+    """
+    Local SQLite index of raster files and their bands.
+
+    Stores the metadata returned by raster_handler.describe_raster so that
+    files can be selected by band name, CRS or resolution without opening them.
+    """
+
+    def __init__(self, db_path=DEFAULT_CATALOG_PATH):
+        self.db_path = db_path
+        try:
+            db_dir = os.path.dirname(db_path)
+            if db_dir and not os.path.exists(db_dir):
+                os.makedirs(db_dir)
+
+            self.conn = sqlite3.connect(db_path)
+            self.conn.row_factory = sqlite3.Row
+            self.conn.execute("PRAGMA foreign_keys = ON")
+            self.conn.executescript(_SCHEMA)
+        except (sqlite3.Error, OSError) as e:
+            raise CatalogError(f"Error opening catalog {db_path}: {e}")
+
+    def close(self):
+        """Closes the database connection"""
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _find_rasters(self, directories, recursive=True):
+        """Lists raster files found in the given directories"""
+        paths = []
+        for directory in directories:
+            if not os.path.isdir(directory):
+                raise CatalogError(f"Directory not found: {directory}")
+
+            if recursive:
+                for root, _, files in os.walk(directory):
+                    for name in files:
+                        if name.lower().endswith(RASTER_EXTENSIONS):
+                            paths.append(os.path.abspath(os.path.join(root, name)))
+            else:
+                for name in os.listdir(directory):
+                    full_path = os.path.join(directory, name)
+                    if os.path.isfile(full_path) and name.lower().endswith(RASTER_EXTENSIONS):
+                        paths.append(os.path.abspath(full_path))
+        return sorted(set(paths))
+
+    def _indexed_state(self):
+        """Returns {path: (size, mtime)} for every indexed file"""
+        rows = self.conn.execute("SELECT path, size, mtime FROM files")
+        return {row['path']: (row['size'], row['mtime']) for row in rows}
+
+    def _store(self, info):
+        """Inserts or replaces the entry of one file"""
+        left, bottom, right, top = info['bounds']
+        self.conn.execute("DELETE FROM files WHERE path = ?", (info['path'],))
+        cursor = self.conn.execute(
+            """INSERT INTO files (path, size, mtime, driver, width, height, count, crs,
+                                  res_x, res_y, left, bottom, right, top, block_x, block_y,
+                                  interleave, compress, overviews, indexed_at)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            (info['path'], info['size'], info['mtime'], info['driver'], info['width'],
+             info['height'], info['count'], info['crs'], info['res_x'], info['res_y'],
+             left, bottom, right, top, info['block_x'], info['block_y'],
+             info['interleave'], info['compress'], json.dumps(info['overviews']), time.time())
+        )
+        file_id = cursor.lastrowid
+        self.conn.executemany(
+            """INSERT INTO bands (file_id, band_index, name, description, dtype, nodata,
+                                  block_x, block_y, overviews)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            [(file_id, band['index'], band['name'], band['description'], band['dtype'],
+              band['nodata'], band['block_x'], band['block_y'], json.dumps(band['overviews']))
+             for band in info['bands']]
+        )
+
+    def scan(self, directories, recursive=True, workers=None, progress_callback=None):
+        """
+        Indexes the rasters found in the given directories.
+
+        Only new or modified files (different size or mtime) are opened, and
+        entries of files that disappeared from the scanned directories are removed.
+        Files are described in parallel; database writes happen in the calling thread.
+
+        Args:
+            directories (list): Directories to crawl
+            recursive (bool): Whether to descend into subdirectories
+            workers (int, optional): Number of parallel readers (default: CPU count)
+            progress_callback (callable, optional): Called with (done, total) after each file
+
+        Returns:
+            dict: Counters 'found', 'indexed', 'unchanged', 'removed' and the list 'errors'
+
+        Raises:
+            CatalogError: If a directory is invalid or the database can't be updated
+        """
+        if isinstance(directories, str):
+            directories = [directories]
+
+        paths = self._find_rasters(directories, recursive)
+        indexed = self._indexed_state()
+
+        pending = []
+        unchanged = 0
+        for path in paths:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            if indexed.get(path) == (stat.st_size, stat.st_mtime):
+                unchanged += 1
+            else:
+                pending.append(path)
+
+        # Drop entries for files that were deleted from the scanned directories
+        roots = [os.path.join(os.path.abspath(d), '') for d in directories]
+        removed = [path for path in indexed
+                   if any(path.startswith(root) for root in roots) and not os.path.exists(path)]
+
+        result = {
+            'found': len(paths),
+            'indexed': 0,
+            'unchanged': unchanged,
+            'removed': len(removed),
+            'errors': []
+        }
+
+        try:
+            with self.conn:
+                self.conn.executemany("DELETE FROM files WHERE path = ?", [(p,) for p in removed])
+
+            if not pending:
+                return result
+
+            workers = workers or os.cpu_count() or 1
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = {executor.submit(raster_handler.describe_raster, path): path for path in pending}
+                with self.conn:
+                    for done, future in enumerate(as_completed(futures), start=1):
+                        path = futures[future]
+                        try:
+                            self._store(future.result())
+                            result['indexed'] += 1
+                        except RasterHandlerError as e:
+                            result['errors'].append(f"{path}: {e}")
+                        if progress_callback:
+                            progress_callback(done, len(pending))
+        except sqlite3.Error as e:
+            raise CatalogError(f"Error updating catalog: {e}")
+
+        return result
+
+    def query(self, band_name=None, crs=None, resolution=None, dtype=None, path_contains=None, tolerance=1e-6):
+        """
+        Selects indexed files matching all the given criteria.
+
+        Args:
+            band_name (str, optional): Band name (case-insensitive exact match)
+            crs (str, optional): Coordinate reference system (e.g. 'EPSG:32723')
+            resolution (float, optional): Pixel size in CRS units
+            dtype (str, optional): Band data type (e.g. 'uint16')
+            path_contains (str, optional): Substring of the file path
+            tolerance (float): Relative tolerance for the resolution match
+
+        Returns:
+            list: One dict per match with the file 'path', 'crs', 'res_x', 'res_y',
+                  'width', 'height' and 'bands' (list of (band_index, name) matching
+                  the band filters, or all bands when no band filter is given)
+
+        Raises:
+            CatalogError: If the query fails
+        """
+        conditions = []
+        params = []
+
+        if crs:
+            conditions.append("f.crs = ?")
+            params.append(normalize_crs(crs))
+        if resolution:
+            conditions.append("ABS(f.res_x - ?) <= ? AND ABS(f.res_y - ?) <= ?")
+            params.extend([resolution, abs(resolution) * tolerance, resolution, abs(resolution) * tolerance])
+        if path_contains:
+            conditions.append("f.path LIKE ?")
+            params.append(f"%{path_contains}%")
+        if band_name:
+            conditions.append("LOWER(b.name) = LOWER(?)")
+            params.append(band_name)
+        if dtype:
+            conditions.append("b.dtype = ?")
+            params.append(dtype)
+
+        sql = """SELECT f.path, f.crs, f.res_x, f.res_y, f.width, f.height, b.band_index, b.name
+                 FROM files f JOIN bands b ON b.file_id = f.id"""
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY f.path, b.band_index"
+
+        try:
+            rows = self.conn.execute(sql, params).fetchall()
+        except sqlite3.Error as e:
+            raise CatalogError(f"Error querying catalog: {e}")
+
+        matches = {}
+        for row in rows:
+            entry = matches.setdefault(row['path'], {
+                'path': row['path'],
+                'crs': row['crs'],
+                'res_x': row['res_x'],
+                'res_y': row['res_y'],
+                'width': row['width'],
+                'height': row['height'],
+                'bands': []
+            })
+            entry['bands'].append((row['band_index'], row['name']))
+
+        return list(matches.values())
+
+    def get_file(self, path):
+        """
+        Returns the indexed metadata of one file, or None if it isn't indexed.
+
+        Args:
+            path (str): Path to the raster file
+
+        Returns:
+            dict or None: File row with its 'bands' rows
+        """
+        path = os.path.abspath(path)
+        row = self.conn.execute("SELECT * FROM files WHERE path = ?", (path,)).fetchone()
+        if row is None:
+            return None
+
+        info = dict(row)
+        info['overviews'] = json.loads(info['overviews'] or '[]')
+        bands = self.conn.execute(
+            "SELECT * FROM bands WHERE file_id = ? ORDER BY band_index", (row['id'],)
+        ).fetchall()
+        info['bands'] = []
+        for band in bands:
+            band_info = dict(band)
+            band_info['overviews'] = json.loads(band_info['overviews'] or '[]')
+            info['bands'].append(band_info)
+        return info
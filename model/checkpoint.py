@@ -0,0 +1,136 @@
+import os
+import json
+import time
+import pickle
+import shutil
+import hashlib
+from exceptions import RasterHandlerError
+
+# Seconds between checkpoints of a streaming export
+CHECKPOINT_INTERVAL = 60.0
+# Suffixes of the in-progress output and of its checkpoint, next to the final path
+PARTIAL_SUFFIX = '.partial'
+CHECKPOINT_SUFFIX = '.ckpt'
+# Bumped when the checkpoint contents change, so older checkpoints are ignored
+CHECKPOINT_VERSION = 1
+
+def partial_path(out_path):
+    """Path an export is written to until it's finalized (same directory, so the rename is atomic)"""
+    return out_path + PARTIAL_SUFFIX
+
+def source_identity(filepath):
+    """Identifies a version of a source file: absolute path, size and modification time"""
+    stat = os.stat(filepath)
+    return [os.path.abspath(filepath), stat.st_size, stat.st_mtime_ns]
+
+def _normalize(value):
+    """Turns export parameters (options objects included) into JSON-serializable values"""
+    if isinstance(value, dict):
+        return {str(key): _normalize(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(item) for item in value]
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if hasattr(value, '__dict__'):
+        # Execution-only attributes (thread counts...) don't change the output
+        skipped = getattr(type(value), 'EXECUTION_ATTRS', ())
+        params = {name: item for name, item in vars(value).items() if name not in skipped}
+        return {'type': type(value).__name__, **_normalize(params)}
+    return str(value)
+
+def export_key(**params):
+    """
+    Digest of everything that determines an export's output: reruns with the
+    same key produce the same file, so a checkpoint is only resumed for them.
+    """
+    payload = json.dumps(_normalize(params), sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def finalize(tmp_path, out_path):
+    """
+    Moves a finished output to its final path in one atomic rename.
+
+    A directory output (chunk store) replaces the previous one, which can't
+    be done atomically: the old directory is removed first.
+    """
+    if os.path.isdir(tmp_path) and os.path.isdir(out_path):
+        shutil.rmtree(out_path)
+    os.replace(tmp_path, out_path)
+
+def remove_partial(tmp_path):
+    """Removes an unfinished output and its checkpoint"""
+    if os.path.isdir(tmp_path):
+        shutil.rmtree(tmp_path, ignore_errors=True)
+    for path in (tmp_path, tmp_path + CHECKPOINT_SUFFIX):
+        if os.path.isfile(path):
+            os.remove(path)
+
+class ExportCheckpoint:
+    """
+    Progress of a streaming export, saved next to its partial output.
+
+    The file holds a JSON header line (version, export key, rows done) and
+    the pickled state needed to continue (statistics accumulated so far,
+    the resolved packing). The state is only unpickled when the header
+    matches the export being resumed.
+
+    Args:
+        tmp_path (str): Partial output the checkpoint belongs to
+        key (str): export_key() of the export
+        interval (float): Seconds between checkpoints (None or 0: never due)
+    """
+
+    def __init__(self, tmp_path, key, interval=CHECKPOINT_INTERVAL):
+        self.path = tmp_path + CHECKPOINT_SUFFIX
+        self.tmp_path = tmp_path
+        self.key = key
+        self.interval = interval
+        self._last = time.monotonic()
+
+    def load(self):
+        """
+        Returns the saved progress of this export, or None when there is
+        none to resume (no checkpoint, another export's, or no partial output).
+
+        Returns:
+            dict: {'rows_done': int, 'state': dict}
+        """
+        if not os.path.isfile(self.path) or not os.path.exists(self.tmp_path):
+            return None
+        try:
+            with open(self.path, 'rb') as f:
+                header = json.loads(f.readline().decode('utf-8'))
+                if header.get('version') != CHECKPOINT_VERSION or header.get('key') != self.key:
+                    return None
+                state = pickle.load(f)
+        except (OSError, ValueError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+            return None
+        return {'rows_done': int(header['rows_done']), 'state': state}
+
+    def due(self):
+        """Tells whether the interval has elapsed since the last checkpoint"""
+        return bool(self.interval) and time.monotonic() - self._last >= self.interval
+
+    def save(self, rows_done, state):
+        """
+        Records that the first `rows_done` rows of the partial output are written.
+
+        Call it only once those rows are flushed to disk (the output closed).
+
+        Raises:
+            RasterHandlerError: If the checkpoint can't be written
+        """
+        header = {'version': CHECKPOINT_VERSION, 'key': self.key, 'rows_done': int(rows_done), 'time': time.time()}
+        tmp = self.path + '.tmp'
+        try:
+            with open(tmp, 'wb') as f:
+                f.write(json.dumps(header).encode('utf-8') + b'\n')
+                pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            raise RasterHandlerError(f"Error writing export checkpoint {self.path}: {e}")
+        self._last = time.monotonic()
+
+    def clear(self):
+        if os.path.isfile(self.path):
+            os.remove(self.path)
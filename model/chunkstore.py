@@ -0,0 +1,595 @@
+import os
+import json
+import lzma
+import math
+import shutil
+import threading
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from exceptions import RasterHandlerError
+
+# Chunk stores follow the Zarr v2 layout (a group with a 'bands' array and an
+# optional 'mask' array), so zarr/xarray can open them too; this module only
+# needs numpy and the standard library, so training jobs can read patches
+# without GDAL.
+
+# Chunk compressors (numcodecs ids) and their default levels
+CHUNK_COMPRESSORS = {'zlib': 5, 'lzma': 6, 'none': None}
+DEFAULT_CHUNK_SIZE = 256
+# Names of the arrays of a store
+BANDS_ARRAY = 'bands'
+MASK_ARRAY = 'mask'
+# Decoded chunks kept per open store for overlapping patch reads
+DEFAULT_CACHE_BYTES = 64 * 1024 * 1024
+
+class ChunkStoreOptions:
+    """
+    Layout of a chunked array store export.
+
+    Args:
+        chunk_size (int or tuple): Chunk rows and columns (one value for square chunks)
+        bands_per_chunk (int, optional): Bands stored per chunk (default: all, so a patch is one chunk read)
+        compressor (str): One of CHUNK_COMPRESSORS
+        level (int, optional): Compression level (default: the compressor's)
+        workers (int, optional): Threads compressing chunks (default: CPU count)
+    """
+
+    # Attributes left out of export keys: they don't change the store written
+    EXECUTION_ATTRS = ('workers',)
+
+    def __init__(self, chunk_size=DEFAULT_CHUNK_SIZE, bands_per_chunk=None, compressor='zlib',
+                 level=None, workers=None):
+        if isinstance(chunk_size, int):
+            chunk_size = (chunk_size, chunk_size)
+        elif len(chunk_size) == 1:
+            chunk_size = (chunk_size[0], chunk_size[0])
+        try:
+            self.chunk_rows, self.chunk_cols = (int(v) for v in chunk_size)
+        except (TypeError, ValueError):
+            raise RasterHandlerError(f"Invalid chunk size: {chunk_size}")
+        if self.chunk_rows <= 0 or self.chunk_cols <= 0:
+            raise RasterHandlerError("The chunk size must be positive")
+        if bands_per_chunk is not None and bands_per_chunk <= 0:
+            raise RasterHandlerError("The bands per chunk must be positive")
+        if compressor not in CHUNK_COMPRESSORS:
+            raise RasterHandlerError(f"Invalid chunk compressor: {compressor}. Options: {', '.join(CHUNK_COMPRESSORS)}")
+        self.bands_per_chunk = bands_per_chunk
+        self.compressor = compressor
+        self.level = CHUNK_COMPRESSORS[compressor] if level is None else int(level)
+        self.workers = workers or os.cpu_count() or 1
+
+def _codec(compressor, level):
+    """Zarr compressor entry of a .zarray file"""
+    if compressor == 'zlib':
+        return {'id': 'zlib', 'level': level}
+    if compressor == 'lzma':
+        return {'id': 'lzma', 'format': 1, 'check': -1, 'preset': level, 'filters': None}
+    return None
+
+def _encode(data, codec):
+    raw = np.ascontiguousarray(data).tobytes()
+    if codec is None:
+        return raw
+    if codec['id'] == 'zlib':
+        return zlib.compress(raw, codec.get('level', 5))
+    return lzma.compress(raw, format=lzma.FORMAT_XZ, preset=codec['preset'] if codec.get('preset') is not None else 6)
+
+def _decode(payload, codec):
+    if codec is None:
+        return payload
+    if codec['id'] in ('zlib', 'gzip'):
+        # wbits=47 accepts both zlib and gzip headers
+        return zlib.decompress(payload, 47)
+    if codec['id'] == 'lzma':
+        return lzma.decompress(payload)
+    raise RasterHandlerError(f"Unsupported chunk compressor: {codec['id']}")
+
+def _fill_to_json(value):
+    if value is None:
+        return None
+    value = float(value)
+    if math.isnan(value):
+        return 'NaN'
+    if math.isinf(value):
+        return 'Infinity' if value > 0 else '-Infinity'
+    return int(value) if value.is_integer() else value
+
+def _fill_from_json(value):
+    if isinstance(value, str):
+        return float(value.replace('Infinity', 'inf'))
+    return value
+
+def _write_json(path, content):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(content, f, indent=2)
+
+def _read_json(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def is_chunk_store(path):
+    """Tells whether a path is a chunk store written by this module (or any Zarr v2 group with a 'bands' array)"""
+    return os.path.isfile(os.path.join(path, '.zgroup')) and \
+        os.path.isfile(os.path.join(path, BANDS_ARRAY, '.zarray'))
+
+class _ChunkArray:
+    """Writer of one Zarr v2 array: full rows of chunks are encoded and written in a thread pool"""
+
+    def __init__(self, path, shape, chunks, dtype, fill_value, codec, executor):
+        self.path = path
+        self.shape = shape
+        self.chunks = chunks
+        self.dtype = np.dtype(dtype)
+        self.fill_value = fill_value
+        self.codec = codec
+        self.executor = executor
+        os.makedirs(path)
+        _write_json(os.path.join(path, '.zarray'), {
+            'zarr_format': 2,
+            'shape': list(shape),
+            'chunks': list(chunks),
+            'dtype': self.dtype.str,
+            'compressor': codec,
+            'fill_value': _fill_to_json(fill_value),
+            'order': 'C',
+            'filters': None,
+            'dimension_separator': '.',
+        })
+
+    def _is_fill(self, chunk):
+        if self.fill_value is None:
+            return False
+        if isinstance(self.fill_value, float) and math.isnan(self.fill_value):
+            return bool(np.isnan(chunk).all())
+        return bool((chunk == self.fill_value).all())
+
+    def _write_chunk(self, key, chunk):
+        # Chunks holding only the fill value are not stored (readers fill them in)
+        if self._is_fill(chunk):
+            return 0
+        payload = _encode(chunk, self.codec)
+        with open(os.path.join(self.path, key), 'wb') as f:
+            f.write(payload)
+        return 1
+
+    def submit_row(self, chunk_row, data):
+        """
+        Encodes the chunks of one row of chunks.
+
+        Args:
+            chunk_row (int): Index of the row of chunks
+            data (ndarray): Its pixels, (rows, cols) or (bands, rows, cols); edge chunks are padded
+
+        Returns:
+            list: Futures of the chunk writes
+        """
+        futures = []
+        chunk_cols = self.chunks[-1]
+        band_chunk = self.chunks[0] if data.ndim == 3 else None
+        band_starts = range(0, data.shape[0], band_chunk) if band_chunk else [None]
+        for band_start in band_starts:
+            for col in range(0, data.shape[-1], chunk_cols):
+                if band_start is None:
+                    block = data[:, col:col + chunk_cols]
+                    key = f"{chunk_row}.{col // chunk_cols}"
+                else:
+                    block = data[band_start:band_start + band_chunk, :, col:col + chunk_cols]
+                    key = f"{band_start // band_chunk}.{chunk_row}.{col // chunk_cols}"
+                if block.shape != tuple(self.chunks):
+                    padded = np.full(self.chunks, self.fill_value if self.fill_value is not None else 0,
+                                     dtype=self.dtype)
+                    padded[tuple(slice(0, n) for n in block.shape)] = block
+                    block = padded
+                futures.append(self.executor.submit(self._write_chunk, key, block))
+        return futures
+
+class ChunkStoreWriter:
+    """
+    Writes a chunked array store from windows arriving top to bottom.
+
+    Mirrors the part of a rasterio dataset opened for writing that the
+    streaming export uses (write, write_mask), so windows of any height can
+    be written: rows are buffered until a full row of chunks is complete,
+    whose chunks are then compressed in a thread pool while the next
+    windows are read. At most one row of chunks is being encoded at a time.
+
+    Args:
+        path (str): Store directory (an existing chunk store there is replaced)
+        count, height, width (int): Shape of the exported bands
+        dtype: Data type
+        nodata (float, optional): NoData, used as the fill value of the store
+        options (ChunkStoreOptions, optional): Chunk layout and compression
+        with_mask (bool): Also store a validity mask (255 = valid), as GDAL mask bands are
+    """
+
+    def __init__(self, path, count, height, width, dtype, nodata=None, options=None, with_mask=False):
+        options = options or ChunkStoreOptions()
+        if os.path.exists(path):
+            if not is_chunk_store(path):
+                raise RasterHandlerError(f"Output exists and is not a chunk store: {path}")
+            shutil.rmtree(path)
+        self.path = path
+        self.count, self.height, self.width = count, height, width
+        self.dtype = np.dtype(dtype)
+        self.nodata = nodata
+        self.options = options
+        self.chunk_rows = min(options.chunk_rows, height)
+        chunk_cols = min(options.chunk_cols, width)
+        band_chunk = min(options.bands_per_chunk or count, count)
+        fill_value = nodata if nodata is not None else 0
+        codec = _codec(options.compressor, options.level)
+
+        os.makedirs(path)
+        _write_json(os.path.join(path, '.zgroup'), {'zarr_format': 2})
+        self.attrs = {}
+        self._executor = ThreadPoolExecutor(max_workers=options.workers)
+        self._bands = _ChunkArray(os.path.join(path, BANDS_ARRAY), (count, height, width),
+                                  (band_chunk, self.chunk_rows, chunk_cols), self.dtype, fill_value, codec,
+                                  self._executor)
+        self._mask = None
+        if with_mask:
+            self._mask = _ChunkArray(os.path.join(path, MASK_ARRAY), (height, width),
+                                     (self.chunk_rows, chunk_cols), np.uint8, 255, codec, self._executor)
+        _write_json(os.path.join(self._bands.path, '.zattrs'), {'_ARRAY_DIMENSIONS': ['band', 'y', 'x']})
+
+        # Rows of the current row of chunks not yet complete
+        self._buffer = np.empty((count, self.chunk_rows, width), dtype=self.dtype)
+        self._mask_buffer = np.full((self.chunk_rows, width), 255, dtype=np.uint8) if with_mask else None
+        self._window_mask = None
+        self._next_row = 0
+        self._pending = []
+        self.closed = False
+
+    def _flush(self, rows):
+        """Submits the buffered row of chunks, after the previous one is written"""
+        self._wait()
+        chunk_row = self._next_row // self.chunk_rows
+        data = self._buffer[:, :rows]
+        self._pending = self._bands.submit_row(chunk_row, data)
+        if self._mask is not None:
+            self._pending += self._mask.submit_row(chunk_row, self._mask_buffer[:rows])
+        # The encoders hold views of the buffers: the next rows go to new ones
+        self._buffer = np.empty_like(self._buffer)
+        if self._mask_buffer is not None:
+            self._mask_buffer = np.full_like(self._mask_buffer, 255)
+
+    def _wait(self):
+        pending, self._pending = self._pending, []
+        for future in pending:
+            future.result()
+
+    def write(self, data, window):
+        """
+        Writes a full-width window of all bands.
+
+        Args:
+            data (ndarray): (count, rows, width) pixels
+            window (Window): Its position; windows must follow each other from the top
+        """
+        row_off, rows = int(window.row_off), int(window.height)
+        if int(window.col_off) != 0 or int(window.width) != self.width:
+            raise RasterHandlerError("Chunk stores are written in full-width windows")
+        if row_off != self._next_row:
+            raise RasterHandlerError(f"Chunk store windows must be written in order (expected row {self._next_row})")
+        mask, self._window_mask = self._window_mask, None
+        done = 0
+        while done < rows:
+            start = (row_off + done) % self.chunk_rows
+            take = min(rows - done, self.chunk_rows - start)
+            self._buffer[:, start:start + take] = data[:, done:done + take]
+            if mask is not None and self._mask is not None:
+                self._mask_buffer[start:start + take] = mask[done:done + take]
+            done += take
+            filled = start + take
+            last_row = self._next_row + take >= self.height
+            if filled == self.chunk_rows or last_row:
+                self._flush(filled)
+            self._next_row += take
+
+    def write_mask(self, mask, window):
+        """Sets the validity of the next window written (GDAL convention: 0 = invalid, 255 = valid)"""
+        self._window_mask = mask
+
+    def update_attrs(self, **attrs):
+        """Sets store attributes (georeferencing, band names, statistics), written on close"""
+        self.attrs.update(attrs)
+
+    def close(self):
+        """Waits for the pending chunks and writes the store attributes"""
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self._wait()
+            if self._next_row < self.height:
+                raise RasterHandlerError(f"Chunk store incomplete: {self._next_row} of {self.height} rows written")
+            _write_json(os.path.join(self.path, '.zattrs'), self.attrs)
+        finally:
+            self._executor.shutdown(wait=True)
+
+    def abort(self):
+        """Stops writing and removes the partial store"""
+        self.closed = True
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+class _ArrayReader:
+    """Reads regions of one Zarr v2 array, decoding only the chunks they touch"""
+
+    def __init__(self, path, cache):
+        meta = _read_json(os.path.join(path, '.zarray'))
+        if meta.get('zarr_format') != 2 or meta.get('order', 'C') != 'C' or meta.get('filters'):
+            raise RasterHandlerError(f"Unsupported chunk array: {path}")
+        self.path = path
+        self.shape = tuple(meta['shape'])
+        self.chunks = tuple(meta['chunks'])
+        self.dtype = np.dtype(meta['dtype'])
+        self.fill_value = _fill_from_json(meta.get('fill_value'))
+        self.codec = meta.get('compressor')
+        self.separator = meta.get('dimension_separator', '.')
+        self.cache = cache
+
+    def chunk(self, index):
+        key = self.separator.join(str(i) for i in index)
+        cached = self.cache.get((self.path, key))
+        if cached is not None:
+            return cached
+        try:
+            with open(os.path.join(self.path, key), 'rb') as f:
+                payload = f.read()
+        except FileNotFoundError:
+            chunk = np.full(self.chunks, self.fill_value if self.fill_value is not None else 0, dtype=self.dtype)
+        else:
+            chunk = np.frombuffer(_decode(payload, self.codec), dtype=self.dtype).reshape(self.chunks)
+        self.cache.put((self.path, key), chunk)
+        return chunk
+
+    def read(self, region):
+        """
+        Reads a region given as one (start, stop) per dimension.
+
+        Returns:
+            ndarray: A new array with the region's values
+        """
+        out = np.empty([stop - start for start, stop in region], dtype=self.dtype)
+        ranges = [range(start // size, (stop - 1) // size + 1) if stop > start else range(0)
+                  for (start, stop), size in zip(region, self.chunks)]
+
+        def visit(dim, index):
+            if dim == len(region):
+                chunk = self.chunk(index)
+                src, dst = [], []
+                for i, (start, stop), size in zip(index, region, self.chunks):
+                    lo, hi = max(start, i * size), min(stop, (i + 1) * size)
+                    src.append(slice(lo - i * size, hi - i * size))
+                    dst.append(slice(lo - start, hi - start))
+                out[tuple(dst)] = chunk[tuple(src)]
+                return
+            for i in ranges[dim]:
+                visit(dim + 1, index + (i,))
+
+        visit(0, ())
+        return out
+
+class _ChunkCache:
+    """LRU of decoded chunks, bounded in bytes and shared by the arrays of a store"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._chunks = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            chunk = self._chunks.get(key)
+            if chunk is not None:
+                self._chunks.move_to_end(key)
+            return chunk
+
+    def put(self, key, chunk):
+        if chunk.nbytes > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._chunks:
+                return
+            self._chunks[key] = chunk
+            self.nbytes += chunk.nbytes
+            while self.nbytes > self.max_bytes:
+                _, evicted = self._chunks.popitem(last=False)
+                self.nbytes -= evicted.nbytes
+
+class ChunkStore:
+    """
+    Random-access reader of a chunk store, for loading training patches.
+
+    Only numpy and the standard library are used, so it works in worker
+    processes without GDAL; a store can be opened once per worker (it
+    holds no open files, so it can also be pickled to workers).
+
+    Attributes:
+        count, height, width (int): Shape of the bands
+        dtype (numpy.dtype): Data type
+        chunks (tuple): Chunk shape (bands, rows, cols)
+        band_names (list): Band names
+        crs (str): CRS as WKT (None when not georeferenced)
+        transform (tuple): Affine coefficients (a, b, c, d, e, f) of the pixel grid
+        nodata (float): NoData value (None when not set)
+        scales, offsets (list): Band scales/offsets (physical = stored * scale + offset)
+        statistics (list): Per-band statistics computed during the export (may be empty)
+        attrs (dict): All store attributes
+
+    Args:
+        path (str): Store directory
+        cache_bytes (int): Bytes of decoded chunks kept for overlapping reads
+
+    Raises:
+        RasterHandlerError: If the path is not a chunk store
+    """
+
+    def __init__(self, path, cache_bytes=DEFAULT_CACHE_BYTES):
+        if not is_chunk_store(path):
+            raise RasterHandlerError(f"Not a chunk store: {path}")
+        self.path = path
+        self.cache_bytes = cache_bytes
+        self._open()
+
+    def _open(self):
+        cache = _ChunkCache(self.cache_bytes)
+        self._bands = _ArrayReader(os.path.join(self.path, BANDS_ARRAY), cache)
+        mask_path = os.path.join(self.path, MASK_ARRAY)
+        self._mask = _ArrayReader(mask_path, cache) if os.path.isdir(mask_path) else None
+        attrs_path = os.path.join(self.path, '.zattrs')
+        self.attrs = _read_json(attrs_path) if os.path.isfile(attrs_path) else {}
+
+        self.count, self.height, self.width = self._bands.shape
+        self.dtype = self._bands.dtype
+        self.chunks = self._bands.chunks
+        self.band_names = self.attrs.get('band_names') or [f"Band {i}" for i in range(1, self.count + 1)]
+        self.crs = self.attrs.get('crs')
+        self.transform = tuple(self.attrs['transform']) if self.attrs.get('transform') else (1.0, 0.0, 0.0, 0.0, 1.0, 0.0)
+        self.nodata = _fill_from_json(self.attrs.get('nodata'))
+        self.scales = self.attrs.get('scales') or [1.0] * self.count
+        self.offsets = self.attrs.get('offsets') or [0.0] * self.count
+        self.statistics = self.attrs.get('statistics') or []
+
+    def __getstate__(self):
+        return {'path': self.path, 'cache_bytes': self.cache_bytes}
+
+    def __setstate__(self, state):
+        self.path = state['path']
+        self.cache_bytes = state['cache_bytes']
+        self._open()
+
+    @property
+    def shape(self):
+        return (self.count, self.height, self.width)
+
+    @property
+    def has_mask(self):
+        return self._mask is not None
+
+    def _band_positions(self, bands):
+        if bands is None:
+            return list(range(self.count))
+        positions = []
+        for band in bands:
+            if isinstance(band, str):
+                if band not in self.band_names:
+                    raise RasterHandlerError(f"Unknown band: {band}. Available: {', '.join(self.band_names)}")
+                positions.append(self.band_names.index(band))
+            elif 1 <= band <= self.count:
+                positions.append(band - 1)
+            else:
+                raise RasterHandlerError(f"Invalid band: {band}. Available bands: 1-{self.count}")
+        return positions
+
+    def _check_window(self, window):
+        if window is None:
+            return 0, 0, self.width, self.height
+        col_off, row_off, width, height = (int(v) for v in window)
+        if width <= 0 or height <= 0 or col_off < 0 or row_off < 0 or \
+                col_off + width > self.width or row_off + height > self.height:
+            raise RasterHandlerError(f"Window {tuple(window)} is outside the store ({self.width}x{self.height})")
+        return col_off, row_off, width, height
+
+    def read(self, bands=None, window=None):
+        """
+        Reads bands of a pixel window.
+
+        Args:
+            bands (list, optional): 1-based band indices or band names (default: all)
+            window (tuple, optional): (col_off, row_off, width, height) (default: everything)
+
+        Returns:
+            ndarray: (bands, height, width) stored values
+        """
+        positions = self._band_positions(bands)
+        col_off, row_off, width, height = self._check_window(window)
+        rows, cols = (row_off, row_off + height), (col_off, col_off + width)
+        # Contiguous band ranges are read in one pass over the chunks
+        if positions == list(range(positions[0], positions[-1] + 1)):
+            return self._bands.read([(positions[0], positions[-1] + 1), rows, cols])
+        return np.stack([self._bands.read([(p, p + 1), rows, cols])[0] for p in positions])
+
+    def read_mask(self, window=None):
+        """
+        Returns the validity of a pixel window (True = valid): the stored mask,
+        otherwise pixels that aren't NoData (or NaN) in any band.
+        """
+        col_off, row_off, width, height = self._check_window(window)
+        if self._mask is not None:
+            return self._mask.read([(row_off, row_off + height), (col_off, col_off + width)]) > 0
+        data = self.read(window=(col_off, row_off, width, height))
+        valid = np.ones((height, width), dtype=bool)
+        if np.issubdtype(self.dtype, np.floating):
+            valid &= np.isfinite(data).all(axis=0)
+        if self.nodata is not None and not (isinstance(self.nodata, float) and math.isnan(self.nodata)):
+            valid &= (data != self.nodata).all(axis=0)
+        return valid
+
+    def read_physical(self, bands=None, window=None):
+        """Reads a window as float32 physical values (scales/offsets applied, invalid pixels NaN)"""
+        positions = self._band_positions(bands)
+        data = self.read([p + 1 for p in positions], window).astype(np.float32)
+        for i, p in enumerate(positions):
+            if self.scales[p] != 1.0:
+                data[i] *= self.scales[p]
+            if self.offsets[p] != 0.0:
+                data[i] += self.offsets[p]
+        data[:, ~self.read_mask(window)] = np.nan
+        return data
+
+    def patch(self, row, col, size, bands=None):
+        """Reads a square (or (rows, cols)) patch whose top-left pixel is (row, col)"""
+        rows, cols = (size, size) if isinstance(size, int) else size
+        return self.read(bands, (col, row, cols, rows))
+
+    def random_windows(self, size, n, seed=None, aligned=False):
+        """
+        Draws random patch windows inside the store.
+
+        Args:
+            size (int or tuple): Patch size (rows, cols)
+            n (int): Number of windows
+            seed (int, optional): Random seed
+            aligned (bool): Start patches on chunk boundaries, so each reads the fewest chunks
+
+        Returns:
+            list: (col_off, row_off, width, height) windows
+        """
+        rows, cols = (size, size) if isinstance(size, int) else size
+        if rows > self.height or cols > self.width:
+            raise RasterHandlerError(f"Patch {rows}x{cols} is larger than the store ({self.height}x{self.width})")
+        rng = np.random.default_rng(seed)
+        if aligned:
+            step_rows, step_cols = self.chunks[1], self.chunks[2]
+            row_starts = np.arange(0, self.height - rows + 1, step_rows)
+            col_starts = np.arange(0, self.width - cols + 1, step_cols)
+            row_offs, col_offs = rng.choice(row_starts, n), rng.choice(col_starts, n)
+        else:
+            row_offs = rng.integers(0, self.height - rows + 1, n)
+            col_offs = rng.integers(0, self.width - cols + 1, n)
+        return [(int(c), int(r), cols, rows) for r, c in zip(row_offs, col_offs)]
+
+    def window_transform(self, window):
+        """Affine coefficients (a, b, c, d, e, f) of a window's pixel grid"""
+        col_off, row_off = int(window[0]), int(window[1])
+        a, b, c, d, e, f = self.transform
+        return (a, b, c + a * col_off + b * row_off, d, e, f + d * col_off + e * row_off)
+
+def open_store(path, cache_bytes=DEFAULT_CACHE_BYTES):
+    """Opens a chunk store for reading (see ChunkStore)"""
+    return ChunkStore(path, cache_bytes)
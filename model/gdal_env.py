@@ -0,0 +1,274 @@
+import os
+import json
+import threading
+from contextlib import contextmanager
+import rasterio
+from exceptions import RasterHandlerError
+from logger import get_logger
+
+# Tuned GDAL configuration per operation type (GDAL_CACHEMAX in MB)
+ENV_PROFILES = {
+    # Decimated reads of a few blocks at a time (GUI preview, tile server)
+    'preview': {
+        'GDAL_CACHEMAX': 256,
+        'GDAL_NUM_THREADS': 'ALL_CPUS',
+        'VSI_CACHE': 'TRUE',
+        'VSI_CACHE_SIZE': 32 * 1024 * 1024,
+    },
+    # Streaming exports: every block is decoded and compressed once, using all cores
+    'export': {
+        'GDAL_CACHEMAX': 512,
+        'GDAL_NUM_THREADS': 'ALL_CPUS',
+        'GDAL_TIFF_INTERNAL_MASK': 'TRUE',
+        'VSI_CACHE': 'FALSE',
+    },
+    # Full scans (statistics, histograms, issue checks): blocks are never reread,
+    # so a small block cache and a read-ahead cache are enough
+    'statistics': {
+        'GDAL_CACHEMAX': 64,
+        'GDAL_NUM_THREADS': 'ALL_CPUS',
+        'VSI_CACHE': 'TRUE',
+        'VSI_CACHE_SIZE': 64 * 1024 * 1024,
+    },
+}
+# Key of a config file section applied to every profile
+ALL_PROFILES = 'all'
+# Config file with overrides ({"all": {...}, "export": {...}}), relocatable with IGCV_GDAL_CONFIG
+GDAL_CONFIG_ENV = 'IGCV_GDAL_CONFIG'
+DEFAULT_CONFIG_PATH = os.path.join(os.path.expanduser('~'), '.igcv', 'gdal_env.json')
+
+_lock = threading.Lock()
+# Config file chosen at runtime (--gdal-config-file)
+_config_path = None
+# Overrides set at runtime (CLI flags, GUI), per profile or for ALL_PROFILES
+_overrides = {}
+# Parsed config file, reloaded when its modification time changes
+_config_cache = {'path': None, 'mtime': None, 'config': {}}
+# Last settings logged per profile
+_logged = {}
+
+def config_path():
+    """Returns the config file path (set_config_path, IGCV_GDAL_CONFIG or ~/.igcv/gdal_env.json)"""
+    return _config_path or os.environ.get(GDAL_CONFIG_ENV) or DEFAULT_CONFIG_PATH
+
+def set_config_path(path):
+    """
+    Uses another config file for the rest of the process.
+
+    Raises:
+        RasterHandlerError: If the file doesn't exist or is invalid
+    """
+    global _config_path
+    if not os.path.isfile(path):
+        raise RasterHandlerError(f"GDAL configuration not found: {path}")
+    load_env_config(path)
+    _config_path = path
+
+def _check_sections(config, source):
+    if not isinstance(config, dict):
+        raise RasterHandlerError(f"Invalid GDAL configuration in {source}: expected an object of profiles")
+    for section, options in config.items():
+        if section != ALL_PROFILES and section not in ENV_PROFILES:
+            raise RasterHandlerError(f"Unknown GDAL profile in {source}: {section}. "
+                                     f"Options: {ALL_PROFILES}, {', '.join(ENV_PROFILES)}")
+        if not isinstance(options, dict):
+            raise RasterHandlerError(f"Invalid GDAL profile '{section}' in {source}: expected an object of options")
+    return config
+
+def load_env_config(path=None):
+    """
+    Reads a GDAL configuration file.
+
+    Args:
+        path (str, optional): JSON file (default: config_path())
+
+    Returns:
+        dict: Options per profile ({} when the file doesn't exist)
+
+    Raises:
+        RasterHandlerError: If the file can't be parsed or names unknown profiles
+    """
+    path = path or config_path()
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return {}
+    with _lock:
+        if _config_cache['path'] == path and _config_cache['mtime'] == mtime:
+            return _config_cache['config']
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            config = _check_sections(json.load(f), path)
+    except (OSError, ValueError) as e:
+        raise RasterHandlerError(f"Error reading GDAL configuration {path}: {e}")
+    with _lock:
+        _config_cache.update(path=path, mtime=mtime, config=config)
+    return config
+
+def save_env_config(config, path=None):
+    """
+    Writes a GDAL configuration file (used by the settings dialog).
+
+    Args:
+        config (dict): Options per profile
+        path (str, optional): JSON file (default: config_path())
+
+    Raises:
+        RasterHandlerError: If the config is invalid or can't be written
+    """
+    path = path or config_path()
+    _check_sections(config, path)
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(config, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        raise RasterHandlerError(f"Error writing GDAL configuration {path}: {e}")
+
+def parse_env_options(items):
+    """
+    Parses KEY=VALUE strings (e.g. from --gdal-config) into options.
+
+    An empty value (KEY=) drops the option, leaving the GDAL default.
+
+    Raises:
+        RasterHandlerError: If an item has no '='
+    """
+    options = {}
+    for item in items or []:
+        key, sep, value = item.partition('=')
+        if not sep or not key.strip():
+            raise RasterHandlerError(f"Invalid GDAL option: {item}. Use KEY=VALUE")
+        options[key.strip().upper()] = value.strip()
+    return options
+
+def set_env_overrides(options, profile=ALL_PROFILES):
+    """
+    Overrides options for the rest of the process (CLI flags, GUI).
+
+    Args:
+        options (dict): GDAL configuration options; None or '' drops an option
+        profile (str): Profile name, or ALL_PROFILES
+    """
+    if profile != ALL_PROFILES and profile not in ENV_PROFILES:
+        raise RasterHandlerError(f"Unknown GDAL profile: {profile}. Options: {ALL_PROFILES}, {', '.join(ENV_PROFILES)}")
+    with _lock:
+        _overrides.setdefault(profile, {}).update(options)
+
+def clear_env_overrides():
+    with _lock:
+        _overrides.clear()
+
+def env_options(profile):
+    """
+    Returns the settings of a profile: ENV_PROFILES, then the config file
+    ('all' section, then the profile's), then the runtime overrides.
+
+    Returns:
+        dict: GDAL configuration options
+    """
+    if profile not in ENV_PROFILES:
+        raise RasterHandlerError(f"Unknown GDAL profile: {profile}. Options: {', '.join(ENV_PROFILES)}")
+    options = dict(ENV_PROFILES[profile])
+    config = load_env_config()
+    with _lock:
+        layers = [config.get(ALL_PROFILES, {}), config.get(profile, {}),
+                  _overrides.get(ALL_PROFILES, {}), _overrides.get(profile, {})]
+        for layer in layers:
+            options.update(layer)
+    return {key: value for key, value in options.items() if value is not None and value != ''}
+
+def configured_settings(config=None):
+    """
+    Returns the settings of every profile from ENV_PROFILES and the config
+    file only (what the settings dialog edits), without runtime overrides.
+    """
+    config = load_env_config() if config is None else config
+    settings = {}
+    for profile, defaults in ENV_PROFILES.items():
+        options = dict(defaults)
+        options.update(config.get(ALL_PROFILES, {}))
+        options.update(config.get(profile, {}))
+        settings[profile] = {key: value for key, value in options.items() if value is not None and value != ''}
+    return settings
+
+def config_for_settings(settings, config=None):
+    """
+    Builds the config file that gives each profile the given settings: only
+    the differences from ENV_PROFILES and the 'all' section are stored, and
+    removed options are stored empty (GDAL default).
+
+    Args:
+        settings (dict): Options per profile
+        config (dict, optional): Current config file (its 'all' section is kept)
+
+    Returns:
+        dict: The config to save with save_env_config
+    """
+    config = load_env_config() if config is None else config
+    shared = config.get(ALL_PROFILES, {})
+    new_config = {ALL_PROFILES: dict(shared)} if shared else {}
+    for profile, options in settings.items():
+        base = dict(ENV_PROFILES[profile])
+        base.update(shared)
+        section = {key: value for key, value in options.items() if str(base.get(key)) != str(value)}
+        section.update({key: '' for key, value in base.items()
+                        if key not in options and value is not None and value != ''})
+        if section:
+            new_config[profile] = section
+    return new_config
+
+def active_settings():
+    """Returns the effective options of every profile (for reports and dry-runs)"""
+    return {profile: env_options(profile) for profile in ENV_PROFILES}
+
+def _record(profile, options):
+    """Logs a profile's settings the first time they're used and whenever they change"""
+    settings = tuple(sorted((key, str(value)) for key, value in options.items()))
+    with _lock:
+        if _logged.get(profile) == settings:
+            return
+        _logged[profile] = settings
+    get_logger('igcv_raster_utility.gdal_env').info(
+        "GDAL environment '%s': %s", profile, ", ".join(f"{key}={value}" for key, value in settings))
+
+@contextmanager
+def gdal_env(profile, **options):
+    """
+    Runs a block with the GDAL configuration of an operation type.
+
+    Options are set per thread by rasterio, so concurrent operations keep
+    their own profiles; GDAL_CACHEMAX is the exception (GDAL has one block
+    cache per process), so the last profile entered sizes it. Extra keyword
+    options (settings an operation needs to be correct) take precedence.
+
+    Args:
+        profile (str): One of ENV_PROFILES
+        **options: Additional GDAL configuration options
+    """
+    settings = env_options(profile)
+    settings.update(options)
+    _record(profile, settings)
+    with rasterio.Env(**settings):
+        yield settings
+
+def open_raster(filepath, profile, *args, **kwargs):
+    """
+    Opens a dataset with the GDAL configuration of an operation type.
+
+    For generators, which must not keep an environment active while they
+    are suspended: the options GDAL reads when a dataset is opened (decoding
+    threads, VSI caching) stay with the returned dataset.
+
+    Args:
+        filepath (str): Path to the raster file
+        profile (str): One of ENV_PROFILES
+        *args, **kwargs: Passed to rasterio.open
+
+    Returns:
+        The open rasterio dataset
+    """
+    with gdal_env(profile):
+        return rasterio.open(filepath, *args, **kwargs)
@@ -0,0 +1,203 @@
+import os
+import threading
+from contextlib import contextmanager
+import numpy as np
+from model.windowing import DEFAULT_MEMORY_BUDGET, rows_for_budget
+
+# Windows of one operation alive at the same time, per operation type
+OPERATION_BUFFERS = {
+    'read': 1,        # windows read and consumed one at a time (histograms, statistics)
+    'export': 1,      # each window is read, processed and written before the next
+    'scan': 2,        # issue scans keep the window and its validity mask
+    'stack': 2,       # the next window is prefetched while the current one is written
+    'correct': 1,     # per in-flight window of the execution backend
+}
+# Part of the budget left to the GDAL warper when an operation reprojects
+WARP_SHARE = 0.5
+# Seconds between cancellation checks while waiting for memory
+WAIT_INTERVAL = 0.1
+
+class MemoryGovernor:
+    """
+    Process-wide budget for the pixel data of windowed operations.
+
+    Operations reserve the bytes of each window before reading it and
+    release them when the window is written, so concurrent operations (the
+    tile server, the asyncio facade, parallel backends) wait for each other
+    instead of adding up past the budget. A reservation larger than the
+    whole budget is reduced to it: it runs alone instead of never running.
+
+    Args:
+        budget (int): Maximum bytes reserved at once
+    """
+
+    def __init__(self, budget=DEFAULT_MEMORY_BUDGET):
+        self.budget = int(budget)
+        self.in_use = 0
+        self.peak = 0
+        self._condition = threading.Condition()
+
+    def _clamp(self, nbytes):
+        return max(0, min(int(nbytes), self.budget))
+
+    def acquire(self, nbytes, blocking=True, cancel_event=None):
+        """
+        Reserves `nbytes`, waiting while the budget is used by other windows.
+
+        Args:
+            nbytes (int): Bytes to reserve
+            blocking (bool): Wait for the memory; otherwise return 0 at once when it's not free
+            cancel_event (threading.Event, optional): Ends the wait when set (nothing is reserved)
+
+        Returns:
+            int: Bytes reserved, to be passed to release() (0 when nothing was reserved)
+        """
+        nbytes = self._clamp(nbytes)
+        if nbytes == 0:
+            return 0
+        with self._condition:
+            while self.in_use + nbytes > self.budget:
+                if not blocking or (cancel_event is not None and cancel_event.is_set()):
+                    return 0
+                self._condition.wait(WAIT_INTERVAL)
+            self.in_use += nbytes
+            self.peak = max(self.peak, self.in_use)
+            return nbytes
+
+    def release(self, nbytes):
+        if not nbytes:
+            return
+        with self._condition:
+            self.in_use -= nbytes
+            self._condition.notify_all()
+
+    @contextmanager
+    def reserve(self, nbytes, cancel_event=None):
+        """Context manager holding a reservation of `nbytes` while the block runs"""
+        granted = self.acquire(nbytes, cancel_event=cancel_event)
+        try:
+            yield granted
+        finally:
+            self.release(granted)
+
+    def resize(self, budget):
+        """Changes the budget (reservations already held are kept)"""
+        with self._condition:
+            self.budget = int(budget)
+            self._condition.notify_all()
+
+_governor = MemoryGovernor(DEFAULT_MEMORY_BUDGET)
+
+def get_governor():
+    """Returns the process-wide governor (budget from IGCV_MEMORY_BUDGET, in MB, or 256 MB)"""
+    return _governor
+
+def set_memory_budget(budget):
+    """
+    Sets the process-wide memory budget (e.g. from a --memory-budget flag).
+
+    Args:
+        budget (int): Budget in bytes
+    """
+    _governor.resize(budget)
+
+def governed(windows, window_bytes, cancel_event=None, governor=None):
+    """
+    Yields windows one at a time, each with a reservation of `window_bytes`
+    held until the next window is requested (or the loop ends).
+
+    A set `cancel_event` ends a wait without a reservation, so the caller's
+    own cancellation check runs.
+
+    Args:
+        windows (iterable): Windows to process
+        window_bytes (int): Bytes of pixel data held per window
+        cancel_event (threading.Event, optional): Ends waits for memory when set
+        governor (MemoryGovernor, optional): Defaults to the process-wide governor
+    """
+    governor = governor or _governor
+    granted = 0
+    try:
+        for window in windows:
+            governor.release(granted)
+            granted = governor.acquire(window_bytes, cancel_event=cancel_event)
+            yield window
+    finally:
+        governor.release(granted)
+
+class WindowPlan:
+    """
+    Window geometry and parallelism of an operation within a memory budget.
+
+    Attributes:
+        rows (int): Rows per window (aligned to the source blocks when possible)
+        workers (int): Workers of the execution backend (1 for 'serial')
+        in_flight (int): Windows alive at the same time
+        window_bytes (int): Bytes of pixel data of one full window
+    """
+
+    def __init__(self, rows, workers, in_flight, window_bytes):
+        self.rows = rows
+        self.workers = workers
+        self.in_flight = in_flight
+        self.window_bytes = window_bytes
+
+    def with_rows(self, rows):
+        """Returns the same plan with shorter windows (bytes scaled accordingly)"""
+        if rows == self.rows:
+            return self
+        return WindowPlan(rows, self.workers, self.in_flight, self.window_bytes * rows // max(1, self.rows))
+
+    def __repr__(self):
+        return (f"WindowPlan(rows={self.rows}, workers={self.workers}, "
+                f"in_flight={self.in_flight}, window_bytes={self.window_bytes})")
+
+def plan_windows(width, band_count, dtype, memory_budget=None, block_height=1, operation='export',
+                 backend='serial', workers=None, reproject=False, height=None):
+    """
+    Derives window size and parallelism from the data layout and a memory budget.
+
+    Parallel backends keep 2 * workers + 1 windows in flight; the number
+    of workers is reduced until every in-flight window can still hold a
+    whole row of source blocks, so more workers never means smaller,
+    misaligned windows that decode blocks twice.
+
+    Args:
+        width (int): Window width in pixels
+        band_count (int): Bands held per window
+        dtype: Data type of the window arrays (the widest one)
+        memory_budget (int, optional): Budget in bytes (default: the process-wide budget)
+        block_height (int): Source block height
+        operation (str): One of OPERATION_BUFFERS
+        backend (str): Execution backend ('serial', 'thread' or 'process')
+        workers (int, optional): Requested workers (default: CPU count)
+        reproject (bool): Whether part of the budget goes to the GDAL warper
+        height (int, optional): Region height; windows are not made taller than it
+
+    Returns:
+        WindowPlan: The plan
+    """
+    budget = memory_budget or _governor.budget
+    if reproject:
+        budget = int(budget * (1 - WARP_SHARE))
+    buffers = OPERATION_BUFFERS.get(operation, 1)
+    row_bytes = max(1, width * band_count * np.dtype(dtype).itemsize)
+
+    if backend == 'serial':
+        workers = 1
+        in_flight = 1
+    else:
+        workers = workers or os.cpu_count() or 1
+        min_rows = max(1, block_height)
+        if height is not None:
+            min_rows = min(min_rows, height)
+        # Largest worker count whose in-flight windows still fit a block row each
+        affordable = budget // (row_bytes * min_rows * buffers)
+        workers = max(1, min(workers, (affordable - 1) // 2))
+        in_flight = 2 * workers + 1
+
+    rows = rows_for_budget(width, band_count, dtype, budget, block_height=block_height,
+                           buffers=buffers * in_flight)
+    if height is not None:
+        rows = min(rows, max(1, height))
+    return WindowPlan(rows, workers, in_flight, rows * row_bytes * buffers)
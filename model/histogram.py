@@ -0,0 +1,551 @@
+import os
+import hashlib
+import threading
+import xml.etree.ElementTree as ET
+from collections import OrderedDict
+from contextlib import closing
+import numpy as np
+from rasterio.enums import Resampling
+from exceptions import RasterHandlerError
+from model.gdal_env import open_raster
+from model.masks import read_validity_mask
+from model.governor import plan_windows, governed
+from model.windowing import DEFAULT_MEMORY_BUDGET, iter_row_windows, count_windows
+
+# Integer types with one histogram bin per possible value
+HISTOGRAM_DTYPES = (np.uint8, np.int8, np.uint16, np.int16)
+
+# Maximum bytes of histograms kept in the cache (512 KB per 16-bit band)
+HISTOGRAM_CACHE_SIZE = 64 * 1024 * 1024
+
+# Number of bins of the histograms shown in the interface
+DISPLAY_BINS = 256
+
+# Largest side of the approximation read when a band has no overviews
+APPROXIMATION_SIZE = 512
+
+# Directory where exact display histograms are persisted between sessions
+HISTOGRAM_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.igcv', 'histograms')
+
+def supports_exact_histogram(dtype):
+    """Tells whether a dtype gets a full one-bin-per-value histogram"""
+    return np.dtype(dtype) in [np.dtype(d) for d in HISTOGRAM_DTYPES]
+
+class BandHistogram:
+    """
+    Exact histogram of an 8/16-bit integer band (one bin per possible value).
+
+    Bins are ordered by value: bin `i` counts the value `offset + i`, where
+    `offset` is the smallest value of the dtype (0 for unsigned types).
+    Only valid pixels are counted.
+    """
+
+    def __init__(self, counts, dtype):
+        self.counts = counts
+        self.dtype = np.dtype(dtype)
+        self.offset = int(np.iinfo(self.dtype).min)
+        self._cumulative = None
+
+    @classmethod
+    def from_array(cls, values, valid=None):
+        """
+        Builds the histogram of an array with np.bincount.
+
+        Args:
+            values (ndarray): 8/16-bit integer values
+            valid (ndarray, optional): Boolean validity mask (True = valid)
+
+        Returns:
+            BandHistogram: Histogram of the valid values
+        """
+        dtype = values.dtype
+        bins = 1 << (dtype.itemsize * 8)
+        # Signed values are counted through their unsigned view (no converted copy)
+        index = values.view(np.dtype(f'uint{dtype.itemsize * 8}'))
+        index = index[valid] if valid is not None else index.ravel()
+        counts = np.bincount(index, minlength=bins)
+        if np.issubdtype(dtype, np.signedinteger):
+            # Unsigned view order is 0..max, min..-1; rotate to value order
+            counts = np.roll(counts, bins // 2)
+        return cls(counts, dtype)
+
+    def add(self, other):
+        """Accumulates another histogram of the same dtype (e.g. of the next window)"""
+        self.counts += other.counts
+        self._cumulative = None
+
+    @property
+    def nbytes(self):
+        return self.counts.nbytes
+
+    @property
+    def total(self):
+        """Number of counted pixels"""
+        return int(self.cumulative[-1])
+
+    @property
+    def cumulative(self):
+        if self._cumulative is None:
+            self._cumulative = np.cumsum(self.counts)
+        return self._cumulative
+
+    def values(self):
+        """Returns the value of every bin"""
+        return np.arange(self.counts.size, dtype=np.int64) + self.offset
+
+    def without_zero(self):
+        """Returns a copy that ignores the pixels equal to 0"""
+        counts = self.counts.copy()
+        counts[-self.offset] = 0
+        return BandHistogram(counts, self.dtype)
+
+    def percentiles(self, q):
+        """
+        Derives percentiles from the cumulative histogram.
+
+        Uses the same linear interpolation as np.percentile, so the results
+        match sorting the counted values.
+
+        Args:
+            q (sequence): Percentiles in [0, 100]
+
+        Returns:
+            list: One float per percentile, or None when the histogram is empty
+        """
+        total = self.total
+        if total == 0:
+            return None
+
+        cumulative = self.cumulative
+        results = []
+        for p in q:
+            rank = p / 100.0 * (total - 1)
+            lower = int(np.floor(rank))
+            upper = min(lower + 1, total - 1)
+            # First bin whose cumulative count exceeds the rank holds that sorted position
+            lower_value = np.searchsorted(cumulative, lower, side='right') + self.offset
+            upper_value = np.searchsorted(cumulative, upper, side='right') + self.offset
+            results.append(float(lower_value + (upper_value - lower_value) * (rank - lower)))
+        return results
+
+    def min_max(self):
+        """Returns the smallest and largest counted values, or None when empty"""
+        nonzero = np.flatnonzero(self.counts)
+        if nonzero.size == 0:
+            return None
+        return int(nonzero[0] + self.offset), int(nonzero[-1] + self.offset)
+
+    def to_result(self, bins=None):
+        """
+        Regroups the histogram into at most `bins` equal bins over its value range.
+
+        Args:
+            bins (int, optional): Maximum number of bins (default: DISPLAY_BINS)
+
+        Returns:
+            HistogramResult: Exact histogram (one bin per value when the range is narrow)
+        """
+        value_range = self.min_max()
+        if value_range is None:
+            return HistogramResult(np.zeros(1, dtype=np.int64), np.array([-0.5, 0.5]), False)
+        low, high, n_bins = _display_range(self.dtype, value_range[0], value_range[1], bins or DISPLAY_BINS)
+        nonempty = np.flatnonzero(self.counts)
+        counts, edges = np.histogram(nonempty + self.offset, bins=n_bins, range=(low, high),
+                                     weights=self.counts[nonempty])
+        return HistogramResult(counts.astype(np.int64), edges, False)
+
+_cache = OrderedDict()
+_cache_bytes = 0
+_cache_lock = threading.Lock()
+
+def _cache_key(src, band_idx, window, out_shape):
+    try:
+        stat = os.stat(src.name)
+        version = (stat.st_size, stat.st_mtime)
+    except OSError:
+        version = None
+    window_key = None
+    if window is not None:
+        window_key = (int(window.col_off), int(window.row_off), int(window.width), int(window.height))
+    return (src.name, version, band_idx, window_key, tuple(out_shape) if out_shape else None)
+
+def clear_cache():
+    """Empties the histogram cache"""
+    global _cache_bytes
+    with _cache_lock:
+        _cache.clear()
+        _cache_bytes = 0
+
+def _cache_get(key):
+    with _cache_lock:
+        histogram = _cache.get(key)
+        if histogram is not None:
+            _cache.move_to_end(key)
+        return histogram
+
+def _cache_put(key, histogram):
+    global _cache_bytes
+    if histogram.nbytes > HISTOGRAM_CACHE_SIZE:
+        return histogram
+    with _cache_lock:
+        if key in _cache:
+            return _cache[key]
+        _cache[key] = histogram
+        _cache_bytes += histogram.nbytes
+        while _cache_bytes > HISTOGRAM_CACHE_SIZE and _cache:
+            _, old = _cache.popitem(last=False)
+            _cache_bytes -= old.nbytes
+    return histogram
+
+def _iter_valid_strips(src, band_idx, window=None, memory_budget=DEFAULT_MEMORY_BUDGET):
+    """Yields (values, valid, done, total) for the full-resolution strips of a band (valid is None when all valid)"""
+    if window is not None:
+        col_off, row_off = int(window.col_off), int(window.row_off)
+        width, height = int(window.width), int(window.height)
+    else:
+        col_off, row_off, width, height = 0, 0, src.width, src.height
+    plan = plan_windows(width, 1, src.dtypes[band_idx - 1], memory_budget,
+                        block_height=src.block_shapes[band_idx - 1][0], operation='read', height=height)
+    total = count_windows(height, plan.rows)
+    strips = iter_row_windows(width, height, plan.rows, col_off, row_off)
+    with closing(governed(strips, plan.window_bytes)) as strips:
+        for done, strip in enumerate(strips, start=1):
+            values = src.read(band_idx, window=strip)
+            validity = read_validity_mask(src, [band_idx], window=strip, data=[values], use_cache=False)
+            yield values, (None if validity.all_valid else validity.to_array()), done, total
+
+def get_band_histogram(src, band_idx, window=None, out_shape=None, data=None, valid=None,
+                       memory_budget=DEFAULT_MEMORY_BUDGET, progress_callback=None, cancel_event=None):
+    """
+    Returns the exact histogram of an 8/16-bit integer band, reusing the cache.
+
+    Histograms are cached per file version, band, window and read shape, so
+    changing the stretch percentiles or the band combination doesn't re-read
+    or re-sort pixels.
+
+    Args:
+        src: Open rasterio dataset
+        band_idx (int): 1-based band index
+        window (Window, optional): Region of the band (default: full extent)
+        out_shape (tuple, optional): (rows, cols) of a decimated (averaged) read, as in the preview
+        data (ndarray, optional): Already read values for this window and shape
+        valid (ndarray, optional): Validity of `data` (True = valid)
+        memory_budget (int): Maximum bytes read at once when the band is scanned
+        progress_callback (callable, optional): Called with (done, total) after each strip
+        cancel_event (threading.Event, optional): Stops a full-resolution scan when set
+
+    Returns:
+        BandHistogram: Histogram of the valid pixels, or None if the scan was cancelled
+    """
+    key = _cache_key(src, band_idx, window, out_shape)
+    histogram = _cache_get(key)
+    if histogram is not None:
+        return histogram
+
+    if data is not None:
+        histogram = BandHistogram.from_array(data, valid)
+    elif out_shape is not None:
+        data = src.read(band_idx, window=window, out_shape=tuple(out_shape), resampling=Resampling.average)
+        validity = read_validity_mask(src, [band_idx], window=window, out_shape=out_shape, data=[data])
+        histogram = BandHistogram.from_array(data, None if validity.all_valid else validity.to_array())
+    else:
+        # Full resolution: accumulated strip by strip
+        for values, strip_valid, done, total in _iter_valid_strips(src, band_idx, window, memory_budget):
+            if cancel_event is not None and cancel_event.is_set():
+                return None
+            strip_histogram = BandHistogram.from_array(values, strip_valid)
+            if histogram is None:
+                histogram = strip_histogram
+            else:
+                histogram.add(strip_histogram)
+            if progress_callback:
+                progress_callback(done, total)
+
+    return _cache_put(key, histogram)
+
+class HistogramResult:
+    """
+    Histogram of a band ready to be displayed.
+
+    Args:
+        counts (ndarray): Pixel count per bin
+        edges (ndarray): Bin edges (len(counts) + 1)
+        approximate (bool): True while it comes from an overview or decimated read
+        level (int, optional): Decimation factor of the read it comes from (1 = full resolution)
+        clipped (int): Valid pixels outside the range of the edges, counted in the first/last bin
+    """
+
+    def __init__(self, counts, edges, approximate, level=1, clipped=0):
+        self.counts = counts
+        self.edges = edges
+        self.approximate = approximate
+        self.level = level
+        self.clipped = int(clipped)
+
+    @property
+    def total(self):
+        return int(self.counts.sum())
+
+    @property
+    def nbytes(self):
+        return self.counts.nbytes + self.edges.nbytes
+
+def pam_path(filepath):
+    """Returns the path of the GDAL PAM sidecar (.aux.xml) of a file"""
+    return filepath + '.aux.xml'
+
+def read_pam_histogram(filepath, band_idx):
+    """
+    Reads the exact histogram stored for a band in the file's GDAL PAM sidecar.
+
+    Args:
+        filepath (str): Path to the raster file
+        band_idx (int): 1-based band index
+
+    Returns:
+        HistogramResult or None: None when there is no exact histogram
+    """
+    path = pam_path(filepath)
+    if not os.path.exists(path):
+        return None
+    try:
+        root = ET.parse(path).getroot()
+    except (ET.ParseError, OSError):
+        return None
+    for band in root.findall('PAMRasterBand'):
+        if band.get('band') != str(band_idx):
+            continue
+        for item in band.findall('Histograms/HistItem'):
+            if item.findtext('Approximate', '0') != '0':
+                continue
+            try:
+                low = float(item.findtext('HistMin'))
+                high = float(item.findtext('HistMax'))
+                counts = np.array([int(c) for c in item.findtext('HistCounts').split('|')], dtype=np.int64)
+            except (TypeError, ValueError):
+                continue
+            return HistogramResult(counts, np.linspace(low, high, counts.size + 1), False)
+    return None
+
+def write_pam_histograms(filepath, histograms):
+    """
+    Stores exact histograms in the file's GDAL PAM sidecar (.aux.xml).
+
+    The sidecar is where GDAL keeps histograms (gdalinfo -hist reads them);
+    other entries of an existing sidecar are kept.
+
+    Args:
+        filepath (str): Path to the raster file
+        histograms (dict): 1-based band index -> HistogramResult
+
+    Raises:
+        RasterHandlerError: If the sidecar can't be written
+    """
+    path = pam_path(filepath)
+    try:
+        root = ET.parse(path).getroot() if os.path.exists(path) else ET.Element('PAMDataset')
+    except ET.ParseError:
+        root = ET.Element('PAMDataset')
+
+    for band_idx, result in sorted(histograms.items()):
+        band = next((b for b in root.findall('PAMRasterBand') if b.get('band') == str(band_idx)), None)
+        if band is None:
+            band = ET.SubElement(root, 'PAMRasterBand', band=str(band_idx))
+        existing = band.find('Histograms')
+        if existing is not None:
+            band.remove(existing)
+        item = ET.SubElement(ET.SubElement(band, 'Histograms'), 'HistItem')
+        ET.SubElement(item, 'HistMin').text = repr(float(result.edges[0]))
+        ET.SubElement(item, 'HistMax').text = repr(float(result.edges[-1]))
+        ET.SubElement(item, 'BucketCount').text = str(result.counts.size)
+        ET.SubElement(item, 'IncludeOutOfRange').text = '1' if result.clipped else '0'
+        ET.SubElement(item, 'Approximate').text = '0'
+        ET.SubElement(item, 'HistCounts').text = '|'.join(str(int(c)) for c in result.counts)
+
+    try:
+        ET.ElementTree(root).write(path)
+    except OSError as e:
+        raise RasterHandlerError(f"Error writing histograms to {path}: {e}")
+
+def _file_version(filepath):
+    stat = os.stat(filepath)
+    return stat.st_size, stat.st_mtime
+
+def _disk_cache_path(filepath, band_idx, bins):
+    digest = hashlib.sha1(os.path.abspath(filepath).encode('utf-8')).hexdigest()
+    return os.path.join(HISTOGRAM_CACHE_DIR, f"{digest}_b{band_idx}_{bins}.npz")
+
+def _load_persisted(filepath, band_idx, bins):
+    path = _disk_cache_path(filepath, band_idx, bins)
+    try:
+        with np.load(path) as stored:
+            if tuple(stored['version']) != _file_version(filepath):
+                return None
+            return HistogramResult(stored['counts'], stored['edges'], False, 1, int(stored['clipped']))
+    except (OSError, KeyError, ValueError):
+        return None
+
+def _persist(filepath, band_idx, bins, result):
+    path = _disk_cache_path(filepath, band_idx, bins)
+    tmp_path = path + '.tmp.npz'
+    try:
+        os.makedirs(HISTOGRAM_CACHE_DIR, exist_ok=True)
+        np.savez(tmp_path, counts=result.counts, edges=result.edges, clipped=result.clipped,
+                 version=np.array(_file_version(filepath), dtype=np.float64))
+        os.replace(tmp_path, path)
+    except OSError:
+        # The persisted cache is only an optimization
+        pass
+
+def _display_range(dtype, low, high, bins):
+    """Returns (low, high, bins) for the display, with one bin per value for narrow integer ranges"""
+    if np.issubdtype(np.dtype(dtype), np.integer):
+        bins = int(max(1, min(bins, high - low + 1)))
+        return low - 0.5, high + 0.5, bins
+    if high <= low:
+        return low - 0.5, high + 0.5, bins
+    return low, high, bins
+
+def accumulate_fixed_range(counts, values, low, high):
+    """Adds values to a fixed-range histogram, folding out-of-range values into the edge bins"""
+    hist, _ = np.histogram(values, bins=counts.size, range=(low, high))
+    counts += hist
+    outside = values.size - int(hist.sum())
+    if outside:
+        below = int(np.count_nonzero(values < low))
+        counts[0] += below
+        counts[-1] += outside - below
+    return outside
+
+def _approximation_factors(src, band_idx):
+    """Decimation factors of the approximation reads, coarsest first"""
+    factors = sorted(set(src.overviews(band_idx)), reverse=True)
+    if factors:
+        return factors
+    factor = max(src.width, src.height) / APPROXIMATION_SIZE
+    # Small rasters go straight to the exact pass
+    return [factor] if factor > 2 else []
+
+def iter_band_histogram(filepath, band_index, bins=DISPLAY_BINS, memory_budget=DEFAULT_MEMORY_BUDGET,
+                        cancel_event=None, progress_callback=None, use_disk_cache=True):
+    """
+    Computes the histogram of a band progressively.
+
+    Yields approximations from the overview levels (coarsest first; a
+    decimated read when there are none), each finer than the previous one,
+    and finally the exact histogram from a full-resolution pass that reads
+    the band strip by strip within `memory_budget`. 8/16-bit integer bands
+    use the exact bincount histogram of `get_band_histogram`; other types are
+    binned over the range of the finest approximation, with values outside it
+    counted in the edge bins (reported in `clipped`).
+
+    The exact result is cached in memory and persisted in HISTOGRAM_CACHE_DIR,
+    keyed by file version (size and modification time) and band, so it is
+    yielded immediately on later requests. An exact histogram stored in the
+    file's GDAL PAM sidecar is used as is.
+
+    Args:
+        filepath (str): Path to the raster file
+        band_index (int): Band index (0-based)
+        bins (int): Maximum number of bins
+        memory_budget (int): Maximum bytes of pixel data read at once
+        cancel_event (threading.Event, optional): Stops the computation when set
+        progress_callback (callable, optional): Called with (done, total) after each full-resolution strip
+        use_disk_cache (bool): Whether to read and write the persisted cache
+
+    Yields:
+        HistogramResult: Progressively refined histograms; the last one has approximate=False
+
+    Raises:
+        RasterHandlerError: If the file can't be read or the band index is invalid
+    """
+    if not os.path.exists(filepath):
+        raise RasterHandlerError(f"File not found: {filepath}")
+
+    band_idx = band_index + 1
+    key = ('display', os.path.abspath(filepath), _file_version(filepath), band_idx, bins)
+    result = _cache_get(key)
+    if result is None:
+        # Exact histograms stored with the file (e.g. by stream_export) skip the computation
+        result = read_pam_histogram(filepath, band_idx)
+        if result is not None and result.counts.size > bins:
+            result = None
+    if result is None and use_disk_cache:
+        result = _load_persisted(filepath, band_idx, bins)
+    if result is not None:
+        _cache_put(key, result)
+        yield result
+        return
+
+    def cancelled():
+        return cancel_event is not None and cancel_event.is_set()
+
+    try:
+        with open_raster(filepath, 'statistics') as src:
+            if band_idx < 1 or band_idx > src.count:
+                raise RasterHandlerError(f"Invalid band index: {band_index}. Available bands: 0-{src.count-1}")
+
+            dtype = src.dtypes[band_idx - 1]
+            value_range = None
+
+            # Approximations, from the coarsest overview to the finest
+            for factor in _approximation_factors(src, band_idx):
+                if cancelled():
+                    return
+                out_shape = (max(1, int(round(src.height / factor))), max(1, int(round(src.width / factor))))
+                values = src.read(band_idx, out_shape=out_shape, resampling=Resampling.nearest)
+                validity = read_validity_mask(src, [band_idx], out_shape=out_shape, data=[values])
+                values = values[validity.to_array()] if not validity.all_valid else values.ravel()
+                if values.size == 0:
+                    continue
+                value_range = (values.min().item(), values.max().item())
+                low, high, n_bins = _display_range(dtype, value_range[0], value_range[1], bins)
+                counts = np.zeros(n_bins, dtype=np.int64)
+                accumulate_fixed_range(counts, values, low, high)
+                yield HistogramResult(counts, np.linspace(low, high, n_bins + 1), True, int(round(factor)))
+
+            # Exact pass at full resolution
+            if supports_exact_histogram(dtype):
+                exact = get_band_histogram(src, band_idx, memory_budget=memory_budget,
+                                           progress_callback=progress_callback, cancel_event=cancel_event)
+                if exact is None:
+                    return
+                result = exact.to_result(bins)
+            else:
+                if value_range is None:
+                    # Small rasters have no approximation: a first pass finds the range
+                    for values, valid, _, _ in _iter_valid_strips(src, band_idx, memory_budget=memory_budget):
+                        if cancelled():
+                            return
+                        values = values[valid] if valid is not None else values.ravel()
+                        if values.size:
+                            low, high = values.min().item(), values.max().item()
+                            value_range = (low, high) if value_range is None else \
+                                (min(value_range[0], low), max(value_range[1], high))
+                counts = None
+                clipped = 0
+                for values, valid, done, total in _iter_valid_strips(src, band_idx, memory_budget=memory_budget):
+                    if cancelled():
+                        return
+                    values = values[valid] if valid is not None else values.ravel()
+                    if values.size:
+                        if counts is None:
+                            low, high, n_bins = _display_range(dtype, value_range[0], value_range[1], bins)
+                            counts = np.zeros(n_bins, dtype=np.int64)
+                        clipped += accumulate_fixed_range(counts, values, low, high)
+                    if progress_callback:
+                        progress_callback(done, total)
+                if counts is None:
+                    result = HistogramResult(np.zeros(1, dtype=np.int64), np.array([-0.5, 0.5]), False)
+                else:
+                    result = HistogramResult(counts, np.linspace(low, high, counts.size + 1), False, 1, clipped)
+
+    except RasterHandlerError:
+        raise
+    except Exception as e:
+        raise RasterHandlerError(f"Error computing histogram of band {band_index + 1}: {e}")
+
+    _cache_put(key, result)
+    if use_disk_cache:
+        _persist(filepath, band_idx, bins, result)
+    yield result
@@ -0,0 +1,258 @@
+import time
+from contextlib import closing
+import numpy as np
+from rasterio.enums import Resampling
+from model.masks import read_validity_mask, has_mask_band
+from model.governor import plan_windows, governed
+from model.statistics import read_statistics_tags
+from model.windowing import DEFAULT_MEMORY_BUDGET, iter_row_windows, count_windows, read_bands
+
+# float64 values beyond this magnitude are reported as extreme
+EXTREME_VALUE = 1e6
+# Data ranges below this are reported as too small for a preview
+MIN_DATA_RANGE = 1e-10
+# Fraction of zeros that suggests an undeclared NoData value
+HIGH_ZERO_FRACTION = 0.5
+# With early exit, windows span at most this many block rows so a scan can stop soon
+EARLY_EXIT_BLOCK_ROWS = 4
+# Quick-look sampling: time budget (seconds), maximum random blocks and confidence level
+QUICK_LOOK_SECONDS = 1.0
+QUICK_LOOK_BLOCKS = 64
+QUICK_LOOK_CONFIDENCE = 0.95
+
+class BandIssueScan:
+    """
+    Result of scanning one band for data issues.
+
+    Counts are totals when `complete` is True; after an early exit they are
+    lower bounds (the scan stopped at the first window with an issue).
+    `minimum`/`maximum` cover the valid pixels of float64 bands only and
+    `invalid_count` is only counted in the full mode.
+
+    Quick-look scans set `sample_pixels`/`sample_blocks`: counts then refer
+    to the sample (overview pixels and random full-resolution blocks).
+    """
+
+    def __init__(self, band_index, dtype, total_pixels):
+        self.band_index = band_index
+        self.dtype = np.dtype(dtype)
+        self.total_pixels = total_pixels
+        self.nan_count = 0
+        self.inf_count = 0
+        self.zero_count = 0
+        self.invalid_count = None
+        self.minimum = None
+        self.maximum = None
+        self.complete = False
+        self.sample_pixels = None
+        self.sample_blocks = 0
+
+    @property
+    def extreme(self):
+        """Whether a float64 value beyond EXTREME_VALUE was found"""
+        return self.minimum is not None and max(abs(self.minimum), abs(self.maximum)) > EXTREME_VALUE
+
+    @property
+    def small_range(self):
+        """Whether the float64 data range is too small (only known after a complete scan)"""
+        return self.complete and self.minimum is not None and self.maximum - self.minimum < MIN_DATA_RANGE
+
+    @property
+    def high_zero_count(self):
+        pixels = self.total_pixels if self.sample_pixels is None else self.sample_pixels
+        return self.zero_count > HIGH_ZERO_FRACTION * pixels
+
+    @property
+    def issue_fraction_bound(self):
+        """
+        Upper bound (at QUICK_LOOK_CONFIDENCE) on the fraction of blocks with
+        NaN/inf values when none were found in the sampled blocks, or None
+        """
+        if self.sample_blocks == 0 or self.nan_count or self.inf_count:
+            return None
+        return 1.0 - (1.0 - QUICK_LOOK_CONFIDENCE) ** (1.0 / self.sample_blocks)
+
+    @property
+    def has_issues(self):
+        return bool(self.nan_count or self.inf_count or self.extreme or self.small_range or self.high_zero_count)
+
+    def _update_range(self, minimum, maximum):
+        self.minimum = minimum if self.minimum is None else min(self.minimum, minimum)
+        self.maximum = maximum if self.maximum is None else max(self.maximum, maximum)
+
+def _plan(src, band_idx, known):
+    """Decides which checks a band needs: (non-finite, range, zeros)"""
+    dtype = np.dtype(src.dtypes[band_idx - 1])
+    is_float = np.issubdtype(dtype, np.floating)
+    # Exact statistics over every pixel prove that no pixel is NaN/inf
+    check_nonfinite = is_float and not (known is not None and known.valid_percent >= 100)
+    check_range = dtype == np.float64 and known is None
+    check_zeros = src.nodata is None and not has_mask_band(src, [band_idx])
+    return check_nonfinite, check_range, check_zeros
+
+def _prepare(src, band_list, early_exit):
+    """Creates the scans and the checks still needed per band (answered from tags when possible)"""
+    total_pixels = src.width * src.height
+    scans = {}
+    plans = {}
+    for band_idx in band_list:
+        scan = BandIssueScan(band_idx - 1, src.dtypes[band_idx - 1], total_pixels)
+        known = read_statistics_tags(src, band_idx) if np.issubdtype(scan.dtype, np.floating) else None
+        if known is not None and scan.dtype == np.float64:
+            scan._update_range(known.minimum, known.maximum)
+        scans[band_idx] = scan
+        plan = _plan(src, band_idx, known)
+        if not early_exit:
+            plans[band_idx] = plan
+        elif not scan.has_issues:
+            if any(plan):
+                plans[band_idx] = plan
+            else:
+                scan.complete = True
+    return scans, plans
+
+def scan_band_issues(src, band_list, early_exit=False, memory_budget=DEFAULT_MEMORY_BUDGET,
+                     cancel_event=None, progress_callback=None):
+    """
+    Scans bands for NaN, infinite, extreme and zero-dominated values in one pass per window.
+
+    Each window is read once for all the bands still being scanned and every
+    check is done on that array (non-finite values are classified only
+    among the pixels that fail np.isfinite). Exact STATISTICS_* tags answer
+    the range checks, and bands that need no pixel check (e.g. integer bands
+    with NoData) are not read at all.
+
+    Args:
+        src: Open rasterio dataset
+        band_list (list): 1-based band indices
+        early_exit (bool): Stop scanning a band at its first issue (interactive use);
+                           otherwise count every pixel (reports)
+        memory_budget (int): Maximum bytes of pixel data per window
+        cancel_event (threading.Event, optional): Stops the scan when set (counts stay incomplete)
+        progress_callback (callable, optional): Called with (done, total) after each window
+
+    Returns:
+        dict: 1-based band index -> BandIssueScan
+    """
+    scans, plans = _prepare(src, band_list, early_exit)
+    if plans:
+        dtype = max((np.dtype(src.dtypes[b - 1]) for b in plans), key=lambda d: d.itemsize)
+        block_height = src.block_shapes[0][0]
+        plan = plan_windows(src.width, len(plans), dtype, memory_budget, block_height=block_height,
+                            operation='scan', height=src.height)
+        rows = plan.rows
+        if early_exit:
+            rows = min(rows, max(1, block_height) * EARLY_EXIT_BLOCK_ROWS)
+        total = count_windows(src.height, rows)
+        window_bytes = plan.window_bytes * rows // plan.rows
+        with closing(governed(iter_row_windows(src.width, src.height, rows), window_bytes, cancel_event)) as windows:
+            for done, window in enumerate(windows, start=1):
+                if not plans:
+                    break
+                if cancel_event is not None and cancel_event.is_set():
+                    return scans
+                active = list(plans)
+                data = read_bands(src, active, window=window, views=True)
+                for values, band_idx in zip(data, active):
+                    scan = scans[band_idx]
+                    check_nonfinite, check_range, check_zeros = plans[band_idx]
+                    _scan_window(src, scan, values, band_idx, window, check_nonfinite, check_range,
+                                 check_zeros, count_invalid=not early_exit)
+                    if early_exit and scan.has_issues:
+                        del plans[band_idx]
+                if progress_callback:
+                    progress_callback(done, total)
+
+    for band_idx in plans:
+        scans[band_idx].complete = True
+    return scans
+
+def quick_scan_band_issues(src, band_list, time_budget=QUICK_LOOK_SECONDS, max_blocks=QUICK_LOOK_BLOCKS, seed=None):
+    """
+    Quick-look issue scan from a sample, for interactive use on large files.
+
+    Scans the coarsest overview (when the file has overviews) and then
+    random full-resolution blocks until `max_blocks` blocks were read or
+    `time_budget` seconds have passed. Findings are probabilistic: an issue
+    in the sample is certain, but a clean sample only bounds the fraction
+    of affected blocks (see BandIssueScan.issue_fraction_bound).
+
+    Args:
+        src: Open rasterio dataset
+        band_list (list): 1-based band indices
+        time_budget (float): Maximum seconds spent reading blocks
+        max_blocks (int): Maximum number of random blocks read
+        seed (int, optional): Seed of the block selection (for reproducible samples)
+
+    Returns:
+        dict: 1-based band index -> BandIssueScan
+    """
+    started = time.monotonic()
+    scans, plans = _prepare(src, band_list, early_exit=True)
+    for band_idx in plans:
+        scans[band_idx].sample_pixels = 0
+
+    # Coarsest overview: a cheap look at the whole extent
+    overviews = src.overviews(band_list[0])
+    if plans and overviews:
+        factor = max(overviews)
+        out_shape = (max(1, src.height // factor), max(1, src.width // factor))
+        active = list(plans)
+        data = read_bands(src, active, out_shape=out_shape, resampling=Resampling.nearest, views=True)
+        for values, band_idx in zip(data, active):
+            _sample(src, scans, plans, values, band_idx, None, out_shape)
+
+    # Random full-resolution blocks, within the time budget
+    windows = [window for _, window in src.block_windows(band_list[0])]
+    rng = np.random.default_rng(seed)
+    for i in rng.permutation(len(windows))[:max_blocks]:
+        if not plans or time.monotonic() - started > time_budget:
+            break
+        active = list(plans)
+        data = read_bands(src, active, window=windows[i], views=True)
+        for values, band_idx in zip(data, active):
+            scans[band_idx].sample_blocks += 1
+            _sample(src, scans, plans, values, band_idx, windows[i], None)
+
+    # Every block was read: the sample is the whole band
+    for band_idx in plans:
+        scan = scans[band_idx]
+        if scan.sample_blocks == len(windows) and not overviews:
+            scan.sample_pixels = None
+            scan.complete = True
+    return scans
+
+def _sample(src, scans, plans, values, band_idx, window, out_shape):
+    """Scans one sampled array of a band, dropping the band at its first issue"""
+    scan = scans[band_idx]
+    check_nonfinite, check_range, check_zeros = plans[band_idx]
+    _scan_window(src, scan, values, band_idx, window, check_nonfinite, check_range,
+                 check_zeros, count_invalid=False, out_shape=out_shape)
+    scan.sample_pixels += values.size
+    if scan.has_issues:
+        del plans[band_idx]
+
+def _scan_window(src, scan, values, band_idx, window, check_nonfinite, check_range, check_zeros, count_invalid,
+                 out_shape=None):
+    """Runs the checks of one band on one window"""
+    if check_nonfinite:
+        finite = np.isfinite(values)
+        nonfinite_count = values.size - int(np.count_nonzero(finite))
+        if nonfinite_count:
+            nan_count = int(np.count_nonzero(np.isnan(values[~finite])))
+            scan.nan_count += nan_count
+            scan.inf_count += nonfinite_count - nan_count
+
+    if check_range or count_invalid:
+        validity = read_validity_mask(src, [band_idx], window=window, out_shape=out_shape,
+                                      data=[values], use_cache=False)
+        if count_invalid:
+            scan.invalid_count = (scan.invalid_count or 0) + validity.invalid_count
+        if check_range:
+            valid_values = values if validity.all_valid else values[validity.to_array()]
+            if valid_values.size:
+                scan._update_range(float(valid_values.min()), float(valid_values.max()))
+
+    if check_zeros:
+        # Zeros are finite and there is no NoData/mask, so every zero is a valid pixel
+        scan.zero_count += int(np.count_nonzero(values == 0))
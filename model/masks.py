@@ -0,0 +1,263 @@
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+from rasterio.enums import MaskFlags
+
+# Maximum bytes of packed masks kept in the cache (1 bit per pixel)
+MASK_CACHE_SIZE = 64 * 1024 * 1024
+
+class ValidityMask:
+    """
+    Packed-bit validity mask of a raster window (1 bit per pixel, set = valid).
+
+    A pixel is valid when it is valid in the dataset mask of every band
+    (NoData value, internal/external mask band or alpha) and, for float
+    bands, finite. The mask is kept packed with np.packbits and unpacked
+    on demand, so it costs 1/8 of a byte per pixel while cached.
+    """
+
+    def __init__(self, packed, shape):
+        self.packed = packed
+        self.shape = tuple(shape)
+        self._valid_count = None
+
+    @classmethod
+    def from_array(cls, valid):
+        """Creates a mask from a boolean array (True = valid)"""
+        valid = np.asarray(valid, dtype=bool)
+        return cls(np.packbits(valid, axis=-1), valid.shape)
+
+    @property
+    def nbytes(self):
+        return self.packed.nbytes
+
+    def to_array(self):
+        """Returns the mask as a boolean array (True = valid)"""
+        return np.unpackbits(self.packed, axis=-1, count=self.shape[-1]).astype(bool)
+
+    def to_gdal(self):
+        """Returns the mask in GDAL convention (uint8, 255 = valid, 0 = invalid)"""
+        return np.unpackbits(self.packed, axis=-1, count=self.shape[-1]) * np.uint8(255)
+
+    @property
+    def valid_count(self):
+        """Number of valid pixels"""
+        if self._valid_count is None:
+            # Padding bits at the end of each row are always zero
+            self._valid_count = int(np.unpackbits(self.packed).sum())
+        return self._valid_count
+
+    @property
+    def invalid_count(self):
+        """Number of invalid pixels"""
+        return int(np.prod(self.shape)) - self.valid_count
+
+    @property
+    def all_valid(self):
+        return self.invalid_count == 0
+
+def has_mask_band(src, band_list):
+    """
+    Tells whether the bands use a mask that isn't derived from a NoData value.
+
+    Args:
+        src: Open rasterio dataset
+        band_list (list): 1-based band indices
+
+    Returns:
+        bool: True for internal/external mask bands or alpha bands
+    """
+    for band_idx in band_list:
+        flags = src.mask_flag_enums[band_idx - 1]
+        if MaskFlags.per_dataset in flags or MaskFlags.alpha in flags:
+            return True
+    return False
+
+_cache = OrderedDict()
+_cache_bytes = 0
+_cache_lock = threading.Lock()
+
+def _cache_key(src, band_list, window, out_shape):
+    try:
+        stat = os.stat(src.name)
+        version = (stat.st_size, stat.st_mtime)
+    except OSError:
+        version = None
+    window_key = None
+    if window is not None:
+        window_key = (int(window.col_off), int(window.row_off), int(window.width), int(window.height))
+    return (src.name, version, tuple(band_list), window_key, tuple(out_shape) if out_shape else None)
+
+def clear_cache():
+    """Empties the mask cache"""
+    global _cache_bytes
+    with _cache_lock:
+        _cache.clear()
+        _cache_bytes = 0
+
+def _band_values(data, band_list, band_idx):
+    """Returns the values of one band from already read data (one array per band or a 2D/3D array)"""
+    if isinstance(data, (list, tuple)):
+        return data[band_list.index(band_idx)]
+    data = np.asarray(data)
+    return data[band_list.index(band_idx)] if data.ndim == 3 else data
+
+def read_validity_mask(src, band_list, window=None, out_shape=None, data=None, use_cache=True, alpha_band=None):
+    """
+    Reads (or reuses) the validity mask of a window.
+
+    The dataset mask of each band is read with read_masks (which covers
+    NoData values, mask bands and alpha); float bands additionally get
+    their non-finite pixels masked. Results are cached per file version,
+    bands, window and output shape, so the preview, statistics and the
+    issue detection share one computation.
+
+    Args:
+        src: Open rasterio dataset (or WarpedVRT)
+        band_list (list): 1-based band indices
+        window (Window, optional): Region to read (default: full extent)
+        out_shape (tuple, optional): (rows, cols) when reading a decimated mask
+        data (ndarray or list, optional): Already read pixel values for the same window
+                                          and shape (one array per band or a 3D array),
+                                          used to find non-finite floats
+        use_cache (bool): Whether to look up and store the result in the cache
+        alpha_band (int, optional): 1-based band holding the validity as alpha values
+                                    (e.g. the alpha band added by a WarpedVRT)
+
+    Returns:
+        ValidityMask: Mask of the window
+    """
+    global _cache_bytes
+
+    key = _cache_key(src, band_list, window, out_shape) if use_cache else None
+    if key is not None:
+        with _cache_lock:
+            mask = _cache.get(key)
+            if mask is not None:
+                _cache.move_to_end(key)
+                return mask
+
+    valid = None
+    if alpha_band is not None:
+        kwargs = {'window': window}
+        if out_shape is not None:
+            kwargs['out_shape'] = tuple(out_shape)
+        valid = src.read(alpha_band, **kwargs) > 0
+
+    for band_idx in band_list:
+        flags = src.mask_flag_enums[band_idx - 1]
+        if MaskFlags.all_valid in flags:
+            continue
+        nodata = src.nodatavals[band_idx - 1]
+        if data is not None and out_shape is None and flags == [MaskFlags.nodata] and nodata is not None:
+            # NoData masks are derived from the values already read, without asking GDAL to read them again
+            if np.isnan(nodata):
+                continue  # covered by the finite check below
+            band_valid = _band_values(data, band_list, band_idx) != nodata
+        else:
+            kwargs = {'window': window}
+            if out_shape is not None:
+                kwargs['out_shape'] = tuple(out_shape)
+            band_valid = src.read_masks(band_idx, **kwargs) > 0
+        valid = band_valid if valid is None else np.logical_and(valid, band_valid, out=valid)
+
+    float_bands = [b for b in band_list if np.issubdtype(np.dtype(src.dtypes[b - 1]), np.floating)]
+    if float_bands:
+        if data is None:
+            kwargs = {'window': window}
+            if out_shape is not None:
+                kwargs['out_shape'] = (len(float_bands),) + tuple(out_shape)
+            values = src.read(float_bands, **kwargs)
+        else:
+            # Only the float bands are checked, without stacking
+            values = [_band_values(data, band_list, b) for b in float_bands]
+        for band_values in values:
+            finite = np.isfinite(band_values)
+            if valid is None:
+                valid = finite
+            else:
+                np.logical_and(valid, finite, out=valid)
+
+    if valid is None:
+        if out_shape is not None:
+            shape = tuple(out_shape)
+        elif window is not None:
+            shape = (int(window.height), int(window.width))
+        else:
+            shape = (src.height, src.width)
+        valid = np.ones(shape, dtype=bool)
+
+    mask = ValidityMask.from_array(valid)
+
+    if key is not None and mask.nbytes <= MASK_CACHE_SIZE:
+        with _cache_lock:
+            if key in _cache:
+                return _cache[key]
+            _cache[key] = mask
+            _cache_bytes += mask.nbytes
+            while _cache_bytes > MASK_CACHE_SIZE and _cache:
+                _, old = _cache.popitem(last=False)
+                _cache_bytes -= old.nbytes
+
+    return mask
+
+def value_mask_sources(src, band_list):
+    """
+    Splits the validity of bands into what can be derived from their values
+    and what must be read from the dataset, for validity_from_values.
+
+    Args:
+        src: Open rasterio dataset
+        band_list (list): 1-based band indices
+
+    Returns:
+        tuple: (nodata_values, mask_bands) - per band NoData compared against the
+               values (None = no NoData check), and bands whose GDAL masks must be
+               read with read_masks (mask bands, alpha)
+    """
+    nodata_values = []
+    mask_bands = []
+    for band_idx in band_list:
+        flags = src.mask_flag_enums[band_idx - 1]
+        nodata = src.nodatavals[band_idx - 1]
+        if MaskFlags.all_valid in flags:
+            nodata_values.append(None)
+        elif flags == [MaskFlags.nodata] and nodata is not None:
+            # NaN NoData is covered by the finite check
+            nodata_values.append(None if np.isnan(nodata) else nodata)
+        else:
+            nodata_values.append(None)
+            mask_bands.append(band_idx)
+    return nodata_values, mask_bands
+
+def validity_from_values(values, nodata_values, external=None):
+    """
+    Computes the validity of a window from values already in memory, without
+    dataset access (e.g. inside worker processes). Matches read_validity_mask
+    given the sources returned by value_mask_sources.
+
+    Args:
+        values (list or ndarray): One 2D array per band
+        nodata_values (list): Per band NoData value (None = no NoData check)
+        external (ndarray, optional): GDAL masks read for the other sources
+                                      (2D or one 2D mask per band, 0 = invalid)
+
+    Returns:
+        ValidityMask: Mask of the window
+    """
+    valid = None
+    if external is not None and external.size:
+        external = external.reshape((-1,) + external.shape[-2:])
+        valid = np.logical_and.reduce(external > 0, axis=0)
+    for band_values, nodata in zip(values, nodata_values):
+        checks = []
+        if nodata is not None:
+            checks.append(band_values != nodata)
+        if np.issubdtype(band_values.dtype, np.floating):
+            checks.append(np.isfinite(band_values))
+        for band_valid in checks:
+            valid = band_valid if valid is None else np.logical_and(valid, band_valid, out=valid)
+    if valid is None:
+        valid = np.ones(values[0].shape, dtype=bool)
+    return ValidityMask.from_array(valid)
@@ -0,0 +1,286 @@
+from contextlib import closing
+import numpy as np
+from rasterio.windows import Window
+from exceptions import RasterHandlerError
+from model.governor import plan_windows, governed
+from model.masks import read_validity_mask
+from model.statistics import read_statistics_tags
+from model.windowing import DEFAULT_MEMORY_BUDGET, iter_row_windows, read_bands
+
+# Data types an export can be converted to
+PACKED_DTYPES = ('uint8', 'int8', 'uint16', 'int16', 'uint32', 'int32', 'float32')
+
+def default_nodata(dtype):
+    """NoData of a packed type: the largest value of unsigned types, the smallest of signed ones, NaN for floats"""
+    dtype = np.dtype(dtype)
+    if np.issubdtype(dtype, np.floating):
+        return float('nan')
+    info = np.iinfo(dtype)
+    return int(info.max) if info.min == 0 else int(info.min)
+
+def stored_range(dtype, nodata):
+    """
+    Stored values available to valid pixels: the whole range of the type,
+    minus NoData when it sits at one of its ends.
+
+    Returns:
+        tuple: (low, high)
+    """
+    dtype = np.dtype(dtype)
+    if np.issubdtype(dtype, np.floating):
+        info = np.finfo(dtype)
+        return float(info.min), float(info.max)
+    info = np.iinfo(dtype)
+    low, high = int(info.min), int(info.max)
+    if nodata == low:
+        low += 1
+    elif nodata == high:
+        high -= 1
+    return low, high
+
+def _per_band(values, name):
+    if values is None:
+        return None
+    if isinstance(values, (int, float)):
+        values = [values]
+    try:
+        values = [float(v) for v in values]
+    except (TypeError, ValueError):
+        raise RasterHandlerError(f"Invalid {name}: {values}")
+    if not values:
+        return None
+    return values
+
+class PackingOptions:
+    """
+    Output data type of an export, with optional linear packing.
+
+    Valid pixels are stored as round((value - offset) / scale) and read back
+    as stored * scale + offset through the band scales/offsets written to the
+    file, so e.g. float reflectance can be written as uint16. Without a
+    scale, integer types get one computed from each band's value range
+    (plain conversion when the integer values already fit). Values outside
+    the stored range saturate to its ends and invalid pixels are written as
+    `nodata`.
+
+    Args:
+        dtype (str): Output data type (see PACKED_DTYPES)
+        scale (float or list, optional): Scale, shared or one per exported band
+        offset (float or list, optional): Offset, shared or one per band (requires scale)
+        nodata (float, optional): Stored NoData value (default: default_nodata(dtype))
+    """
+
+    def __init__(self, dtype, scale=None, offset=None, nodata=None):
+        if str(dtype) not in PACKED_DTYPES:
+            raise RasterHandlerError(f"Invalid output data type: {dtype}. Options: {', '.join(PACKED_DTYPES)}")
+        self.dtype = np.dtype(dtype)
+        self.scale = _per_band(scale, 'scale')
+        self.offset = _per_band(offset, 'offset')
+        if self.scale is not None and any(s == 0 or not np.isfinite(s) for s in self.scale):
+            raise RasterHandlerError("The scale must be a finite, non-zero number")
+        if self.offset is not None and self.scale is None:
+            raise RasterHandlerError("An offset requires a scale")
+
+        if nodata is None:
+            nodata = default_nodata(self.dtype)
+        elif not np.issubdtype(self.dtype, np.floating):
+            info = np.iinfo(self.dtype)
+            if nodata != int(nodata) or not info.min <= nodata <= info.max:
+                raise RasterHandlerError(f"NoData {nodata} can't be stored as {self.dtype.name}")
+            nodata = int(nodata)
+        self.nodata = nodata
+
+    @property
+    def is_integer(self):
+        return not np.issubdtype(self.dtype, np.floating)
+
+    def needs_ranges(self):
+        """Tells whether the scale is computed from the band value ranges"""
+        return self.is_integer and self.scale is None
+
+    def resolve(self, band_count, value_ranges=None, source_scales=None, source_offsets=None,
+                source_integer=False):
+        """
+        Fixes the scale/offset of every band.
+
+        Args:
+            band_count (int): Number of exported bands
+            value_ranges (list, optional): (min, max) raw value range per band, None if empty
+            source_scales, source_offsets (list, optional): Source scales/offsets per band
+            source_integer (bool): Whether the source values are integers
+
+        Returns:
+            BandPacker: Converter for the export windows
+        """
+        def pick(values, i, default):
+            if not values:
+                return default
+            return values[i] if len(values) > 1 else values[0]
+
+        if self.scale is not None and len(self.scale) not in (1, band_count):
+            raise RasterHandlerError(f"Give one scale or one per band ({band_count})")
+        if self.offset is not None and len(self.offset) not in (1, band_count):
+            raise RasterHandlerError(f"Give one offset or one per band ({band_count})")
+
+        low, high = stored_range(self.dtype, self.nodata)
+        src_scales = [float(pick(source_scales, i, 1.0) or 1.0) for i in range(band_count)]
+        src_offsets = [float(pick(source_offsets, i, 0.0) or 0.0) for i in range(band_count)]
+        scales, offsets = [], []
+        for i in range(band_count):
+            if self.scale is not None:
+                scale, offset = pick(self.scale, i, 1.0), pick(self.offset, i, 0.0)
+            elif not self.is_integer:
+                scale, offset = 1.0, 0.0
+            else:
+                value_range = value_ranges[i] if value_ranges else None
+                scale, offset = 1.0, 0.0
+                if value_range is not None:
+                    ends = [v * src_scales[i] + src_offsets[i] for v in value_range]
+                    vmin, vmax = min(ends), max(ends)
+                    identity = source_integer and src_scales[i] == 1.0 and src_offsets[i] == 0.0
+                    if not (identity and low <= vmin and vmax <= high):
+                        if vmax > vmin:
+                            scale = (vmax - vmin) / (high - low)
+                        offset = vmin - low * scale
+            scales.append(scale)
+            offsets.append(offset)
+        return BandPacker(self.dtype, self.nodata, scales, offsets, src_scales, src_offsets)
+
+class BandPacker:
+    """
+    Converts raw source windows to the packed output type.
+
+    Attributes:
+        scales, offsets (list): Output scale/offset per band (written to the file)
+        saturated (int): Valid pixels clipped to the stored range so far
+    """
+
+    def __init__(self, dtype, nodata, scales, offsets, source_scales=None, source_offsets=None):
+        self.dtype = np.dtype(dtype)
+        self.nodata = nodata
+        self.scales = scales
+        self.offsets = offsets
+        self.source_scales = source_scales or [1.0] * len(scales)
+        self.source_offsets = source_offsets or [0.0] * len(scales)
+        self.low, self.high = stored_range(self.dtype, nodata)
+        self.saturated = 0
+
+    def pack(self, position, values, valid=None):
+        """
+        Packs one band of a window.
+
+        Args:
+            position (int): Position of the band in the output (0-based)
+            values (ndarray): Raw source values
+            valid (ndarray, optional): Boolean validity (True = valid); None when all are valid
+
+        Returns:
+            ndarray: Values in the output type, NoData where invalid
+        """
+        work = values.astype(np.float64)
+        src_scale, src_offset = self.source_scales[position], self.source_offsets[position]
+        if src_scale != 1.0:
+            work *= src_scale
+        if src_offset != 0.0:
+            work += src_offset
+        scale, offset = self.scales[position], self.offsets[position]
+        if offset != 0.0:
+            work -= offset
+        if scale != 1.0:
+            work /= scale
+
+        integer = not np.issubdtype(self.dtype, np.floating)
+        non_finite = None
+        if integer:
+            np.rint(work, out=work)
+            # NaN/inf have no integer value: they are written as NoData
+            non_finite = ~np.isfinite(work)
+            work[non_finite] = self.low
+        with np.errstate(invalid='ignore'):
+            outside = (work < self.low) | (work > self.high)
+        if valid is not None:
+            outside &= valid
+        self.saturated += int(np.count_nonzero(outside))
+        np.clip(work, self.low, self.high, out=work)
+
+        out = work.astype(self.dtype)
+        if integer and self.low <= self.nodata <= self.high:
+            # NoData inside the stored range: valid pixels landing on it are moved next to it
+            collide = out == self.nodata
+            if valid is not None:
+                collide &= valid
+            out[collide] = self.nodata + 1 if self.nodata < self.high else self.nodata - 1
+        if non_finite is not None:
+            out[non_finite] = self.nodata
+        if valid is not None:
+            out[~valid] = self.nodata
+        elif not integer:
+            out[~np.isfinite(out)] = self.nodata
+        return out
+
+def array_range(values, valid=None):
+    """Returns the (min, max) of the valid values of an array, None when there are none"""
+    if valid is not None:
+        values = values[valid]
+    if values.size == 0:
+        return None
+    return float(np.min(values)), float(np.max(values))
+
+def value_ranges(src, band_list, window=None, memory_budget=DEFAULT_MEMORY_BUDGET, cancel_event=None):
+    """
+    Returns the raw value range of each band over a region.
+
+    Exact STATISTICS_* tags of the whole band are used when present (a
+    superset of any region); otherwise the valid pixels are scanned once,
+    window by window.
+
+    Args:
+        src: Open rasterio dataset
+        band_list (list): 1-based bands
+        window (Window, optional): Region (default: the whole dataset)
+        memory_budget (int): Maximum bytes of pixel data read at once
+        cancel_event (threading.Event, optional): Stops the scan when set
+
+    Returns:
+        list: (min, max) per band, None for bands without valid pixels
+    """
+    ranges = [None] * len(band_list)
+    pending = []
+    for position, band_idx in enumerate(band_list):
+        known = read_statistics_tags(src, band_idx)
+        if known is not None and known.minimum is not None:
+            ranges[position] = (known.minimum, known.maximum)
+        elif band_idx not in [band_list[p] for p in pending]:
+            pending.append(position)
+
+    if pending:
+        pending_bands = [band_list[p] for p in pending]
+        if window is None:
+            window = Window(0, 0, src.width, src.height)
+        col_off, row_off = int(window.col_off), int(window.row_off)
+        width, height = int(window.width), int(window.height)
+        plan = plan_windows(width, len(pending_bands), src.dtypes[pending_bands[0] - 1], memory_budget,
+                            block_height=src.block_shapes[0][0], operation='scan', height=height)
+        with closing(governed(iter_row_windows(width, height, plan.rows, col_off, row_off),
+                              plan.window_bytes, cancel_event)) as strips:
+            for strip in strips:
+                if cancel_event is not None and cancel_event.is_set():
+                    raise RasterHandlerError("Value range scan cancelled")
+                data = read_bands(src, pending_bands, window=strip, views=True)
+                for position, values in zip(pending, data):
+                    validity = read_validity_mask(src, [band_list[position]], window=strip, data=[values],
+                                                  use_cache=False)
+                    strip_range = array_range(values, None if validity.all_valid else validity.to_array())
+                    if strip_range is None:
+                        continue
+                    current = ranges[position]
+                    ranges[position] = strip_range if current is None else \
+                        (min(current[0], strip_range[0]), max(current[1], strip_range[1]))
+
+    # Repeated bands share the range of their first occurrence
+    for position, band_idx in enumerate(band_list):
+        if ranges[position] is None:
+            first = band_list.index(band_idx)
+            ranges[position] = ranges[first]
+
+    return ranges
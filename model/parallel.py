@@ -0,0 +1,225 @@
+import os
+import multiprocessing
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+from exceptions import RasterHandlerError
+from model.governor import get_governor
+
+# Execution backends for window kernels
+BACKENDS = ('serial', 'thread', 'process')
+DEFAULT_BACKEND = 'serial'
+
+def default_workers():
+    """Number of workers used when none is given (one per CPU)"""
+    return os.cpu_count() or 1
+
+def pending_windows(backend, workers=None):
+    """
+    Number of windows alive at the same time for a backend, to size windows
+    with rows_for_budget(..., buffers=...).
+
+    Args:
+        backend (str): One of BACKENDS
+        workers (int, optional): Number of workers (default: CPU count)
+
+    Returns:
+        int: Windows being read, processed or written at once
+    """
+    if backend == 'serial':
+        return 1
+    return 2 * (workers or default_workers()) + 1
+
+def _check_backend(backend):
+    if backend not in BACKENDS:
+        raise RasterHandlerError(f"Invalid execution backend: {backend}. Available: {', '.join(BACKENDS)}")
+
+def _attach(name):
+    """Attaches to a shared memory block owned (and unlinked) by the parent process"""
+    # Workers share the parent's resource tracker, so attaching doesn't need to be untracked
+    return shared_memory.SharedMemory(name=name)
+
+def _run_shared(kernel, specs, args):
+    """Worker side of the process backend: runs the kernel on arrays in shared memory"""
+    blocks = [_attach(name) for name, _, _ in specs]
+    try:
+        arrays = [np.ndarray(shape, dtype=dtype, buffer=shm.buf) for shm, (_, shape, dtype) in zip(blocks, specs)]
+        result = kernel(*arrays, *args)
+        # Views on the shared buffers must be released before closing them
+        del arrays
+        return result
+    finally:
+        for shm in blocks:
+            shm.close()
+
+class _SharedWindow:
+    """Copies of the arrays of one window in shared memory (process backend)"""
+
+    def __init__(self, arrays):
+        self.blocks = []
+        self.views = []
+        try:
+            for array in arrays:
+                shm = shared_memory.SharedMemory(create=True, size=max(1, array.nbytes))
+                self.blocks.append(shm)
+                view = np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)
+                np.copyto(view, array)
+                self.views.append(view)
+        except Exception:
+            self.release()
+            raise
+
+    @property
+    def specs(self):
+        return [(shm.name, view.shape, view.dtype.str) for shm, view in zip(self.blocks, self.views)]
+
+    def copy_back(self, arrays):
+        """Copies changes made in place by the kernel back to the caller's arrays"""
+        for array, view in zip(arrays, self.views):
+            np.copyto(array, view)
+
+    def release(self):
+        self.views = []
+        for shm in self.blocks:
+            shm.close()
+            shm.unlink()
+        self.blocks = []
+
+def map_windows(kernel, blocks, args=(), backend=DEFAULT_BACKEND, workers=None, window_bytes=0, governor=None):
+    """
+    Applies a window kernel to a sequence of windows, yielding results in input order.
+
+    `kernel(*arrays, *args)` may modify its arrays in place and may return
+    any picklable result (keep it small: e.g. a packed ValidityMask or
+    partial statistics). Reading and writing stay in the calling thread,
+    only the kernel runs in the workers, and at most
+    pending_windows(backend, workers) windows are in flight.
+
+    Backends:
+        - 'serial': runs the kernel in the calling thread
+        - 'thread': thread pool; suited to kernels that release the GIL
+        - 'process': process pool; window arrays are passed through
+          multiprocessing.shared_memory instead of being pickled, and the
+          kernel must be a module-level function
+
+    With `window_bytes`, every window is reserved on the memory governor
+    before it is read (pulled from `blocks`) and released once the caller
+    is done with its result; when memory is short, pending windows are
+    collected first instead of waiting.
+
+    Args:
+        kernel (callable): Function called as kernel(*arrays, *args)
+        blocks (iterable): Yields (key, arrays) with arrays a list of ndarrays of one window
+        args (tuple): Extra (picklable) arguments passed to every call
+        backend (str): One of BACKENDS
+        workers (int, optional): Number of workers (default: CPU count)
+        window_bytes (int): Bytes reserved per window on the governor (0: no reservation)
+        governor (MemoryGovernor, optional): Defaults to the process-wide governor
+
+    Yields:
+        tuple: (key, arrays, result) in the order of `blocks`; in-place changes
+               made by the kernel are visible in `arrays`
+
+    Raises:
+        RasterHandlerError: If the backend is unknown
+    """
+    _check_backend(backend)
+    governor = (governor or get_governor()) if window_bytes else None
+
+    def reserve(wait):
+        return governor.acquire(window_bytes, blocking=wait) if governor is not None else 0
+
+    def release(granted):
+        if granted:
+            governor.release(granted)
+
+    if backend == 'serial':
+        blocks = iter(blocks)
+        while True:
+            granted = reserve(True)
+            block = next(blocks, None)
+            if block is None:
+                release(granted)
+                return
+            key, arrays = block
+            try:
+                yield key, arrays, kernel(*arrays, *args)
+            finally:
+                release(granted)
+
+    workers = workers or default_workers()
+    max_pending = pending_windows(backend, workers) - 1
+    pending = deque()
+
+    if backend == 'thread':
+        executor = ThreadPoolExecutor(max_workers=workers)
+
+        def submit(arrays):
+            return executor.submit(kernel, *arrays, *args), None
+
+        def finish(future, shared, arrays):
+            return future.result()
+    else:
+        # 'spawn' keeps workers free of the parent's GDAL and Qt threads
+        executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+
+        def submit(arrays):
+            shared = _SharedWindow(arrays)
+            try:
+                return executor.submit(_run_shared, kernel, shared.specs, tuple(args)), shared
+            except Exception:
+                shared.release()
+                raise
+
+        def finish(future, shared, arrays):
+            try:
+                result = future.result()
+                shared.copy_back(arrays)
+            finally:
+                shared.release()
+            return result
+
+    def collect():
+        key, arrays, future, shared, granted = pending.popleft()
+        try:
+            result = finish(future, shared, arrays)
+            yield key, arrays, result
+        finally:
+            release(granted)
+
+    blocks = iter(blocks)
+    try:
+        while True:
+            # With windows in flight, free memory by collecting one instead of waiting
+            granted = reserve(not pending)
+            if governor is not None and not granted and pending:
+                yield from collect()
+                continue
+            block = next(blocks, None)
+            if block is None:
+                release(granted)
+                break
+            key, arrays = block
+            try:
+                future, shared = submit(arrays)
+            except Exception:
+                release(granted)
+                raise
+            pending.append((key, arrays, future, shared, granted))
+            if len(pending) >= max_pending:
+                yield from collect()
+        while pending:
+            yield from collect()
+    finally:
+        # Early exit or error: wait for the running kernels before freeing their buffers
+        while pending:
+            _, _, future, shared, granted = pending.popleft()
+            try:
+                future.result()
+            except Exception:
+                pass
+            if shared is not None:
+                shared.release()
+            release(granted)
+        executor.shutdown(wait=True)
@@ -0,0 +1,346 @@
+import os
+import json
+import numpy as np
+import rasterio
+from affine import Affine
+from rasterio.errors import RasterioIOError, RasterioError
+from rasterio.windows import Window
+from exceptions import RasterHandlerError
+from model import raster_handler
+from model.gdal_env import gdal_env
+from model.governor import get_governor
+from model.masks import read_validity_mask
+from model.packing import value_ranges
+from model.parallel import map_windows
+from model.tiles import encode_png
+from model.windowing import DEFAULT_MEMORY_BUDGET, resolve_window, read_bands
+
+# Patch file formats: one GeoTIFF or PNG per patch, or fixed-size records in one binary file
+PATCH_FORMATS = ('tif', 'png', 'bin')
+DEFAULT_PATCH_SIZE = 256
+# Patches with a smaller fraction of valid pixels are skipped
+DEFAULT_MIN_VALID = 0.5
+MANIFEST_NAME = 'manifest.json'
+BINARY_NAME = 'patches.bin'
+
+def patch_offsets(length, size, stride, pad_edges=False):
+    """
+    Start offsets of the patches along one axis.
+
+    Args:
+        length (int): Axis length
+        size (int): Patch size
+        stride (int): Distance between patch starts (size - overlap)
+        pad_edges (bool): Add a last patch running past the end (padded with NoData)
+                          when the regular ones leave pixels uncovered
+
+    Returns:
+        list: Start offsets
+    """
+    offsets = list(range(0, max(0, length - size) + 1, stride)) if length >= size else []
+    covered = offsets[-1] + size if offsets else 0
+    if pad_edges and covered < length:
+        offsets.append(offsets[-1] + stride if offsets else 0)
+    return offsets
+
+def _patch_name(row, col, fmt):
+    return f"r{row:06d}_c{col:06d}.{fmt}"
+
+def _encode_patch(data, position, out_dir, fmt, profile, band_names):
+    """
+    Window kernel of the encoding workers: writes one patch file.
+
+    Args:
+        data (ndarray): (bands, size, size) patch
+        position (ndarray): (row, col) of its top-left pixel in the source
+        out_dir (str): Output directory
+        fmt (str): 'tif' or 'png' ('bin' records are written in order by the caller)
+        profile (dict): GeoTIFF profile, with the source transform
+        band_names (list): Band descriptions of GeoTIFF patches
+
+    Returns:
+        int: Bytes written
+    """
+    if fmt == 'bin':
+        return 0
+    row, col = int(position[0]), int(position[1])
+    path = os.path.join(out_dir, _patch_name(row, col, fmt))
+    if fmt == 'png':
+        payload = encode_png(np.moveaxis(data, 0, -1))
+        with open(path, 'wb') as f:
+            f.write(payload)
+        return len(payload)
+    profile = dict(profile, transform=profile['transform'] * Affine.translation(col, row))
+    with rasterio.open(path, 'w', **profile) as dst:
+        dst.write(data)
+        dst.descriptions = tuple(band_names)
+    return os.path.getsize(path)
+
+def extract_patches(filepath, selected_indices, out_dir, size=DEFAULT_PATCH_SIZE, overlap=0, fmt='tif',
+                    min_valid=DEFAULT_MIN_VALID, window=None, bbox=None, packing=None, pad_edges=False,
+                    memory_budget=DEFAULT_MEMORY_BUDGET, backend='thread', workers=None,
+                    progress_callback=None, cancel_event=None):
+    """
+    Cuts the selected bands into fixed-size patches for ML datasets, reading the raster once.
+
+    Rows of patches are read one after another, full width, keeping the
+    overlapping rows of the previous row of patches, so every source row is
+    decoded once. Patches whose fraction of valid pixels (validity mask of
+    the selected bands) is below `min_valid` are skipped; the others are
+    encoded by the execution backend while the next rows are read, and
+    indexed in a manifest.json (position, bounds, valid fraction, file or
+    record) written last.
+
+    Formats:
+        - 'tif': one georeferenced GeoTIFF per patch
+        - 'png': one PNG per patch (uint8/uint16, 1 to 4 bands; see `packing`)
+        - 'bin': fixed-size C-order records in patches.bin, loadable as one
+          (patches, bands, size, size) array with patch_array()
+
+    Args:
+        filepath (str): Path to the raster file
+        selected_indices (list): Band indices (0-based), in output order
+        out_dir (str): Output directory (created if needed)
+        size (int): Patch size in pixels
+        overlap (int): Pixels shared by neighbouring patches
+        fmt (str): One of PATCH_FORMATS
+        min_valid (float): Minimum fraction of valid pixels of a kept patch (0 keeps all)
+        window (tuple, optional): Pixel window (col_off, row_off, width, height)
+        bbox (tuple, optional): Bounding box (left, bottom, right, top) in the raster's CRS
+        packing (PackingOptions, optional): Output data type, with scale/offset packing
+        pad_edges (bool): Also emit the partial patches at the right and bottom edges, padded with NoData
+        memory_budget (int): Maximum bytes of pixel data kept in memory
+        backend (str): Execution backend of the encoders (see model.parallel)
+        workers (int, optional): Number of encoding workers (default: CPU count)
+        progress_callback (callable, optional): Called with (done, total) after each row of patches
+        cancel_event (threading.Event, optional): Stops the extraction when set; written patches are removed
+
+    Returns:
+        dict: The manifest
+
+    Raises:
+        RasterHandlerError: If the options are invalid, or reading/writing fails or is cancelled
+    """
+    if fmt not in PATCH_FORMATS:
+        raise RasterHandlerError(f"Invalid patch format: {fmt}. Options: {', '.join(PATCH_FORMATS)}")
+    if size <= 0:
+        raise RasterHandlerError("The patch size must be positive")
+    if overlap < 0 or overlap >= size:
+        raise RasterHandlerError(f"The overlap must be between 0 and {size - 1}")
+    if not 0 <= min_valid <= 1:
+        raise RasterHandlerError("The minimum valid fraction must be between 0 and 1")
+    if not selected_indices:
+        raise RasterHandlerError("No bands were selected")
+    if not os.path.exists(filepath):
+        raise RasterHandlerError(f"File not found: {filepath}")
+
+    written = []
+    try:
+        os.makedirs(out_dir, exist_ok=True)
+        with gdal_env('export'), rasterio.open(filepath) as src:
+            for idx in selected_indices:
+                if idx < 0 or idx >= src.count:
+                    raise RasterHandlerError(f"Invalid band index: {idx}. Available bands: 0-{src.count-1}")
+            band_list = [idx + 1 for idx in selected_indices]
+            band_names = [raster_handler._get_band_name(src, band_idx) for band_idx in band_list]
+            file_metadata = raster_handler._get_file_metadata(src, band_list)
+            region = resolve_window(src, window, bbox) or Window(0, 0, src.width, src.height)
+            col_off, row_off = int(region.col_off), int(region.row_off)
+            width, height = int(region.width), int(region.height)
+
+            packer = None
+            if packing is not None:
+                ranges = value_ranges(src, band_list, region, memory_budget, cancel_event) \
+                    if packing.needs_ranges() else None
+                packer = packing.resolve(len(band_list), ranges, file_metadata['scales'], file_metadata['offsets'],
+                                         source_integer=not np.issubdtype(np.dtype(src.dtypes[band_list[0] - 1]), np.floating))
+                file_metadata['scales'] = packer.scales
+                file_metadata['offsets'] = packer.offsets
+            dtype = np.dtype(packing.dtype if packer is not None else src.dtypes[band_list[0] - 1])
+            nodata = packing.nodata if packer is not None else src.nodata
+            if fmt == 'png':
+                if dtype not in (np.uint8, np.uint16):
+                    raise RasterHandlerError(f"PNG patches must be uint8 or uint16, not {dtype.name} "
+                                             "(convert them with a packing data type)")
+                if len(band_list) > 4:
+                    raise RasterHandlerError("PNG patches hold at most 4 bands")
+
+            stride = size - overlap
+            row_starts = patch_offsets(height, size, stride, pad_edges)
+            col_starts = patch_offsets(width, size, stride, pad_edges)
+            if not row_starts or not col_starts:
+                raise RasterHandlerError(f"The region ({width}x{height}) is smaller than one patch ({size}x{size})")
+            fill = nodata if nodata is not None else 0
+
+            profile = {
+                'driver': 'GTiff', 'count': len(band_list), 'dtype': dtype.name, 'width': size, 'height': size,
+                'crs': src.crs, 'transform': src.transform, 'nodata': nodata, 'compress': 'lzw',
+            }
+            if size % 16 == 0:
+                profile.update(tiled=True, blockxsize=min(size, 256), blockysize=min(size, 256))
+
+            # One full-width row of patches (plus its per-band validity) is held while it's cut
+            row_bytes = len(band_list) * size * width * max(dtype.itemsize, np.dtype(src.dtypes[band_list[0] - 1]).itemsize)
+            total = len(row_starts)
+
+            def patch_rows():
+                """Reads each row of patches once, reusing the rows shared with the previous one"""
+                buffer, mask, buffer_start = None, None, 0
+                for done, start in enumerate(row_starts, start=1):
+                    if cancel_event is not None and cancel_event.is_set():
+                        raise RasterHandlerError("Patch extraction cancelled")
+                    end = min(start + size, height)
+                    read_from = max(start, buffer_start + (buffer.shape[1] if buffer is not None else 0))
+                    data = mask_rows = None
+                    if end > read_from:
+                        read_window = Window(col_off, row_off + read_from, width, end - read_from)
+                        data = read_bands(src, band_list, window=read_window)
+                        # Per band, so one band's NoData doesn't blank the others
+                        mask_rows = np.stack([read_validity_mask(src, [band_idx], window=read_window, data=[band],
+                                                                 use_cache=False).to_array()
+                                              for band_idx, band in zip(band_list, data)])
+                    if buffer is not None and start < buffer_start + buffer.shape[1]:
+                        kept = slice(start - buffer_start, None)
+                        buffer = buffer[:, kept] if data is None else np.concatenate([buffer[:, kept], data], axis=1)
+                        mask = mask[:, kept] if mask_rows is None else np.concatenate([mask[:, kept], mask_rows], axis=1)
+                    else:
+                        buffer, mask = data, mask_rows
+                    buffer_start = start
+                    yield done, start, buffer, mask
+
+            def blocks():
+                for done, start, buffer, mask in patch_rows():
+                    for col in col_starts:
+                        valid = mask[:, :, col:col + size]
+                        # A pixel counts as valid when it's valid in every selected band
+                        valid_fraction = float(valid.all(axis=0).sum()) / (size * size)
+                        if valid_fraction < min_valid:
+                            continue
+                        data = buffer[:, :, col:col + size]
+                        if data.shape[1:] != (size, size):
+                            # Edge patch: padded with NoData, marked invalid
+                            padded = np.full((len(band_list), size, size), fill, dtype=data.dtype)
+                            padded[:, :data.shape[1], :data.shape[2]] = data
+                            padded_valid = np.zeros((len(band_list), size, size), dtype=bool)
+                            padded_valid[:, :valid.shape[1], :valid.shape[2]] = valid
+                            data, valid = padded, padded_valid
+                        if packer is not None:
+                            data = np.stack([packer.pack(j, data[j], None if valid[j].all() else valid[j])
+                                             for j in range(len(band_list))])
+                        else:
+                            data = np.array(data, dtype=dtype)
+                            if nodata is not None and not valid.all():
+                                data[~valid] = nodata
+                        entry = {
+                            'row': row_off + start, 'col': col_off + col,
+                            'valid_fraction': round(valid_fraction, 6),
+                        }
+                        if fmt != 'bin':
+                            # Known before encoding starts, so a failure can remove every file
+                            entry['file'] = _patch_name(entry['row'], entry['col'], fmt)
+                            written.append(os.path.join(out_dir, entry['file']))
+                        yield entry, [data, np.array([entry['row'], entry['col']])]
+                    if progress_callback:
+                        progress_callback(done, total)
+
+            manifest_patches = []
+            binary = None
+            if fmt == 'bin':
+                binary_path = os.path.join(out_dir, BINARY_NAME)
+                written.append(binary_path)
+                binary = open(binary_path, 'wb')
+            # The row of patches being cut is reserved on the governor; the patches
+            # in flight (at most 2 * workers + 1) are small next to it
+            try:
+                with get_governor().reserve(row_bytes, cancel_event):
+                    for entry, arrays, nbytes in map_windows(_encode_patch, blocks(),
+                                                             args=(out_dir, fmt, profile, band_names),
+                                                             backend=backend, workers=workers):
+                        if binary is not None:
+                            entry['offset'] = binary.tell()
+                            nbytes = binary.write(np.ascontiguousarray(arrays[0]).tobytes())
+                        entry['id'] = len(manifest_patches)
+                        entry['bytes'] = nbytes
+                        left, top = src.transform * (entry['col'], entry['row'])
+                        right, bottom = src.transform * (entry['col'] + size, entry['row'] + size)
+                        entry['bounds'] = [min(left, right), min(top, bottom), max(left, right), max(top, bottom)]
+                        manifest_patches.append(entry)
+            finally:
+                if binary is not None:
+                    binary.close()
+
+            origin = src.window_transform(region)
+            manifest = {
+                'source': os.path.abspath(filepath),
+                'format': fmt,
+                'patch_size': size,
+                'overlap': overlap,
+                'stride': stride,
+                'bands': band_names,
+                'source_bands': band_list,
+                'dtype': dtype.name,
+                'nodata': None if nodata is None else ('NaN' if np.isnan(nodata) else nodata),
+                'scales': list(file_metadata['scales']),
+                'offsets': list(file_metadata['offsets']),
+                'crs': src.crs.to_wkt() if src.crs else None,
+                'transform': list(origin)[:6],
+                'region': [col_off, row_off, width, height],
+                'min_valid': min_valid,
+                'candidates': len(row_starts) * len(col_starts),
+                'count': len(manifest_patches),
+                'patches': manifest_patches,
+            }
+            if fmt == 'bin':
+                manifest['data_file'] = BINARY_NAME
+                manifest['record_shape'] = [len(band_list), size, size]
+            manifest_path = os.path.join(out_dir, MANIFEST_NAME)
+            with open(manifest_path + '.tmp', 'w', encoding='utf-8') as f:
+                json.dump(manifest, f)
+            os.replace(manifest_path + '.tmp', manifest_path)
+            return manifest
+
+    except BaseException as e:
+        # Nothing half-written is left behind (the manifest is only written on success)
+        for path in written:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        if isinstance(e, RasterHandlerError):
+            raise
+        if isinstance(e, RasterioIOError):
+            raise RasterHandlerError(f"I/O error extracting patches: {e}")
+        if isinstance(e, RasterioError):
+            raise RasterHandlerError(f"Error extracting patches: {e}")
+        if isinstance(e, Exception):
+            raise RasterHandlerError(f"Unexpected error extracting patches: {e}")
+        raise
+
+def load_manifest(out_dir):
+    """
+    Reads the manifest of a patch directory.
+
+    Raises:
+        RasterHandlerError: If it's missing or invalid
+    """
+    path = os.path.join(out_dir, MANIFEST_NAME)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        raise RasterHandlerError(f"Error reading patch manifest {path}: {e}")
+
+def patch_array(out_dir, manifest=None):
+    """
+    Maps the records of a 'bin' patch directory as one read-only array (no GDAL needed).
+
+    Returns:
+        numpy.memmap: (patches, bands, size, size) array, indexed like manifest['patches']
+    """
+    manifest = manifest or load_manifest(out_dir)
+    if manifest.get('format') != 'bin':
+        raise RasterHandlerError(f"Patches in {out_dir} are not in the binary format")
+    shape = (manifest['count'], *manifest['record_shape'])
+    if manifest['count'] == 0:
+        return np.empty(shape, dtype=manifest['dtype'])
+    return np.memmap(os.path.join(out_dir, manifest['data_file']), dtype=manifest['dtype'], mode='r', shape=shape)
@@ -0,0 +1,552 @@
+import os
+import json
+import numpy as np
+import rasterio
+from rasterio.errors import RasterioIOError, RasterioError
+from rasterio.windows import Window
+from model import raster_handler
+from model.masks import read_validity_mask, has_mask_band
+from model.reproject import ReprojectOptions, open_warped
+from model.statistics import StreamingBandSummary, read_statistics_tags
+from model.histogram import write_pam_histograms
+from model.governor import WARP_SHARE, plan_windows
+from model.parallel import BACKENDS, DEFAULT_BACKEND, map_windows
+from model.autotune import tune_plan
+from model.checkpoint import partial_path, finalize, remove_partial
+from model.windowing import DEFAULT_MEMORY_BUDGET, resolve_window, iter_row_windows, count_windows, read_bands
+from exceptions import RasterHandlerError
+from model.gdal_env import gdal_env, env_options
+
+# Stages in the order they may appear: select/reproject configure the reader,
+# correct/index run on every window in the order given (a correction fills
+# the kept bands and the indices listed before it)
+STAGE_TYPES = ('select', 'reproject', 'correct', 'index')
+READER_STAGES = ('select', 'reproject')
+
+# Band index formulas: (a, b) -> values, with invalid results set to NaN
+INDEX_FORMULAS = {
+    'normalized_difference': lambda a, b: (a - b) / (a + b),
+    'ratio': lambda a, b: a / b,
+    'difference': lambda a, b: a - b,
+}
+
+SPEC_KEYS = ('input', 'output', 'window', 'bbox', 'memory_budget', 'autotune', 'statistics', 'histograms',
+             'backend', 'workers', 'stages')
+
+def load_pipeline_spec(path):
+    """
+    Loads a pipeline spec from a JSON file, or YAML (.yaml/.yml) when PyYAML is installed.
+
+    Args:
+        path (str): Spec file path
+
+    Returns:
+        dict: The spec
+
+    Raises:
+        RasterHandlerError: If the file can't be read or parsed
+    """
+    if not os.path.isfile(path):
+        raise RasterHandlerError(f"Pipeline spec not found: {path}")
+    try:
+        with open(path, encoding='utf-8') as f:
+            if os.path.splitext(path)[1].lower() in ('.yaml', '.yml'):
+                try:
+                    import yaml
+                except ImportError:
+                    raise RasterHandlerError("YAML pipeline specs require PyYAML (pip install pyyaml); use JSON instead")
+                spec = yaml.safe_load(f)
+            else:
+                spec = json.load(f)
+    except RasterHandlerError:
+        raise
+    except Exception as e:
+        raise RasterHandlerError(f"Error reading pipeline spec {path}: {e}")
+    if not isinstance(spec, dict):
+        raise RasterHandlerError(f"Invalid pipeline spec {path}: expected a mapping at the top level")
+    return spec
+
+class CorrectStage:
+    """
+    Fills invalid pixels (NoData, masked, NaN/infinite) of every band produced so far.
+
+    Args:
+        fill (float, optional): Fill value (default: the output NoData value, or 0)
+    """
+
+    def __init__(self, fill=None):
+        self.fill = fill
+
+    def describe(self):
+        return f"correct (fill={'NoData/0' if self.fill is None else self.fill})"
+
+class IndexStage:
+    """
+    Adds a band computed from two source bands (e.g. NDVI as normalized_difference of NIR and red).
+
+    Args:
+        name (str): Name of the new band
+        formula (str): One of INDEX_FORMULAS
+        bands (list): The two 1-based source bands (a, b) of the formula
+    """
+
+    def __init__(self, name, formula, bands):
+        if formula not in INDEX_FORMULAS:
+            raise RasterHandlerError(f"Invalid index formula: {formula}. Options: {', '.join(INDEX_FORMULAS)}")
+        if not isinstance(bands, (list, tuple)) or len(bands) != 2:
+            raise RasterHandlerError(f"Index '{name}' needs exactly two source bands")
+        self.name = name
+        self.formula = formula
+        self.bands = [int(b) for b in bands]
+
+    def compute(self, a, b, dtype):
+        a = a.astype(dtype, copy=False)
+        b = b.astype(dtype, copy=False)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            values = INDEX_FORMULAS[self.formula](a, b)
+        # Division by zero gives infinite values; they are as invalid as NaN
+        values[~np.isfinite(values)] = np.nan
+        return values
+
+    def describe(self):
+        return f"index {self.name} = {self.formula}(band {self.bands[0]}, band {self.bands[1]})"
+
+class Pipeline:
+    """
+    Validated processing pipeline: reader stages (band selection, reprojection)
+    followed by per-window stages (correction, band indices), written to one GeoTIFF.
+
+    Stages are fused: each window is read once, goes through every stage in
+    memory and is written, so no intermediate file is created and memory
+    stays bounded by `memory_budget`. The correct/index stages of a window
+    run on the execution backend (`backend`: serial, thread or process; see
+    model/parallel.py) while the next windows are read.
+
+    When no 'select' stage is given all source bands are written, unless the
+    pipeline computes indices, in which case only the indices are written.
+
+    Args:
+        spec (dict): Pipeline spec (see docs: input, output, window/bbox,
+                     memory_budget in MB, autotune, statistics, histograms,
+                     backend/workers of the correct/index kernel, stages)
+
+    Raises:
+        RasterHandlerError: If the spec is invalid
+    """
+
+    def __init__(self, spec):
+        unknown = set(spec) - set(SPEC_KEYS)
+        if unknown:
+            raise RasterHandlerError(f"Unknown pipeline spec keys: {', '.join(sorted(unknown))}")
+
+        self.input = spec.get('input')
+        self.output = spec.get('output')
+        self.window = tuple(spec['window']) if spec.get('window') else None
+        self.bbox = tuple(spec['bbox']) if spec.get('bbox') else None
+        if self.window and self.bbox:
+            raise RasterHandlerError("Use either 'window' or 'bbox', not both")
+        self.memory_budget = int(float(spec.get('memory_budget') or DEFAULT_MEMORY_BUDGET / (1024 * 1024)) * 1024 * 1024)
+        self.autotune = bool(spec.get('autotune', False))
+        self.compute_statistics = bool(spec.get('statistics', True))
+        self.histogram_bins = spec.get('histograms') if self.compute_statistics else None
+        if self.histogram_bins is True:
+            self.histogram_bins = 256
+        self.backend = spec.get('backend') or DEFAULT_BACKEND
+        if self.backend not in BACKENDS:
+            raise RasterHandlerError(f"Invalid execution backend: {self.backend}. Available: {', '.join(BACKENDS)}")
+        try:
+            self.workers = int(spec['workers']) if spec.get('workers') is not None else None
+        except (TypeError, ValueError):
+            raise RasterHandlerError(f"Invalid workers: {spec.get('workers')}")
+        if self.workers is not None and self.workers < 1:
+            raise RasterHandlerError("The number of workers must be positive")
+
+        self.selected = None
+        self.reproject = None
+        self.stages = []
+        for position, stage in enumerate(spec.get('stages') or []):
+            self._add_stage(position, dict(stage))
+
+    def _add_stage(self, position, stage):
+        kind = stage.pop('stage', None)
+        if kind not in STAGE_TYPES:
+            raise RasterHandlerError(f"Invalid stage #{position + 1}: {kind}. Options: {', '.join(STAGE_TYPES)}")
+        if kind in READER_STAGES and self.stages:
+            raise RasterHandlerError(f"Stage '{kind}' configures the reader and must come before correct/index stages")
+        try:
+            if kind == 'select':
+                if self.selected is not None:
+                    raise RasterHandlerError("Only one 'select' stage is allowed")
+                self.selected = [int(b) for b in stage.pop('bands')]
+                if not self.selected:
+                    raise RasterHandlerError("Stage 'select' needs at least one band")
+            elif kind == 'reproject':
+                if self.reproject is not None:
+                    raise RasterHandlerError("Only one 'reproject' stage is allowed")
+                self.reproject = ReprojectOptions(
+                    dst_crs=stage.pop('dst_crs', None),
+                    resolution=stage.pop('resolution', None),
+                    resampling=stage.pop('resampling', 'nearest'),
+                    num_threads=stage.pop('threads', None),
+                )
+            elif kind == 'correct':
+                self.stages.append(CorrectStage(stage.pop('fill', None)))
+            else:
+                self.stages.append(IndexStage(stage.pop('name'), stage.pop('formula'), stage.pop('bands')))
+        except KeyError as e:
+            raise RasterHandlerError(f"Stage '{kind}' is missing {e}")
+        except (TypeError, ValueError) as e:
+            raise RasterHandlerError(f"Invalid stage '{kind}': {e}")
+        if stage:
+            raise RasterHandlerError(f"Unknown options of stage '{kind}': {', '.join(sorted(stage))}")
+
+    @property
+    def indices(self):
+        return [stage for stage in self.stages if isinstance(stage, IndexStage)]
+
+    def output_bands(self, count):
+        """1-based source bands written to the output (before the index bands)"""
+        if self.selected is not None:
+            return self.selected
+        return [] if self.indices else list(range(1, count + 1))
+
+    def read_list(self, count):
+        """1-based source bands read per window (written bands and index inputs)"""
+        bands = list(self.output_bands(count))
+        for stage in self.indices:
+            bands.extend(b for b in stage.bands if b not in bands)
+        for band_idx in bands:
+            if band_idx < 1 or band_idx > count:
+                raise RasterHandlerError(f"Invalid band: {band_idx}. Valid bands: 1-{count}")
+        return bands
+
+    def output_dtype(self, src):
+        """Output data type: the source type, promoted to float when indices are computed"""
+        dtypes = [src.dtypes[b - 1] for b in self.output_bands(src.count)]
+        if self.indices:
+            inputs = [src.dtypes[b - 1] for stage in self.indices for b in stage.bands]
+            dtypes.append(np.float64 if np.dtype(np.result_type(*inputs)) == np.float64 else np.float32)
+        return np.dtype(np.result_type(*dtypes))
+
+    def describe(self):
+        """Human readable list of the stages, in execution order"""
+        steps = ["read " + (f"bands {self.selected}" if self.selected else "all bands")]
+        if self.reproject is not None:
+            steps.append(f"reproject ({self.reproject.dst_crs or 'source CRS'}, "
+                         f"resolution={self.reproject.resolution}, {self.reproject.resampling})")
+        steps.extend(stage.describe() for stage in self.stages)
+        steps.append("write GeoTIFF")
+        return steps
+
+def _check_paths(pipeline):
+    if not pipeline.input:
+        raise RasterHandlerError("The pipeline has no input")
+    if not os.path.exists(pipeline.input):
+        raise RasterHandlerError(f"File not found: {pipeline.input}")
+
+def _open_reader(src, pipeline, read_window):
+    """Returns (reader, window): the warped view when reprojecting, the source otherwise"""
+    if pipeline.reproject is None:
+        return src, read_window
+    return open_warped(src, pipeline.reproject, window=read_window, memory_budget=pipeline.memory_budget), None
+
+def _layout(src, reader, read_window, pipeline):
+    """Output grid and window size shared by the dry-run and the run"""
+    if read_window is not None:
+        width, height = int(read_window.width), int(read_window.height)
+    else:
+        width, height = reader.width, reader.height
+    read_list = pipeline.read_list(src.count)
+    out_count = len(pipeline.output_bands(src.count)) + len(pipeline.indices)
+    if out_count == 0:
+        raise RasterHandlerError("The pipeline writes no bands")
+    out_dtype = pipeline.output_dtype(src)
+    # One window holds the bands read and the bands written, sized by the widest type,
+    # plus one boolean validity plane per band
+    widest = max([np.dtype(src.dtypes[b - 1]) for b in read_list] + [out_dtype], key=lambda d: d.itemsize)
+    planes = len(read_list) + out_count
+    # When reprojecting, part of the budget goes to the warper (see open_warped)
+    plan = plan_windows(width, planes + -(-planes // widest.itemsize), widest, pipeline.memory_budget,
+                        block_height=src.block_shapes[0][0], operation='export',
+                        backend=pipeline.backend, workers=pipeline.workers,
+                        reproject=pipeline.reproject is not None, height=height)
+    return width, height, read_list, out_count, out_dtype, plan
+
+def plan_pipeline(pipeline):
+    """
+    Dry-run: validates the pipeline against its input and estimates its cost
+    without reading pixels or writing anything.
+
+    Read estimates count decoded bytes: on pixel-interleaved files every
+    block holds all bands, so all of them are decoded even for a subset.
+
+    Args:
+        pipeline (Pipeline): Pipeline to plan
+
+    Returns:
+        dict: Stages, output grid, window size, I/O and memory estimates (bytes) and the
+              GDAL settings of the run
+
+    Raises:
+        RasterHandlerError: If the pipeline can't run on its input
+    """
+    _check_paths(pipeline)
+    try:
+        with rasterio.open(pipeline.input) as src:
+            read_window = resolve_window(src, pipeline.window, pipeline.bbox)
+            reader, window = _open_reader(src, pipeline, read_window)
+            try:
+                width, height, read_list, out_count, out_dtype, plan = _layout(src, reader, window, pipeline)
+                if pipeline.autotune and pipeline.reproject is None:
+                    # Only a stored profile is applied: the dry-run reads no pixels
+                    plan = tune_plan(src, read_list, plan, window, benchmark=False)
+            finally:
+                if reader is not src:
+                    reader.close()
+
+            if read_window is not None:
+                source_pixels = int(read_window.width) * int(read_window.height)
+            else:
+                source_pixels = src.width * src.height
+            pixel_interleaved = src.count > 1 and src.interleaving is not None and src.interleaving.name.lower() == 'pixel'
+            decoded_bands = src.count if pixel_interleaved else len(read_list)
+            in_itemsize = max(np.dtype(src.dtypes[b - 1]).itemsize for b in read_list)
+            # Every window in flight holds its bands, their validity planes and the output mask
+            window_bytes = plan.rows * width * (len(read_list) * (in_itemsize + 1) + out_count * (out_dtype.itemsize + 1) + 1)
+            window_bytes *= plan.in_flight
+            warp_bytes = pipeline.memory_budget - int(pipeline.memory_budget * (1 - WARP_SHARE)) if pipeline.reproject is not None else 0
+
+            return {
+                'input': pipeline.input,
+                'output': pipeline.output,
+                'stages': pipeline.describe(),
+                'interleave': src.interleaving.name.lower() if src.interleaving else None,
+                'bands_read': read_list,
+                'bands_written': out_count,
+                'dtype': out_dtype.name,
+                'width': width,
+                'height': height,
+                'rows_per_window': plan.rows,
+                'windows': count_windows(height, plan.rows),
+                'backend': pipeline.backend,
+                'workers': plan.workers,
+                'bytes_read': source_pixels * decoded_bands * in_itemsize,
+                'bytes_written': width * height * out_count * out_dtype.itemsize,
+                'peak_memory': window_bytes + warp_bytes,
+                'intermediate_files': 0,
+                'gdal_env': env_options('export'),
+            }
+    except RasterioError as e:
+        raise RasterHandlerError(f"Error planning pipeline: {e}")
+
+def _pipeline_window(data, read_valid, out, out_valid, stages, kept_positions, index_positions,
+                     fill_invalid, nodata):
+    """
+    Window kernel of run_pipeline: fills `out` and its per-band validity
+    `out_valid` in place from the bands read, running the correct/index
+    stages in spec order (a correction only fills the bands produced before it).
+    """
+    kept = len(kept_positions)
+    floating = np.issubdtype(out.dtype, np.floating)
+    for j, position in enumerate(kept_positions):
+        out[j] = data[position]
+        out_valid[j] = read_valid[position]
+        if fill_invalid:
+            out[j][~out_valid[j]] = nodata
+    produced = kept
+    for stage in stages:
+        if isinstance(stage, IndexStage):
+            # An index is valid where both of its source bands are
+            a, b = index_positions[produced - kept]
+            out[produced] = stage.compute(data[a], data[b], out.dtype)
+            np.logical_and(read_valid[a], read_valid[b], out=out_valid[produced])
+            out[produced][~out_valid[produced]] = np.nan
+            produced += 1
+            continue
+        fill = stage.fill if stage.fill is not None else (nodata if nodata is not None else 0)
+        for band, valid in zip(out[:produced], out_valid):
+            invalid = ~valid
+            if floating:
+                invalid |= ~np.isfinite(band)
+            band[invalid] = fill
+
+def run_pipeline(pipeline, progress_callback=None, cancel_event=None):
+    """
+    Runs a pipeline, streaming windows from the reader through every stage to the writer.
+
+    Output conventions follow stream_export: STATISTICS_* tags (and optional
+    PAM histograms) are accumulated while writing, and mask bands/alpha are
+    carried over as an internal mask. When indices are computed the output
+    is float with NaN as NoData, and invalid pixels of the kept bands are
+    set to NaN too. The output is written to `output` + '.partial' and
+    renamed once complete; a failed or cancelled run removes it.
+
+    Args:
+        pipeline (Pipeline): Pipeline to run
+        progress_callback (callable, optional): Called with (done, total) after each window
+        cancel_event (threading.Event, optional): Stops between windows when set;
+                                                  the partial output is removed
+
+    Returns:
+        list: Names of the written bands
+
+    Raises:
+        RasterHandlerError: If the pipeline fails or is cancelled
+    """
+    _check_paths(pipeline)
+    if not pipeline.output:
+        raise RasterHandlerError("The pipeline has no output")
+    raster_handler.check_output_path(pipeline.output)
+    out_path = pipeline.output
+    tmp_path = partial_path(out_path)
+
+    completed = False
+    try:
+        with gdal_env('export'), rasterio.open(pipeline.input) as src:
+            read_window = resolve_window(src, pipeline.window, pipeline.bbox)
+            reader, window = _open_reader(src, pipeline, read_window)
+            try:
+                width, height, read_list, out_count, out_dtype, plan = _layout(src, reader, window, pipeline)
+                if pipeline.autotune and pipeline.reproject is None:
+                    plan = tune_plan(src, read_list, plan, window)
+                kept = pipeline.output_bands(src.count)
+                kept_positions = [read_list.index(b) for b in kept]
+                index_positions = [[read_list.index(b) for b in stage.bands] for stage in pipeline.indices]
+
+                band_names = [raster_handler._get_band_name(src, b) for b in kept] + \
+                             [stage.name for stage in pipeline.indices]
+                band_metadata = raster_handler._without_statistics(
+                    [raster_handler._get_band_metadata(src, b) for b in kept]
+                ) + [{} for _ in pipeline.indices]
+                file_metadata = raster_handler._get_file_metadata(src, kept)
+                if pipeline.indices:
+                    # Index bands have no scale/offset/unit and no color meaning
+                    extra = len(pipeline.indices)
+                    file_metadata['scales'] = (file_metadata['scales'] or [1.0] * len(kept)) + [1.0] * extra
+                    file_metadata['offsets'] = (file_metadata['offsets'] or [0.0] * len(kept)) + [0.0] * extra
+                    file_metadata['units'] = (file_metadata['units'] or [''] * len(kept)) + [''] * extra
+                    file_metadata['colorinterp'] = []
+
+                nodata = np.nan if pipeline.indices else reader.nodata
+                corrections = [stage for stage in pipeline.stages if isinstance(stage, CorrectStage)]
+                # Kept bands get the output NoData when it differs from the source one
+                fill_invalid = bool(pipeline.indices) and bool(kept)
+
+                if window is not None:
+                    col_off, row_off = int(window.col_off), int(window.row_off)
+                    transform = src.window_transform(window)
+                else:
+                    col_off, row_off = 0, 0
+                    transform = reader.transform
+
+                meta = src.meta.copy()
+                meta.update({
+                    'driver': 'GTiff',
+                    'count': out_count,
+                    'dtype': out_dtype.name,
+                    'width': width,
+                    'height': height,
+                    'crs': reader.crs,
+                    'transform': transform,
+                    'nodata': nodata,
+                })
+                raster_handler.apply_default_creation_options(meta)
+
+                alpha_band = reader.count if reader.count > src.count else None
+                write_mask = has_mask_band(src, read_list) or alpha_band is not None or \
+                    (bool(corrections) and nodata is None)
+
+                summaries = []
+                if pipeline.compute_statistics:
+                    for b in kept:
+                        known = read_statistics_tags(src, b) if pipeline.histogram_bins else None
+                        summaries.append(StreamingBandSummary(
+                            out_dtype, pipeline.histogram_bins,
+                            (known.minimum, known.maximum) if known is not None else None
+                        ))
+                    summaries.extend(StreamingBandSummary(out_dtype, pipeline.histogram_bins,
+                                                          (-1.0, 1.0) if stage.formula == 'normalized_difference' else None)
+                                     for stage in pipeline.indices)
+
+                total = count_windows(height, plan.rows)
+                cancelled = False
+                kernel_args = (pipeline.stages, kept_positions, index_positions, fill_invalid, nodata)
+
+                def read_windows():
+                    nonlocal cancelled
+                    for out_window in iter_row_windows(width, height, plan.rows):
+                        if cancel_event is not None and cancel_event.is_set():
+                            cancelled = True
+                            return
+                        src_window = Window(col_off + out_window.col_off, row_off + out_window.row_off,
+                                            out_window.width, out_window.height)
+                        try:
+                            data = read_bands(reader, read_list, window=src_window)
+                            # Each output band is masked only by the bands it comes from
+                            read_valid = np.ones(data.shape, dtype=bool)
+                            for position, band_idx in enumerate(read_list):
+                                band_validity = read_validity_mask(reader, [band_idx], window=src_window,
+                                                                   data=[data[position]], use_cache=False,
+                                                                   alpha_band=alpha_band)
+                                if not band_validity.all_valid:
+                                    read_valid[position] = band_validity.to_array()
+                            mask = None
+                            if write_mask:
+                                mask = read_validity_mask(reader, read_list, window=src_window, data=data,
+                                                          use_cache=False, alpha_band=alpha_band).to_gdal()
+                        except Exception as e:
+                            raise RasterHandlerError(f"Error reading rows {out_window.row_off}-{out_window.row_off + out_window.height}: {e}")
+                        shape = (out_count,) + data.shape[1:]
+                        yield (out_window, mask), [data, read_valid, np.empty(shape, dtype=out_dtype),
+                                                   np.empty(shape, dtype=bool)]
+
+                # The fused stages run on the execution backend while windows are read and written in order
+                with rasterio.Env(GDAL_TIFF_INTERNAL_MASK=True), \
+                        rasterio.open(tmp_path, 'w', **meta) as dst:
+                    results = map_windows(_pipeline_window, read_windows(), kernel_args,
+                                          backend=pipeline.backend, workers=plan.workers,
+                                          window_bytes=plan.window_bytes)
+                    for done, ((out_window, mask), (_, _, out, out_valid), _) in enumerate(results, start=1):
+                        try:
+                            dst.write(out, window=out_window)
+                            if mask is not None:
+                                dst.write_mask(mask, window=out_window)
+                            for band, summary, band_valid in zip(out, summaries, out_valid):
+                                if np.issubdtype(out_dtype, np.floating):
+                                    band_valid = band_valid & np.isfinite(band)
+                                summary.add(band, None if band_valid.all() else band_valid)
+                        except Exception as e:
+                            raise RasterHandlerError(f"Error writing rows {out_window.row_off}-{out_window.row_off + out_window.height}: {e}")
+
+                        if progress_callback:
+                            progress_callback(done, total)
+
+                    raster_handler.write_band_metadata(dst, band_names, band_metadata, file_metadata)
+                    for i, summary in enumerate(summaries, start=1):
+                        dst.update_tags(i, **summary.statistics(i - 1).to_tags())
+            finally:
+                if reader is not src:
+                    reader.close()
+
+        if cancelled:
+            raise RasterHandlerError("Pipeline cancelled")
+
+        finalize(tmp_path, out_path)
+        completed = True
+
+        histograms = {i: h for i, h in ((i, s.histogram()) for i, s in enumerate(summaries, start=1)) if h is not None}
+        if histograms:
+            write_pam_histograms(out_path, histograms)
+        return band_names
+
+    except RasterioIOError as e:
+        raise RasterHandlerError(f"I/O error running pipeline: {e}")
+    except RasterioError as e:
+        raise RasterHandlerError(f"Error running pipeline: {e}")
+    except RasterHandlerError:
+        raise
+    except Exception as e:
+        raise RasterHandlerError(f"Unexpected error running pipeline: {e}")
+    finally:
+        if not completed:
+            remove_partial(tmp_path)
@@ -1,10 +1,114 @@
 import rasterio
 import os
+from contextlib import closing
 import numpy as np
 from rasterio.errors import RasterioIOError, RasterioError
 from rasterio.windows import Window
 from rasterio.enums import Resampling
 from exceptions import RasterHandlerError
+from logger import get_logger
+from model.gdal_env import gdal_env
+from model.histogram import get_band_histogram, supports_exact_histogram, write_pam_histograms
+from model.issues import QUICK_LOOK_SECONDS, scan_band_issues, quick_scan_band_issues
+from model.masks import ValidityMask, read_validity_mask, has_mask_band, value_mask_sources, validity_from_values
+from model.governor import plan_windows, governed
+from model.autotune import tune_plan
+from model.chunkstore import ChunkStoreWriter, is_chunk_store
+from model.checkpoint import (CHECKPOINT_INTERVAL, ExportCheckpoint, export_key, source_identity,
+                              partial_path, finalize, remove_partial)
+from model.packing import value_ranges, array_range
+from model.parallel import DEFAULT_BACKEND, map_windows
+from model.statistics import StreamingBandSummary, read_statistics_tags, strip_statistics_tags
+from model.stretch import preview_channel_map, stretch_preview_band
+from model.windowing import (DEFAULT_MEMORY_BUDGET, resolve_window, iter_row_windows,
+                             count_windows, read_bands)
+
+# Tag keys checked, in order, when looking for a band name
+BAND_NAME_KEYS = [
+    'name', 'band_name', 'description', 'title',
+    'BANDNAME', 'DESCRIPTION', 'TITLE',
+    'Name', 'BandName', 'Description'
+]
+
+def _get_band_name(src, band_idx):
+    """
+    Extracts the name of a band from its tags or description.
+    
+    Args:
+        src: Open rasterio dataset
+        band_idx (int): Band index (1-based)
+        
+    Returns:
+        str: Band name, or 'Band N' when no name is available
+    """
+    band_name = f'Band {band_idx}'  # default fallback
+    
+    try:
+        # Try to get band name from tags
+        tags = src.tags(band_idx)
+        
+        for key in BAND_NAME_KEYS:
+            if key in tags and tags[key].strip():
+                return tags[key].strip()
+        
+        # If not found in tags, try to get band description
+        desc = src.descriptions[band_idx - 1] if src.descriptions else None
+        if desc and desc.strip():
+            band_name = desc.strip()
+            
+    except Exception:
+        # If there's any error trying to get the name, keep the fallback
+        pass
+    
+    return band_name
+
+def _get_band_metadata(src, band_idx):
+    """
+    Collects the metadata of a band that is preserved on export.
+    
+    Args:
+        src: Open rasterio dataset
+        band_idx (int): Band index (1-based)
+        
+    Returns:
+        dict: Band tags, description, nodata, dtype and index
+    """
+    return {
+        'tags': dict(src.tags(band_idx)) if src.tags(band_idx) else {},
+        'description': src.descriptions[band_idx - 1] if src.descriptions and band_idx - 1 < len(src.descriptions) else None,
+        'nodata': src.nodata,
+        'dtype': src.dtypes[band_idx - 1] if band_idx - 1 < len(src.dtypes) else src.dtypes[0],
+        'index': band_idx
+    }
+
+def _get_file_metadata(src, band_list=None):
+    """
+    Collects the file level metadata preserved on export.
+    
+    Args:
+        src: Open rasterio dataset
+        band_list (list, optional): 1-based bands being exported; per-band lists
+                                    (colorinterp, scales, offsets, units) are
+                                    restricted to them when given
+        
+    Returns:
+        dict: Global tags, descriptions and per-band lists
+    """
+    def select(values):
+        values = list(values) if values else []
+        if band_list is None or not values:
+            return values
+        return [values[b - 1] for b in band_list if b - 1 < len(values)]
+    
+    return {
+        'tags': dict(src.tags()) if src.tags() else {},  # Global file tags
+        'descriptions': list(src.descriptions) if src.descriptions else [],  # Global descriptions
+        'colorinterp': select(src.colorinterp if hasattr(src, 'colorinterp') else None),
+        'scales': select(src.scales if hasattr(src, 'scales') else None),
+        'offsets': select(src.offsets if hasattr(src, 'offsets') else None),
+        'units': select(src.units if hasattr(src, 'units') else None),
+        'masks': list(src.masks) if hasattr(src, 'masks') and src.masks else [],
+    }
 
 def load_raster(filepath):
     """
@@ -32,33 +136,7 @@ def load_raster(filepath):
             
             for i in range(src.count):
                 band_idx = i + 1  # rasterio uses 1-based indices
-                band_name = f'Band {band_idx}'  # default fallback
-                
-                try:
-                    # Try to get band name from tags
-                    tags = src.tags(band_idx)
-                    
-                    # Check different possible keys for band names
-                    possible_keys = [
-                        'name', 'band_name', 'description', 'title',
-                        'BANDNAME', 'DESCRIPTION', 'TITLE',
-                        'Name', 'BandName', 'Description'
-                    ]
-                    
-                    for key in possible_keys:
-                        if key in tags and tags[key].strip():
-                            band_name = tags[key].strip()
-                            break
-                    
-                    # If not found in tags, try to get band description
-                    if band_name == f'Band {band_idx}':
-                        desc = src.descriptions[band_idx - 1] if src.descriptions else None
-                        if desc and desc.strip():
-                            band_name = desc.strip()
-                            
-                except Exception:
-                    # If there's any error trying to get the name, keep the fallback
-                    pass
+                band_name = _get_band_name(src, band_idx)
                 
                 band_names.append(band_name)
                 
@@ -71,13 +149,88 @@ def load_raster(filepath):
     except Exception as e:
         raise RasterHandlerError(f"Unexpected error loading raster: {e}")
 
-def read_selected_bands(filepath, selected_indices):
+def describe_raster(filepath):
+    """
+    Collects file and per-band metadata without reading pixel data.
+    
+    Uses the same band name extraction as load_raster and adds the
+    information needed to search files without reopening them
+    (bounds, resolution, block layout and overviews).
+    
+    Args:
+        filepath (str): Path to the raster file
+        
+    Returns:
+        dict: File metadata with a 'bands' list holding one dict per band
+        
+    Raises:
+        RasterHandlerError: If there's an error reading the raster
+    """
+    try:
+        if not os.path.isfile(filepath):
+            raise RasterHandlerError(f"File not found: {filepath}")
+        
+        stat = os.stat(filepath)
+        
+        with rasterio.open(filepath) as src:
+            bands = []
+            for i in range(src.count):
+                band_idx = i + 1  # rasterio uses 1-based indices
+                block_y, block_x = src.block_shapes[i]
+                bands.append({
+                    'index': band_idx,
+                    'name': _get_band_name(src, band_idx),
+                    'description': src.descriptions[i] if src.descriptions else None,
+                    'dtype': src.dtypes[i],
+                    'nodata': src.nodatavals[i] if src.nodatavals else src.nodata,
+                    'block_x': block_x,
+                    'block_y': block_y,
+                    'overviews': src.overviews(band_idx),
+                })
+            
+            block_y, block_x = src.block_shapes[0] if src.count else (None, None)
+            
+            return {
+                'path': os.path.abspath(filepath),
+                'size': stat.st_size,
+                'mtime': stat.st_mtime,
+                'driver': src.driver,
+                'width': src.width,
+                'height': src.height,
+                'count': src.count,
+                'crs': src.crs.to_string() if src.crs else None,
+                'res_x': src.res[0],
+                'res_y': src.res[1],
+                'bounds': tuple(src.bounds),
+                'block_x': block_x,
+                'block_y': block_y,
+                'interleave': src.interleaving.name.lower() if src.interleaving else None,
+                'compress': src.compression.name.lower() if src.compression else None,
+                'overviews': src.overviews(1) if src.count else [],
+                'bands': bands,
+            }
+            
+    except RasterioIOError as e:
+        raise RasterHandlerError(f"I/O error opening raster file: {e}")
+    except RasterioError as e:
+        raise RasterHandlerError(f"Error processing raster file: {e}")
+    except RasterHandlerError:
+        raise
+    except Exception as e:
+        raise RasterHandlerError(f"Unexpected error describing raster: {e}")
+
+def read_selected_bands(filepath, selected_indices, window=None, bbox=None):
     """
     Reads specific bands from a raster file.
     
+    When a pixel window or bounding box is given only that region is read and
+    the returned metadata (size and transform) describes the subset.
+    
     Args:
         filepath (str): Path to the raster file
         selected_indices (list): List of band indices to read (0-based)
+        window (tuple, optional): Pixel window (col_off, row_off, width, height)
+        bbox (tuple, optional): Bounding box (left, bottom, right, top) in the raster's CRS
         
     Returns:
         tuple: (bands, meta, selected_band_names, band_metadata, file_metadata) - list of bands, updated metadata, selected band names, band metadata and file metadata
@@ -98,70 +251,34 @@ def read_selected_bands(filepath, selected_indices):
                 if idx < 0 or idx >= src.count:
                     raise RasterHandlerError(f"Invalid band index: {idx}. Available bands: 0-{src.count-1}")
             
-            bands = []
+            read_window = resolve_window(src, window, bbox)
+            
+            # All selected bands in one read (one decode per block of pixel-interleaved files)
+            try:
+                bands = read_bands(src, [i + 1 for i in selected_indices], window=read_window, views=True)
+            except Exception as e:
+                raise RasterHandlerError(f"Error reading bands: {e}")
+            
             selected_band_names = []
             band_metadata = []
             
             for i in selected_indices:
                 try:
                     band_idx = i + 1  # rasterio uses 1-based indices
-                    band = src.read(band_idx)
-                    bands.append(band)
                     
                     # Get selected band name
-                    band_name = f'Band {band_idx}'  # default fallback
-                    
-                    try:
-                        # Try to get band name from tags
-                        tags = src.tags(band_idx)
-                        
-                        # Check different possible keys for band names
-                        possible_keys = [
-                            'name', 'band_name', 'description', 'title',
-                            'BANDNAME', 'DESCRIPTION', 'TITLE',
-                            'Name', 'BandName', 'Description'
-                        ]
-                        
-                        for key in possible_keys:
-                            if key in tags and tags[key].strip():
-                                band_name = tags[key].strip()
-                                break
-                        
-                        # If not found in tags, try to get band description
-                        if band_name == f'Band {band_idx}':
-                            desc = src.descriptions[band_idx - 1] if src.descriptions else None
-                            if desc and desc.strip():
-                                band_name = desc.strip()
-                                
-                    except Exception:
-                        # If there's any error trying to get the name, keep the fallback
-                        pass
+                    band_name = _get_band_name(src, band_idx)
                     
                     selected_band_names.append(band_name)
                     
                     # Preserve band metadata
-                    band_meta = {
-                        'tags': dict(src.tags(band_idx)) if src.tags(band_idx) else {},
-                        'description': src.descriptions[band_idx - 1] if src.descriptions and band_idx - 1 < len(src.descriptions) else None,
-                        'nodata': src.nodata,
-                        'dtype': src.dtypes[band_idx - 1] if band_idx - 1 < len(src.dtypes) else src.dtypes[0],
-                        'index': band_idx
-                    }
-                    band_metadata.append(band_meta)
+                    band_metadata.append(_get_band_metadata(src, band_idx))
                     
                 except Exception as e:
                     raise RasterHandlerError(f"Error reading band {i+1}: {e}")
             
             # Capture ALL metadata from the original file
-            file_metadata = {
-                'tags': dict(src.tags()) if src.tags() else {},  # Global file tags
-                'descriptions': list(src.descriptions) if src.descriptions else [],  # Global descriptions
-                'colorinterp': list(src.colorinterp) if hasattr(src, 'colorinterp') and src.colorinterp else [],
-                'scales': list(src.scales) if hasattr(src, 'scales') and src.scales else [],
-                'offsets': list(src.offsets) if hasattr(src, 'offsets') and src.offsets else [],
-                'units': list(src.units) if hasattr(src, 'units') and src.units else [],
-                'masks': list(src.masks) if hasattr(src, 'masks') and src.masks else [],
-            }
+            file_metadata = _get_file_metadata(src)
             
             # Preserve ALL important metadata from the original file
             meta = src.meta.copy()
@@ -172,6 +289,14 @@ def read_selected_bands(filepath, selected_indices):
                 'dtype': bands[0].dtype if bands else meta.get('dtype'),
             })
             
+            # Describe only the subset when a window was read
+            if read_window is not None:
+                meta.update({
+                    'width': read_window.width,
+                    'height': read_window.height,
+                    'transform': src.window_transform(read_window),
+                })
+            
             # Ensure important geographic metadata is preserved
             if 'transform' not in meta and hasattr(src, 'transform'):
                 meta['transform'] = src.transform
@@ -181,14 +306,7 @@ def read_selected_bands(filepath, selected_indices):
                 meta['nodata'] = src.nodata
             
             # Preserve compression and tiling settings if they exist
-            if 'compress' not in meta:
-                meta['compress'] = 'lzw'
-            if 'tiled' not in meta:
-                meta['tiled'] = True
-            if 'blockxsize' not in meta:
-                meta['blockxsize'] = 256
-            if 'blockysize' not in meta:
-                meta['blockysize'] = 256
+            apply_default_creation_options(meta)
             
         return bands, meta, selected_band_names, band_metadata, file_metadata
         
@@ -202,7 +320,17 @@ def read_selected_bands(filepath, selected_indices):
     except Exception as e:
         raise RasterHandlerError(f"Unexpected error reading bands: {e}")
 
-def generate_preview_image(filepath, band_indices, max_size=500):
+def _store_in_cache(cache, key, value=None, out_path=None, result=True):
+    """Stores a result (a value, or the file at `out_path`); a failure only costs a future recomputation"""
+    try:
+        if out_path is not None:
+            cache.store(key, out_path, result)
+        else:
+            cache.put(key, value)
+    except RasterHandlerError as e:
+        get_logger('igcv_raster_utility.cache').warning("%s", e)
+
+def generate_preview_image(filepath, band_indices, max_size=500, window=None, bbox=None, cache=None):
     """
     Generates a color visualization preview from selected bands with downsampling for performance.
     
@@ -213,6 +341,9 @@ def generate_preview_image(filepath, band_indices, max_size=500):
         filepath (str): Path to the raster file
         band_indices (list): List of 1-3 band indices (0-based) for preview
         max_size (int): Maximum size for preview (width or height)
+        window (tuple, optional): Pixel window (col_off, row_off, width, height) to preview
+        bbox (tuple, optional): Bounding box (left, bottom, right, top) in the raster's CRS
+        cache (ResultCache, optional): Serve a repeated preview from this cache, storing new ones
         
     Returns:
         numpy.ndarray: Preview image array (height, width, 3) with values 0-255
@@ -227,14 +358,28 @@ def generate_preview_image(filepath, band_indices, max_size=500):
         if not os.path.exists(filepath):
             raise RasterHandlerError(f"File not found: {filepath}")
         
-        with rasterio.open(filepath) as src:
+        cache_key = None
+        if cache is not None:
+            cache_key = cache.key('preview', filepath, bands=list(band_indices), max_size=max_size,
+                                  window=window, bbox=bbox)
+            cached = cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
+        with gdal_env('preview'), rasterio.open(filepath) as src:
             # Validate band indices
             for idx in band_indices:
                 if idx < 0 or idx >= src.count:
                     raise RasterHandlerError(f"Invalid band index: {idx}. Available bands: 0-{src.count-1}")
             
+            # Only the requested region is read
+            read_window = resolve_window(src, window, bbox)
+            
             # Calculate downsampling factor
-            width, height = src.width, src.height
+            if read_window is not None:
+                width, height = read_window.width, read_window.height
+            else:
+                width, height = src.width, src.height
             scale_factor = max(width, height) / max_size
             scale_factor = max(1, int(scale_factor))  # At least 1 (no upsampling)
             
@@ -246,95 +391,52 @@ def generate_preview_image(filepath, band_indices, max_size=500):
             preview_width = max(100, preview_width)
             preview_height = max(100, preview_height)
             
-            # Read the selected bands with downsampling
-            band_data_list = []
-            for band_idx in band_indices:
-                try:
-                    # Read band with downsampling
-                    band_data = src.read(band_idx + 1, 
-                                        out_shape=(preview_height, preview_width),
-                                        resampling=Resampling.average)
-                    band_data_list.append(band_data)
-                except Exception as e:
-                    raise RasterHandlerError(f"Error reading band {band_idx + 1}: {e}")
-            
-            # Compose preview array based on number of bands
-            if len(band_indices) == 1:
-                # Single band: grayscale visualization (same band for all channels)
-                preview_array = np.stack([band_data_list[0], band_data_list[0], band_data_list[0]], axis=-1)
-            elif len(band_indices) == 2:
-                # Two bands: channel1=band1, channel2=band2, channel3=band1
-                preview_array = np.stack([band_data_list[0], band_data_list[1], band_data_list[0]], axis=-1)
-            else:
-                # Three bands: channel1=band1, channel2=band2, channel3=band3
-                preview_array = np.stack(band_data_list, axis=-1)
+            # Read the selected bands with downsampling, all in one read
+            try:
+                band_data_list = read_bands(src, [b + 1 for b in band_indices], window=read_window,
+                                            out_shape=(preview_height, preview_width),
+                                            resampling=Resampling.average, views=True)
+            except Exception as e:
+                raise RasterHandlerError(f"Error reading bands: {e}")
             
-            # Handle NoData values
-            nodata = src.nodata
-            if nodata is not None:
-                # Create mask for NoData values
-                mask = np.any(preview_array == nodata, axis=-1)
-                # Replace NoData with 0 for visualization
-                preview_array[mask] = 0
+            # Channels of the preview mapped to the read bands (1 band: grayscale)
+            channel_map = preview_channel_map(len(band_indices))
             
-            # Normalize each band to 0-255 range with improved handling for float64 data
-            normalized_preview = np.zeros_like(preview_array, dtype=np.uint8)
+            # Handle invalid pixels (NoData, mask band, NaN/infinite) with the shared validity mask
+            validity = read_validity_mask(src, [b + 1 for b in band_indices], window=read_window,
+                                          out_shape=(preview_height, preview_width),
+                                          data=band_data_list)
+            valid = None if validity.all_valid else validity.to_array()
             
-            for i in range(3):
-                band_data = preview_array[:, :, i]
-                
-                # Handle NaN and infinite values
-                band_data = np.nan_to_num(band_data, nan=0.0, posinf=0.0, neginf=0.0)
+            # Stretch each band once to 0-255 in its own dtype (LUT for 8/16-bit
+            # integers, in-place float32/float64 math otherwise) and copy it to its channels
+            normalized_preview = np.empty((preview_height, preview_width, 3), dtype=np.uint8)
+            stretched = np.empty((preview_height, preview_width), dtype=np.uint8)
+            scratch = None
+            
+            for position, band_data in enumerate(band_data_list):
+                if np.issubdtype(band_data.dtype, np.floating) and (scratch is None or scratch.dtype != band_data.dtype):
+                    scratch = np.empty(band_data.shape, dtype=band_data.dtype)
                 
-                # Skip if band is all zeros or all same value
-                if np.all(band_data == 0) or np.all(band_data == band_data.flat[0]):
-                    normalized_preview[:, :, i] = 0
-                    continue
+                # 8/16-bit integers: percentiles from the cached per-band histogram
+                histogram = None
+                if supports_exact_histogram(band_data.dtype):
+                    band_idx = band_indices[position] + 1
+                    band_validity = read_validity_mask(src, [band_idx], window=read_window,
+                                                       out_shape=(preview_height, preview_width),
+                                                       data=[band_data])
+                    histogram = get_band_histogram(src, band_idx, window=read_window,
+                                                   out_shape=(preview_height, preview_width), data=band_data,
+                                                   valid=None if band_validity.all_valid else band_validity.to_array())
                 
-                # For float64 data, use more robust normalization
-                if band_data.dtype == np.float64:
-                    # Remove outliers using more aggressive percentiles
-                    valid_data = band_data[np.isfinite(band_data) & (band_data != 0)]
-                    
-                    if len(valid_data) > 0:
-                        # Use 1-99 percentile for better handling of extreme values
-                        p1, p99 = np.percentile(valid_data, (1, 99))
-                        
-                        # If percentiles are too close, use min/max
-                        if p99 - p1 < 1e-10:
-                            p1, p99 = np.min(valid_data), np.max(valid_data)
-                        
-                        # Avoid division by zero
-                        if p99 > p1:
-                            # Normalize to 0-255 with clipping
-                            normalized = np.clip((band_data - p1) / (p99 - p1) * 255, 0, 255)
-                        else:
-                            # If all values are the same, set to middle gray
-                            normalized = np.full_like(band_data, 128, dtype=np.uint8)
-                    else:
-                        # If no valid data, set to black
-                        normalized = np.zeros_like(band_data, dtype=np.uint8)
-                else:
-                    # For other data types, use original logic
-                    non_zero_data = band_data[band_data != 0]
-                    if len(non_zero_data) > 0:
-                        # Use 2-98 percentile for better contrast
-                        p2, p98 = np.percentile(non_zero_data, (2, 98))
-                        
-                        # Avoid division by zero
-                        if p98 > p2:
-                            # Normalize to 0-255
-                            normalized = np.clip((band_data - p2) / (p98 - p2) * 255, 0, 255)
-                        else:
-                            # If all values are the same, set to middle gray
-                            normalized = np.full_like(band_data, 128, dtype=np.uint8)
-                    else:
-                        # If all values are zero, set to black
-                        normalized = np.zeros_like(band_data, dtype=np.uint8)
-                
-                normalized_preview[:, :, i] = normalized.astype(np.uint8)
-            
-            return normalized_preview
+                stretch_preview_band(band_data, valid, out=stretched, scratch=scratch, histogram=histogram)
+                for channel, source in enumerate(channel_map):
+                    if source == position:
+                        normalized_preview[:, :, channel] = stretched
+        
+        if cache is not None:
+            _store_in_cache(cache, cache_key, normalized_preview)
+        return normalized_preview
             
     except RasterioIOError as e:
         raise RasterHandlerError(f"I/O error generating preview: {e}")
@@ -346,83 +448,104 @@ def generate_preview_image(filepath, band_indices, max_size=500):
     except Exception as e:
         raise RasterHandlerError(f"Unexpected error generating preview: {e}")
 
-def detect_data_issues(filepath, band_indices):
+def detect_data_issues(filepath, band_indices, early_exit=False, memory_budget=DEFAULT_MEMORY_BUDGET,
+                       quick_look=False, time_budget=QUICK_LOOK_SECONDS, cancel_event=None, progress_callback=None):
     """
     Detect potential issues in raster data that might cause preview problems.
     
+    The bands are scanned window by window with every check fused in one
+    pass (see model/issues.py), so memory stays within `memory_budget`.
+    With `quick_look` only the coarsest overview and random blocks are read
+    within `time_budget`; the findings are then probabilistic and a full
+    scan should confirm them.
+    
     Args:
         filepath (str): Path to the raster file
         band_indices (list): List of band indices (0-based) to analyze
+        early_exit (bool): Stop each band at its first issue (enough to decide whether
+                           corrections are needed); counts are then lower bounds
+        memory_budget (int): Maximum bytes of pixel data per window
+        quick_look (bool): Inspect a sample (overview and random blocks) instead of every pixel
+        time_budget (float): Maximum seconds spent sampling blocks in quick-look mode
+        cancel_event (threading.Event, optional): Stops a full scan when set
+        progress_callback (callable, optional): Called with (done, total) during a full scan
         
     Returns:
-        dict: Issues detected and recommendations
+        dict: Issues detected and recommendations ('quick_look' tells whether they come from a sample)
     """
     try:
-        with rasterio.open(filepath) as src:
+        with gdal_env('statistics'), rasterio.open(filepath) as src:
             issues = {
                 'has_issues': False,
                 'issues': [],
                 'recommendations': [],
-                'band_details': {}
+                'band_details': {},
+                'quick_look': quick_look
             }
             
-            total_pixels = src.width * src.height
+            band_list = [band_idx + 1 for band_idx in band_indices]
+            if quick_look:
+                scans = quick_scan_band_issues(src, band_list, time_budget=time_budget)
+            else:
+                scans = scan_band_issues(src, band_list, early_exit=early_exit, memory_budget=memory_budget,
+                                         cancel_event=cancel_event, progress_callback=progress_callback)
             
-            for i, band_idx in enumerate(band_indices):
-                band_data = src.read(band_idx + 1)
+            for band_idx in band_indices:
+                scan = scans[band_idx + 1]
                 band_issues = []
                 band_recommendations = []
+                # After an early exit the counts only cover the pixels read so far;
+                # in quick-look mode they refer to the sampled pixels
+                if scan.sample_pixels is not None:
+                    at_least = ""
+                    pixels = scan.sample_pixels
+                    unit = "sampled pixels"
+                else:
+                    at_least = "" if scan.complete else "at least "
+                    pixels = src.width * src.height
+                    unit = "pixels"
                 
                 # Check for NaN values
-                nan_count = np.sum(np.isnan(band_data))
-                if nan_count > 0:
-                    nan_percent = (nan_count / total_pixels) * 100
-                    band_issues.append(f"NaN values: {nan_count} pixels ({nan_percent:.2f}%)")
+                if scan.nan_count > 0:
+                    nan_percent = (scan.nan_count / pixels) * 100
+                    band_issues.append(f"NaN values: {at_least}{scan.nan_count} {unit} ({nan_percent:.2f}%)")
                     band_recommendations.append("Convert NaN to NoData (-9999)")
                 
                 # Check for infinite values
-                inf_count = np.sum(np.isinf(band_data))
-                if inf_count > 0:
-                    inf_percent = (inf_count / total_pixels) * 100
-                    band_issues.append(f"Infinite values: {inf_count} pixels ({inf_percent:.2f}%)")
+                if scan.inf_count > 0:
+                    inf_percent = (scan.inf_count / pixels) * 100
+                    band_issues.append(f"Infinite values: {at_least}{scan.inf_count} {unit} ({inf_percent:.2f}%)")
                     band_recommendations.append("Convert infinite values to NoData (-9999)")
                 
                 # Check for extreme values in float64
-                if band_data.dtype == np.float64:
-                    valid_data = band_data[np.isfinite(band_data)]
-                    if len(valid_data) > 0:
-                        min_val = np.min(valid_data)
-                        max_val = np.max(valid_data)
-                        
-                        # Check for very large or very small values
-                        if abs(min_val) > 1e6 or abs(max_val) > 1e6:
-                            band_issues.append(f"Extreme values: min={min_val:.2e}, max={max_val:.2e}")
-                            band_recommendations.append("Consider data scaling or clipping")
-                        
-                        # Check for very small range (might cause preview issues)
-                        if max_val - min_val < 1e-10:
-                            band_issues.append("Very small data range - might cause preview issues")
-                            band_recommendations.append("Check if data needs scaling")
+                if scan.extreme:
+                    band_issues.append(f"Extreme values: min={scan.minimum:.2e}, max={scan.maximum:.2e}")
+                    band_recommendations.append("Consider data scaling or clipping")
                 
-                # Check for NoData issues
-                nodata = src.nodata
-                if nodata is None:
-                    # Check if there are suspicious patterns that might indicate NoData
-                    zero_count = np.sum(band_data == 0)
-                    zero_percent = (zero_count / total_pixels) * 100
-                    
-                    if zero_percent > 50:  # More than 50% zeros
-                        band_issues.append(f"High zero count: {zero_count} pixels ({zero_percent:.2f}%) - might be NoData")
-                        band_recommendations.append("Consider setting NoData to 0")
+                # Check for very small range (might cause preview issues)
+                if scan.small_range:
+                    band_issues.append("Very small data range - might cause preview issues")
+                    band_recommendations.append("Check if data needs scaling")
+                
+                # Suspicious zero patterns (no NoData or mask band) that might indicate NoData
+                if scan.high_zero_count:
+                    zero_percent = (scan.zero_count / pixels) * 100
+                    band_issues.append(f"High zero count: {at_least}{scan.zero_count} {unit} ({zero_percent:.2f}%) - might be NoData")
+                    band_recommendations.append("Consider setting NoData to 0")
                 
                 # Store band details
                 issues['band_details'][f'band_{band_idx + 1}'] = {
                     'issues': band_issues,
                     'recommendations': band_recommendations,
-                    'dtype': str(band_data.dtype),
-                    'shape': band_data.shape,
-                    'nan_count': int(nan_count),
-                    'inf_count': int(inf_count)
+                    'dtype': str(scan.dtype),
+                    'shape': (src.height, src.width),
+                    'nan_count': scan.nan_count,
+                    'inf_count': scan.inf_count,
+                    'invalid_count': scan.invalid_count,
+                    'complete': scan.complete,
+                    'sample_pixels': scan.sample_pixels,
+                    'sample_blocks': scan.sample_blocks,
+                    'issue_fraction_bound': scan.issue_fraction_bound
                 }
                 
                 # Add to overall issues
@@ -462,23 +585,29 @@ def debug_band_statistics(filepath, band_indices):
             for i, band_idx in enumerate(band_indices):
                 band_data = src.read(band_idx + 1)
                 
+                # Statistics are computed over valid pixels only (shared validity mask)
+                validity = read_validity_mask(src, [band_idx + 1], data=band_data)
+                valid_data = band_data[validity.to_array()] if not validity.all_valid else band_data.ravel()
+                if valid_data.size == 0:
+                    valid_data = np.zeros(1, dtype=band_data.dtype)
+                
                 # Basic statistics
                 band_stats = {
-                    'min': float(np.min(band_data)),
-                    'max': float(np.max(band_data)),
-                    'mean': float(np.mean(band_data)),
-                    'std': float(np.std(band_data)),
+                    'min': float(np.min(valid_data)),
+                    'max': float(np.max(valid_data)),
+                    'mean': float(np.mean(valid_data)),
+                    'std': float(np.std(valid_data)),
                     'dtype': str(band_data.dtype),
                     'shape': band_data.shape,
                     'nan_count': int(np.sum(np.isnan(band_data))),
                     'inf_count': int(np.sum(np.isinf(band_data))),
-                    'zero_count': int(np.sum(band_data == 0)),
-                    'unique_values': int(len(np.unique(band_data)))
+                    'invalid_count': validity.invalid_count,
+                    'zero_count': int(np.sum(valid_data == 0)),
+                    'unique_values': int(len(np.unique(valid_data)))
                 }
                 
                 # Percentiles
-                valid_data = band_data[np.isfinite(band_data)]
-                if len(valid_data) > 0:
+                if validity.valid_count > 0:
                     percentiles = np.percentile(valid_data, [1, 5, 25, 50, 75, 95, 99])
                     band_stats.update({
                         'p1': float(percentiles[0]),
@@ -497,14 +626,38 @@ def debug_band_statistics(filepath, band_indices):
     except Exception as e:
         return {'error': str(e)}
 
-def apply_data_corrections(filepath, band_indices, output_path=None):
+def _correct_window(data, external, positions, nodata_values, fill_value):
+    """Window kernel of apply_data_corrections: fills invalid pixels of the selected bands in place"""
+    if not positions:
+        return ValidityMask.from_array(np.ones(data.shape[1:], dtype=bool))
+    validity = validity_from_values([data[p] for p in positions], nodata_values, external)
+    if not validity.all_valid:
+        # Filled in place, in the band's own dtype (no float promotion)
+        invalid = ~validity.to_array()
+        for p in positions:
+            np.copyto(data[p], fill_value, casting='unsafe', where=invalid)
+    return validity
+
+def apply_data_corrections(filepath, band_indices, output_path=None, memory_budget=DEFAULT_MEMORY_BUDGET,
+                           backend=DEFAULT_BACKEND, workers=None):
     """
     Apply automatic corrections to raster data to fix common issues.
     
+    Invalid pixels of the selected bands (NaN, infinite) are marked in the
+    validity mask, which is computed once per window. When the source has a
+    NoData value they are filled with it; otherwise they are filled with 0 and
+    the mask is written as an internal GDAL mask band, so no sentinel value is
+    needed. The file is processed in strips bounded by `memory_budget`; the
+    per-window correction can run on a thread or process pool (see
+    model/parallel.py) while strips are still written in order.
+    
     Args:
         filepath (str): Path to the input raster file
         band_indices (list): List of band indices (0-based) to process
         output_path (str, optional): Output file path. If None, creates a temporary file.
+        memory_budget (int): Maximum bytes of pixel data kept in memory
+        backend (str): Execution backend of the correction kernel ('serial', 'thread' or 'process')
+        workers (int, optional): Number of workers of the thread/process backends
         
     Returns:
         str: Path to the corrected file
@@ -518,36 +671,46 @@ def apply_data_corrections(filepath, band_indices, output_path=None):
             base_path = os.path.splitext(filepath)[0]
             output_path = f"{base_path}_corrected.tif"
         
-        with rasterio.open(filepath) as src:
-            # Read all bands to preserve metadata
-            all_bands = []
-            for i in range(src.count):
-                band_data = src.read(i + 1)
-                all_bands.append(band_data)
-            
-            # Apply corrections to selected bands
-            for band_idx in band_indices:
-                if 0 <= band_idx < len(all_bands):
-                    band_data = all_bands[band_idx]
-                    
-                    # Convert NaN and infinite values to -9999
-                    band_data = np.nan_to_num(band_data, nan=-9999.0, posinf=-9999.0, neginf=-9999.0)
-                    
-                    # Update the band data
-                    all_bands[band_idx] = band_data
+        with gdal_env('export'), rasterio.open(filepath) as src:
+            all_bands = list(range(1, src.count + 1))
+            selected = [b + 1 for b in band_indices if 0 <= b < src.count]
+            nodata = src.nodata
+            write_mask = nodata is None
             
             # Prepare metadata for export
             export_meta = src.meta.copy()
-            export_meta['nodata'] = -9999.0  # Set NoData value
             
-            # Export corrected file
-            with rasterio.open(output_path, 'w', **export_meta) as dst:
-                for i, band in enumerate(all_bands, start=1):
-                    dst.write(band, i)
-                    
-                    # Preserve band names if available
+            # Window size and worker count that keep every in-flight window within the budget
+            plan = plan_windows(src.width, src.count, src.dtypes[0], memory_budget,
+                                block_height=src.block_shapes[0][0], operation='correct',
+                                backend=backend, workers=workers, height=src.height)
+            rows = plan.rows
+            
+            # Validity from the values (NoData, non-finite); only mask bands are read from the file
+            nodata_values, mask_bands = value_mask_sources(src, selected)
+            kernel_args = ([b - 1 for b in selected], nodata_values, nodata if nodata is not None else 0)
+            
+            def read_windows():
+                for window in iter_row_windows(src.width, src.height, rows):
+                    # Read all bands to preserve them
+                    data = read_bands(src, all_bands, window=window)
+                    external = src.read_masks(mask_bands, window=window) if mask_bands else np.empty(0, np.uint8)
+                    yield window, [data, external]
+            
+            # Export corrected file (mask stored inside the GeoTIFF)
+            with rasterio.Env(GDAL_TIFF_INTERNAL_MASK=True), \
+                    rasterio.open(output_path, 'w', **export_meta) as dst:
+                for window, (data, _), validity in map_windows(_correct_window, read_windows(), kernel_args,
+                                                               backend=backend, workers=plan.workers,
+                                                               window_bytes=plan.window_bytes):
+                    dst.write(data, window=window)
+                    if write_mask:
+                        dst.write_mask(validity.to_gdal(), window=window)
+                
+                # Preserve band names if available
+                for i in all_bands:
                     try:
-                        band_name = src.tags(i).get('name', f'Band {i}')
+                        band_name = _get_band_name(src, i)
                         dst.update_tags(i, name=band_name)
                         dst.set_band_description(i, band_name)
                     except Exception:
@@ -558,9 +721,203 @@ def apply_data_corrections(filepath, band_indices, output_path=None):
     except Exception as e:
         raise RasterHandlerError(f"Error applying data corrections: {e}")
 
-def export_tif(out_path, bands, meta, band_names=None, band_metadata=None, file_metadata=None):
+def check_output_path(out_path):
     """
-    Exports bands to a GeoTIFF file.
+    Validates that an output file can be written.
+    
+    Args:
+        out_path (str): Path to the output file
+        
+    Raises:
+        RasterHandlerError: If the directory doesn't exist or the file isn't writable
+    """
+    # Check if output directory exists
+    output_dir = os.path.dirname(out_path)
+    if output_dir and not os.path.exists(output_dir):
+        raise RasterHandlerError(f"Output directory does not exist: {output_dir}")
+    
+    # Check if output file already exists and is writable
+    if os.path.exists(out_path):
+        if not os.access(out_path, os.W_OK):
+            raise RasterHandlerError(f"No write permission for file: {out_path}")
+
+def apply_default_creation_options(meta):
+    """
+    Fills in the compression and tiling settings used for exported files.
+    
+    Args:
+        meta (dict): Raster metadata, updated in place
+        
+    Returns:
+        dict: The same metadata dictionary
+    """
+    # Preserve compression and tiling settings if they exist
+    if 'compress' not in meta:
+        meta['compress'] = 'lzw'
+    if 'tiled' not in meta:
+        meta['tiled'] = True
+    if 'blockxsize' not in meta:
+        meta['blockxsize'] = 256
+    if 'blockysize' not in meta:
+        meta['blockysize'] = 256
+    return meta
+
+def write_band_metadata(dst, band_names=None, band_metadata=None, file_metadata=None):
+    """
+    Writes band names, tags and file level metadata to an open output dataset.
+    
+    Args:
+        dst: Rasterio dataset opened for writing
+        band_names (list, optional): List of band names to preserve
+        band_metadata (list, optional): List of band metadata to preserve
+        file_metadata (dict, optional): Global file metadata to preserve
+    """
+    # Preserve global file tags if they exist
+    if file_metadata and file_metadata.get('tags'):
+        try:
+            dst.update_tags(**file_metadata['tags'])
+        except Exception:
+            # If unable to preserve global tags, continue
+            pass
+    
+    count = dst.count
+    for i in range(1, count + 1):
+        # Preserve band name if provided
+        if band_names and i <= len(band_names):
+            band_name = band_names[i-1]
+            # Set band name in tags
+            dst.update_tags(i, name=band_name)
+            # Set band description
+            dst.set_band_description(i, band_name)
+        
+        # Preserve additional band metadata if provided
+        if band_metadata and i <= len(band_metadata):
+            band_meta = band_metadata[i-1]
+            
+            # Preserve original tags
+            if band_meta.get('tags'):
+                for key, value in band_meta['tags'].items():
+                    if key != 'name':  # Avoid overwriting the name already set
+                        dst.update_tags(i, **{key: value})
+            
+            # Preserve description if not set by name
+            if not band_names or i > len(band_names):
+                if band_meta.get('description'):
+                    dst.set_band_description(i, band_meta['description'])
+    
+    # Preserve specific band metadata if available
+    if file_metadata:
+        # Preserve color interpretation
+        if file_metadata.get('colorinterp'):
+            try:
+                dst.colorinterp = file_metadata['colorinterp'][:count]
+            except Exception:
+                pass
+        
+        # Preserve scales
+        if file_metadata.get('scales'):
+            try:
+                dst.scales = file_metadata['scales'][:count]
+            except Exception:
+                pass
+        
+        # Preserve offsets
+        if file_metadata.get('offsets'):
+            try:
+                dst.offsets = file_metadata['offsets'][:count]
+            except Exception:
+                pass
+        
+        # Preserve units
+        if file_metadata.get('units'):
+            try:
+                dst.units = file_metadata['units'][:count]
+            except Exception:
+                pass
+
+def _without_statistics(band_metadata):
+    """Drops the source STATISTICS_* tags, which no longer describe the exported pixels"""
+    if not band_metadata:
+        return band_metadata
+    return [dict(meta, tags=strip_statistics_tags(meta.get('tags') or {})) for meta in band_metadata]
+
+def _in_memory_validity(band, nodata):
+    """Validity of an in-memory band: not NoData and, for floats, finite"""
+    valid = None
+    if np.issubdtype(band.dtype, np.floating):
+        valid = np.isfinite(band)
+    if nodata is not None and not np.isnan(nodata):
+        not_nodata = band != nodata
+        valid = not_nodata if valid is None else np.logical_and(valid, not_nodata, out=valid)
+    return valid
+
+def _histogram_range(band):
+    """Range used to bin the histogram of an in-memory float band"""
+    if supports_exact_histogram(band.dtype) or not np.issubdtype(band.dtype, np.number):
+        return None
+    finite = band[np.isfinite(band)] if np.issubdtype(band.dtype, np.floating) else band
+    if finite.size == 0:
+        return None
+    return float(finite.min()), float(finite.max())
+
+def _write_export_statistics(dst, summaries):
+    """Embeds the STATISTICS_* tags accumulated while writing each band"""
+    for i, summary in enumerate(summaries, start=1):
+        dst.update_tags(i, **summary.statistics(i - 1).to_tags())
+
+def _write_export_histograms(out_path, summaries):
+    """Writes the accumulated histograms to the PAM sidecar of the exported file"""
+    histograms = {}
+    for i, summary in enumerate(summaries, start=1):
+        histogram = summary.histogram()
+        if histogram is not None:
+            histograms[i] = histogram
+    if histograms:
+        write_pam_histograms(out_path, histograms)
+
+def _open_store_writer(out_path, meta, store, with_mask=False):
+    """
+    Opens a chunk store for the bands described by a GeoTIFF export's metadata,
+    at the partial path of `out_path` (moved there by finalize()).
+    """
+    if os.path.exists(out_path) and not is_chunk_store(out_path):
+        raise RasterHandlerError(f"Output exists and is not a chunk store: {out_path}")
+    return ChunkStoreWriter(partial_path(out_path), meta['count'], meta['height'], meta['width'], meta['dtype'],
+                            nodata=meta.get('nodata'), options=store, with_mask=with_mask)
+
+def _write_store_attrs(dst, meta, band_names=None, band_metadata=None, file_metadata=None, summaries=()):
+    """
+    Stores in a chunk store what a GeoTIFF export keeps in its tags:
+    georeferencing, band names and metadata, scales/offsets and statistics.
+    """
+    crs = meta.get('crs')
+    transform = meta.get('transform')
+    file_metadata = file_metadata or {}
+    nodata = meta.get('nodata')
+    statistics = []
+    for i, summary in enumerate(summaries):
+        stats = summary.statistics(i)
+        statistics.append({'minimum': stats.minimum, 'maximum': stats.maximum, 'mean': stats.mean,
+                           'std': stats.std, 'valid_percent': stats.valid_percent})
+    dst.update_attrs(
+        crs=crs.to_wkt() if crs else None,
+        transform=list(transform)[:6] if transform is not None else None,
+        nodata=None if nodata is None else ('NaN' if np.isnan(nodata) else float(nodata)),
+        band_names=list(band_names or []),
+        band_tags=[meta_item.get('tags') or {} for meta_item in (band_metadata or [])],
+        scales=list(file_metadata.get('scales') or [])[:dst.count] or None,
+        offsets=list(file_metadata.get('offsets') or [])[:dst.count] or None,
+        units=list(file_metadata.get('units') or [])[:dst.count] or None,
+        tags=file_metadata.get('tags') or {},
+        statistics=statistics,
+    )
+
+def export_tif(out_path, bands, meta, band_names=None, band_metadata=None, file_metadata=None,
+               compute_statistics=True, histogram_bins=None, packing=None, store=None):
+    """
+    Exports bands to a GeoTIFF file (or a chunk store).
+    
+    The file is written next to `out_path` and renamed once complete.
     
     Args:
         out_path (str): Path to the output file
@@ -569,6 +926,14 @@ def export_tif(out_path, bands, meta, band_names=None, band_metadata=None, file_
         band_names (list, optional): List of band names to preserve
         band_metadata (list, optional): List of band metadata to preserve
         file_metadata (dict, optional): Global file metadata to preserve
+        compute_statistics (bool): Whether to embed STATISTICS_* tags computed from the bands
+        histogram_bins (int, optional): Also write histograms with up to this many bins
+                                        to the PAM sidecar (.aux.xml)
+        packing (PackingOptions, optional): Output data type, with scale/offset packing;
+                                            the scales/offsets in `file_metadata` are
+                                            replaced by the packed ones
+        store (ChunkStoreOptions, optional): Write a chunked array store directory
+                                             (see model.chunkstore) instead of a GeoTIFF
         
     Raises:
         RasterHandlerError: If there's an error exporting the file
@@ -577,89 +942,67 @@ def export_tif(out_path, bands, meta, band_names=None, band_metadata=None, file_
         if not bands:
             raise RasterHandlerError("No bands provided for export")
         
-        # Check if output directory exists
-        output_dir = os.path.dirname(out_path)
-        if output_dir and not os.path.exists(output_dir):
-            raise RasterHandlerError(f"Output directory does not exist: {output_dir}")
-        
-        # Check if output file already exists and is writable
-        if os.path.exists(out_path):
-            if not os.access(out_path, os.W_OK):
-                raise RasterHandlerError(f"No write permission for file: {out_path}")
+        check_output_path(out_path)
         
         # Ensure metadata is correct
         export_meta = meta.copy()
         if 'dtype' not in export_meta and bands:
             export_meta['dtype'] = bands[0].dtype
         
-        with rasterio.open(out_path, 'w', **export_meta) as dst:
-            # Preserve global file tags if they exist
-            if file_metadata and file_metadata.get('tags'):
-                try:
-                    dst.update_tags(**file_metadata['tags'])
-                except Exception:
-                    # If unable to preserve global tags, continue
-                    pass
-            
-            for i, band in enumerate(bands, start=1):
+        if packing is not None:
+            file_metadata = dict(file_metadata or {})
+            validity = [_in_memory_validity(band, export_meta.get('nodata')) for band in bands]
+            ranges = None
+            if packing.needs_ranges():
+                ranges = [array_range(band, valid) for band, valid in zip(bands, validity)]
+            packer = packing.resolve(len(bands), ranges, file_metadata.get('scales'), file_metadata.get('offsets'),
+                                     source_integer=not np.issubdtype(bands[0].dtype, np.floating))
+            bands = [packer.pack(i, band, valid) for i, (band, valid) in enumerate(zip(bands, validity))]
+            file_metadata['scales'] = packer.scales
+            file_metadata['offsets'] = packer.offsets
+            export_meta['dtype'] = packing.dtype.name
+            export_meta['nodata'] = packing.nodata
+        
+        band_metadata = _without_statistics(band_metadata)
+        summaries = []
+        if store is not None:
+            if compute_statistics:
+                for band in bands:
+                    summary = StreamingBandSummary(band.dtype, None, None)
+                    summary.add(band, _in_memory_validity(band, export_meta.get('nodata')))
+                    summaries.append(summary)
+            height, width = bands[0].shape
+            export_meta.update(count=len(bands), height=height, width=width)
+            with _open_store_writer(out_path, export_meta, store) as dst:
+                dst.write(np.stack(bands).astype(export_meta['dtype'], copy=False), Window(0, 0, width, height))
+                _write_store_attrs(dst, export_meta, band_names, band_metadata, file_metadata, summaries)
+            finalize(partial_path(out_path), out_path)
+            return
+        
+        tmp_path = partial_path(out_path)
+        try:
+            with gdal_env('export'), rasterio.open(tmp_path, 'w', **export_meta) as dst:
+                for i, band in enumerate(bands, start=1):
+                    try:
+                        dst.write(band, i)
+                    except Exception as e:
+                        raise RasterHandlerError(f"Error writing band {i}: {e}")
+                    if compute_statistics:
+                        summary = StreamingBandSummary(band.dtype, histogram_bins, _histogram_range(band))
+                        summary.add(band, _in_memory_validity(band, export_meta.get('nodata')))
+                        summaries.append(summary)
+                
                 try:
-                    dst.write(band, i)
-                    
-                    # Preserve band name if provided
-                    if band_names and i <= len(band_names):
-                        band_name = band_names[i-1]
-                        # Set band name in tags
-                        dst.update_tags(i, name=band_name)
-                        # Set band description
-                        dst.set_band_description(i, band_name)
-                    
-                    # Preserve additional band metadata if provided
-                    if band_metadata and i <= len(band_metadata):
-                        band_meta = band_metadata[i-1]
-                        
-                        # Preserve original tags
-                        if band_meta.get('tags'):
-                            for key, value in band_meta['tags'].items():
-                                if key != 'name':  # Avoid overwriting the name already set
-                                    dst.update_tags(i, **{key: value})
-                        
-                        # Preserve description if not set by name
-                        if not band_names or i > len(band_names):
-                            if band_meta.get('description'):
-                                dst.set_band_description(i, band_meta['description'])
-                    
-                    # Preserve specific band metadata if available
-                    if file_metadata:
-                        # Preserve color interpretation
-                        if file_metadata.get('colorinterp') and i <= len(file_metadata['colorinterp']):
-                            try:
-                                dst.colorinterp = file_metadata['colorinterp'][:len(bands)]
-                            except Exception:
-                                pass
-                        
-                        # Preserve scales
-                        if file_metadata.get('scales') and i <= len(file_metadata['scales']):
-                            try:
-                                dst.scales = file_metadata['scales'][:len(bands)]
-                            except Exception:
-                                pass
-                        
-                        # Preserve offsets
-                        if file_metadata.get('offsets') and i <= len(file_metadata['offsets']):
-                            try:
-                                dst.offsets = file_metadata['offsets'][:len(bands)]
-                            except Exception:
-                                pass
-                        
-                        # Preserve units
-                        if file_metadata.get('units') and i <= len(file_metadata['units']):
-                            try:
-                                dst.units = file_metadata['units'][:len(bands)]
-                            except Exception:
-                                pass
-                        
+                    write_band_metadata(dst, band_names, band_metadata, file_metadata)
+                    _write_export_statistics(dst, summaries)
                 except Exception as e:
-                    raise RasterHandlerError(f"Error writing band {i}: {e}")
+                    raise RasterHandlerError(f"Error writing band metadata: {e}")
+        except BaseException:
+            remove_partial(tmp_path)
+            raise
+        
+        finalize(tmp_path, out_path)
+        _write_export_histograms(out_path, summaries)
                     
     except RasterioIOError as e:
         raise RasterHandlerError(f"I/O error exporting file: {e}")
@@ -670,3 +1013,281 @@ def export_tif(out_path, bands, meta, band_names=None, band_metadata=None, file_
         raise
     except Exception as e:
         raise RasterHandlerError(f"Unexpected error exporting file: {e}")
+
+def stream_export(filepath, selected_indices, out_path, window=None, bbox=None, reproject=None,
+                  memory_budget=DEFAULT_MEMORY_BUDGET, progress_callback=None,
+                  compute_statistics=True, histogram_bins=None, cancel_event=None, autotune=False,
+                  packing=None, store=None, resume=True, checkpoint_interval=CHECKPOINT_INTERVAL,
+                  cache=None):
+    """
+    Exports selected bands to a GeoTIFF reading and writing one strip at a time.
+    
+    Unlike read_selected_bands + export_tif the bands are never fully loaded:
+    memory use is bounded by `memory_budget`. An optional reprojection stage
+    warps each strip while it is read, so no intermediate file is needed.
+    
+    The exact statistics of each band are accumulated during the same pass
+    and embedded as GDAL STATISTICS_* tags (and, optionally, histograms in
+    the .aux.xml sidecar), so opening the result never requires a rescan.
+    
+    The output is written to `out_path` + '.partial' and renamed to
+    `out_path` once complete, so an interrupted export never leaves a
+    truncated file at the target path. GeoTIFF exports are checkpointed
+    every `checkpoint_interval` seconds (see model.checkpoint); a rerun with
+    the same source and parameters continues after the last checkpoint.
+    
+    Args:
+        filepath (str): Path to the raster file
+        selected_indices (list): List of band indices to export (0-based), in output order
+        out_path (str): Path to the output file
+        window (tuple, optional): Pixel window (col_off, row_off, width, height)
+        bbox (tuple, optional): Bounding box (left, bottom, right, top) in the raster's CRS
+        reproject (ReprojectOptions, optional): Target CRS/resolution/resampling
+        memory_budget (int): Maximum bytes of pixel data kept in memory
+        progress_callback (callable, optional): Called with (done, total) after each strip
+        compute_statistics (bool): Whether to embed STATISTICS_* tags computed while writing
+        histogram_bins (int, optional): Also write histograms with up to this many bins
+                                        to the PAM sidecar (.aux.xml)
+        cancel_event (threading.Event, optional): Stops the export between strips when set;
+                                                  the partial output is removed
+        autotune (bool): Pick the strip height by benchmarking the source's block layout
+                         (see model.autotune; ignored when reprojecting)
+        packing (PackingOptions, optional): Output data type, with scale/offset packing
+                                            (the bands' value ranges may take one extra pass)
+        store (ChunkStoreOptions, optional): Write a chunked array store directory instead of a
+                                             GeoTIFF; its chunks are compressed in parallel while
+                                             the next strips are read (histograms are not written)
+        resume (bool): Continue an interrupted export of the same parameters from its checkpoint
+        checkpoint_interval (float, optional): Seconds between checkpoints (None: no checkpoints)
+        cache (ResultCache, optional): Serve a repeated export from this cache (copy, or hardlink
+                                       with `link`, of the earlier output) and store new exports in it
+        
+    Returns:
+        list: Names of the exported bands
+        
+    Raises:
+        RasterHandlerError: If there's an error reading or writing the bands, or the export is cancelled
+    """
+    try:
+        if not os.path.exists(filepath):
+            raise RasterHandlerError(f"File not found: {filepath}")
+        
+        if not selected_indices:
+            raise RasterHandlerError("No bands were selected")
+        
+        check_output_path(out_path)
+        
+        # Everything that determines the output; only exports of the same source
+        # version and parameters share a checkpoint or a cached result
+        params = dict(bands=list(selected_indices), window=window, bbox=bbox, reproject=reproject,
+                      packing=packing, store=store, statistics=compute_statistics, histogram_bins=histogram_bins)
+        cache_key = None
+        if cache is not None:
+            cache_key = cache.key('export', filepath, **params)
+            cached = cache.restore(cache_key, out_path)
+            if cached is not None:
+                if progress_callback:
+                    progress_callback(1, 1)
+                return cached
+        
+        tmp_path = partial_path(out_path)
+        checkpoint = ExportCheckpoint(
+            tmp_path,
+            export_key(source=source_identity(filepath), **params),
+            checkpoint_interval if store is None else None
+        )
+        resumed = checkpoint.load() if resume and store is None else None
+        if resumed is not None:
+            try:
+                with rasterio.open(tmp_path) as partial:
+                    if partial.count != len(selected_indices):
+                        resumed = None
+            except RasterioError:
+                resumed = None
+        if resumed is None:
+            # Leftovers of an export that can't be continued
+            remove_partial(tmp_path)
+        
+        with gdal_env('export'), rasterio.open(filepath) as src:
+            for idx in selected_indices:
+                if idx < 0 or idx >= src.count:
+                    raise RasterHandlerError(f"Invalid band index: {idx}. Available bands: 0-{src.count-1}")
+            
+            band_list = [idx + 1 for idx in selected_indices]  # rasterio uses 1-based indices
+            band_names = [_get_band_name(src, band_idx) for band_idx in band_list]
+            band_metadata = _without_statistics([_get_band_metadata(src, band_idx) for band_idx in band_list])
+            file_metadata = _get_file_metadata(src, band_list)
+            
+            read_window = resolve_window(src, window, bbox)
+            
+            packer = None
+            if packing is not None:
+                if resumed is not None:
+                    packer = resumed['state']['packer']
+                else:
+                    ranges = None
+                    if packing.needs_ranges():
+                        ranges = value_ranges(src, band_list, read_window, memory_budget, cancel_event)
+                    packer = packing.resolve(len(band_list), ranges, file_metadata['scales'], file_metadata['offsets'],
+                                             source_integer=not np.issubdtype(np.dtype(src.dtypes[band_list[0] - 1]), np.floating))
+                # Readers see physical values through the new scales/offsets
+                file_metadata['scales'] = packer.scales
+                file_metadata['offsets'] = packer.offsets
+            
+            summaries = []
+            if resumed is not None:
+                # Statistics of the rows already written
+                summaries = resumed['state']['summaries']
+            elif compute_statistics:
+                for band_idx in band_list:
+                    # Float histograms are binned over the source range, when already known
+                    known = read_statistics_tags(src, band_idx) if histogram_bins and packer is None else None
+                    summaries.append(StreamingBandSummary(
+                        packing.dtype if packer is not None else src.dtypes[band_idx - 1], histogram_bins,
+                        (known.minimum, known.maximum) if known is not None else None
+                    ))
+            
+            if reproject is not None:
+                # Imported here to keep the warp machinery out of the plain export path
+                from model.reproject import open_warped
+                reader = open_warped(src, reproject, window=read_window, memory_budget=memory_budget)
+                read_window = None  # The warped view already covers only the requested region
+            else:
+                reader = src
+            
+            try:
+                if read_window is not None:
+                    width, height = read_window.width, read_window.height
+                    col_off, row_off = read_window.col_off, read_window.row_off
+                    transform = src.window_transform(read_window)
+                else:
+                    width, height = reader.width, reader.height
+                    col_off, row_off = 0, 0
+                    transform = reader.transform
+                
+                dtype = packing.dtype.name if packer is not None else src.dtypes[band_list[0] - 1]
+                meta = src.meta.copy()
+                meta.update({
+                    'driver': 'GTiff',
+                    'count': len(band_list),
+                    'dtype': dtype,
+                    'width': width,
+                    'height': height,
+                    'crs': reader.crs,
+                    'transform': transform,
+                    'nodata': packing.nodata if packer is not None else reader.nodata,
+                })
+                apply_default_creation_options(meta)
+                
+                # Packing converts each band through a float64 copy
+                plan = plan_windows(width, len(band_list), np.float64 if packer is not None else dtype, memory_budget,
+                                    block_height=src.block_shapes[0][0], operation='export',
+                                    reproject=reproject is not None, height=height)
+                if autotune and reproject is None:
+                    plan = tune_plan(src, band_list, plan, read_window)
+                rows = plan.rows
+                resume_row = resumed['rows_done'] if resumed is not None else 0
+                done_before = -(-resume_row // rows)
+                total = done_before + (count_windows(height - resume_row, rows) if resume_row < height else 0)
+                
+                # Mask bands (not derived from NoData) are carried over as internal GDAL masks;
+                # a warped view without NoData reports validity through its extra alpha band
+                alpha_band = reader.count if reader.count > src.count else None
+                write_mask = has_mask_band(src, band_list) or alpha_band is not None
+                
+                def open_output():
+                    if store is not None:
+                        return _open_store_writer(out_path, meta, store, with_mask=write_mask)
+                    if resume_row:
+                        return rasterio.open(tmp_path, 'r+')
+                    return rasterio.open(tmp_path, 'w', **meta)
+                
+                cancelled = False
+                # Each strip's memory is reserved on the process-wide governor while it's processed
+                with rasterio.Env(GDAL_TIFF_INTERNAL_MASK=True), \
+                        closing(governed(iter_row_windows(width, height - resume_row, rows, 0, resume_row),
+                                         plan.window_bytes, cancel_event)) as windows:
+                    dst = open_output()
+                    try:
+                        for done, out_window in enumerate(windows, start=done_before + 1):
+                            if cancel_event is not None and cancel_event.is_set():
+                                cancelled = True
+                                if store is not None:
+                                    dst.abort()
+                                break
+                            # Same strip, expressed in source pixel coordinates
+                            src_window = Window(col_off + out_window.col_off, row_off + out_window.row_off,
+                                                out_window.width, out_window.height)
+                            try:
+                                data = read_bands(reader, band_list, window=src_window)
+                                band_valid = [None] * len(band_list)
+                                if packer is not None or summaries:
+                                    for j, band_idx in enumerate(band_list):
+                                        band_validity = read_validity_mask(reader, [band_idx], window=src_window,
+                                                                           data=[data[j]], use_cache=False,
+                                                                           alpha_band=alpha_band)
+                                        band_valid[j] = None if band_validity.all_valid else band_validity.to_array()
+                                if write_mask:
+                                    validity = read_validity_mask(reader, band_list, window=src_window,
+                                                                  data=data, use_cache=False,
+                                                                  alpha_band=alpha_band)
+                                    dst.write_mask(validity.to_gdal(), window=out_window)
+                                if packer is not None:
+                                    data = np.stack([packer.pack(j, data[j], band_valid[j])
+                                                     for j in range(len(band_list))])
+                                dst.write(data.astype(dtype, copy=False), window=out_window)
+                                for j, summary in enumerate(summaries):
+                                    summary.add(data[j], band_valid[j])
+                            except Exception as e:
+                                raise RasterHandlerError(f"Error exporting rows {out_window.row_off}-{out_window.row_off + out_window.height}: {e}")
+                            
+                            if checkpoint.due():
+                                # Written rows are only safe on disk once the file is closed
+                                dst.close()
+                                checkpoint.save(out_window.row_off + out_window.height,
+                                                {'summaries': summaries, 'packer': packer})
+                                dst = rasterio.open(tmp_path, 'r+')
+                            
+                            if progress_callback:
+                                progress_callback(done, total)
+                        
+                        if store is not None:
+                            if not cancelled:
+                                _write_store_attrs(dst, meta, band_names, band_metadata, file_metadata, summaries)
+                        elif not cancelled:
+                            write_band_metadata(dst, band_names, band_metadata, file_metadata)
+                            _write_export_statistics(dst, summaries)
+                    except BaseException:
+                        # A GeoTIFF is kept with its checkpoint, to be resumed
+                        if store is not None:
+                            dst.abort()
+                        raise
+                    finally:
+                        dst.close()
+            finally:
+                if reader is not src:
+                    reader.close()
+        
+        if cancelled:
+            remove_partial(tmp_path)
+            raise RasterHandlerError("Export cancelled")
+        
+        finalize(tmp_path, out_path)
+        checkpoint.clear()
+        if store is None:
+            _write_export_histograms(out_path, summaries)
+        if packer is not None and packer.saturated:
+            get_logger('igcv_raster_utility.packing').warning(
+                "%d valid pixels saturated when packing to %s: %s", packer.saturated, packing.dtype.name, out_path)
+        if cache is not None:
+            _store_in_cache(cache, cache_key, out_path=out_path, result=band_names)
+        return band_names
+        
+    except RasterioIOError as e:
+        raise RasterHandlerError(f"I/O error exporting file: {e}")
+    except RasterioError as e:
+        raise RasterHandlerError(f"Error processing export: {e}")
+    except RasterHandlerError:
+        raise
+    except Exception as e:
+        raise RasterHandlerError(f"Unexpected error exporting file: {e}")
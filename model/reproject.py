@@ -0,0 +1,129 @@
+import os
+from rasterio.crs import CRS
+from rasterio.enums import Resampling
+from rasterio.vrt import WarpedVRT
+from rasterio.warp import calculate_default_transform
+from rasterio.windows import bounds as window_bounds
+from exceptions import RasterHandlerError
+
+# Resampling methods accepted by the reprojection stage
+RESAMPLING_METHODS = {
+    'nearest': Resampling.nearest,
+    'bilinear': Resampling.bilinear,
+    'cubic': Resampling.cubic,
+    'cubic_spline': Resampling.cubic_spline,
+    'lanczos': Resampling.lanczos,
+    'average': Resampling.average,
+    'mode': Resampling.mode,
+    'min': Resampling.min,
+    'max': Resampling.max,
+    'med': Resampling.med,
+}
+
+class ReprojectOptions:
+    """
+    Parameters of the reprojection/resampling stage of the export pipeline.
+
+    Args:
+        dst_crs (str, optional): Target CRS (e.g. 'EPSG:4326'); defaults to the source CRS
+        resolution (float or tuple, optional): Target pixel size (x, y) in target CRS units
+        resampling (str): Resampling method name (see RESAMPLING_METHODS)
+        num_threads (int, optional): Warp threads (default: CPU count)
+    """
+
+    # Attributes left out of export keys: they don't change the warped output
+    EXECUTION_ATTRS = ('num_threads',)
+
+    def __init__(self, dst_crs=None, resolution=None, resampling='nearest', num_threads=None):
+        if resampling not in RESAMPLING_METHODS:
+            raise RasterHandlerError(
+                f"Invalid resampling method: {resampling}. Options: {', '.join(RESAMPLING_METHODS)}"
+            )
+
+        if dst_crs is not None:
+            try:
+                if isinstance(dst_crs, str) and dst_crs.isdigit():
+                    dst_crs = f"EPSG:{dst_crs}"
+                dst_crs = CRS.from_user_input(dst_crs)
+            except Exception as e:
+                raise RasterHandlerError(f"Invalid target CRS {dst_crs}: {e}")
+
+        if resolution is not None:
+            if isinstance(resolution, (int, float)):
+                resolution = (float(resolution), float(resolution))
+            else:
+                resolution = tuple(float(r) for r in resolution)
+                if len(resolution) == 1:
+                    resolution = (resolution[0], resolution[0])
+            if len(resolution) != 2 or resolution[0] <= 0 or resolution[1] <= 0:
+                raise RasterHandlerError(f"Invalid target resolution: {resolution}")
+
+        self.dst_crs = dst_crs
+        self.resolution = resolution
+        self.resampling = resampling
+        self.num_threads = num_threads or os.cpu_count() or 1
+
+    def __repr__(self):
+        return (f"ReprojectOptions(dst_crs={self.dst_crs}, resolution={self.resolution}, "
+                f"resampling='{self.resampling}', num_threads={self.num_threads})")
+
+def open_warped(src, options, window=None, memory_budget=None):
+    """
+    Opens a virtual warped view of a dataset that is reprojected as it is read.
+
+    Reading a window of the returned dataset warps only the source pixels
+    needed for it, so the export can reproject strip by strip.
+
+    Args:
+        src: Open rasterio dataset
+        options (ReprojectOptions): Reprojection parameters
+        window (Window, optional): Source region to reproject (default: full extent)
+        memory_budget (int, optional): Bytes available to the warper
+
+    Returns:
+        WarpedVRT: Virtual dataset in the target grid (caller must close it)
+
+    Raises:
+        RasterHandlerError: If the source has no CRS or the transform can't be computed
+    """
+    if src.crs is None:
+        raise RasterHandlerError("The source raster has no CRS; it can't be reprojected")
+
+    dst_crs = options.dst_crs or src.crs
+
+    if window is not None:
+        left, bottom, right, top = window_bounds(window, src.transform)
+        width, height = int(window.width), int(window.height)
+    else:
+        left, bottom, right, top = src.bounds
+        width, height = src.width, src.height
+
+    try:
+        transform, dst_width, dst_height = calculate_default_transform(
+            src.crs, dst_crs, width, height,
+            left=left, bottom=bottom, right=right, top=top,
+            resolution=options.resolution
+        )
+    except Exception as e:
+        raise RasterHandlerError(f"Error computing target grid: {e}")
+
+    warp_mem_limit = 0
+    if memory_budget:
+        # Half of the budget goes to the warper, the rest to the strips being written
+        warp_mem_limit = max(16, int(memory_budget / 2 / (1024 * 1024)))
+
+    # Without a NoData value the warped validity is carried by an alpha band,
+    # so pixels outside the source footprint or masked in the source stay masked
+    add_alpha = src.nodata is None
+
+    return WarpedVRT(
+        src,
+        crs=dst_crs,
+        transform=transform,
+        width=dst_width,
+        height=dst_height,
+        resampling=RESAMPLING_METHODS[options.resampling],
+        warp_mem_limit=warp_mem_limit,
+        warp_extras={'NUM_THREADS': options.num_threads},
+        add_alpha=add_alpha,
+    )
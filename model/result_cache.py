@@ -0,0 +1,320 @@
+import os
+import json
+import time
+import uuid
+import pickle
+import shutil
+import hashlib
+import threading
+from exceptions import RasterHandlerError
+from model.checkpoint import export_key, source_identity, partial_path, finalize, remove_partial
+
+DEFAULT_RESULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.igcv', 'results')
+# Bytes of cached results kept on disk before the least recently used are evicted
+DEFAULT_RESULT_CACHE_SIZE = 1024 * 1024 * 1024
+# Bytes hashed at the start, middle and end of a file by content_identity()
+IDENTITY_SAMPLE = 1024 * 1024
+# Sidecars stored along with an exported file
+ARTIFACT_SIDECARS = ('.aux.xml',)
+META_NAME = 'meta.json'
+VALUE_NAME = 'value.pkl'
+ARTIFACT_NAME = 'artifact'
+
+def content_identity(filepath, sample=IDENTITY_SAMPLE):
+    """
+    Identifies a source file by its contents rather than its path: size plus
+    a digest of its first, middle and last `sample` bytes, so copies of the
+    same file share cached results.
+    """
+    size = os.path.getsize(filepath)
+    digest = hashlib.sha256(str(size).encode('ascii'))
+    with open(filepath, 'rb') as f:
+        for offset in sorted({0, max(0, size // 2 - sample // 2), max(0, size - sample)}):
+            f.seek(offset)
+            digest.update(f.read(sample))
+    return digest.hexdigest()
+
+def _entry_bytes(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            total += os.path.getsize(os.path.join(root, name))
+    return total
+
+def _file_versions(path):
+    """(size, mtime) of every file of an artifact, to detect in-place changes of hardlinked copies"""
+    if os.path.isfile(path):
+        stat = os.stat(path)
+        return {'': [stat.st_size, stat.st_mtime_ns]}
+    versions = {}
+    for root, _, files in os.walk(path):
+        for name in files:
+            full = os.path.join(root, name)
+            stat = os.stat(full)
+            versions[os.path.relpath(full, path)] = [stat.st_size, stat.st_mtime_ns]
+    return versions
+
+def _artifact_versions(artifact):
+    """File versions of a cached artifact and of each of its sidecars"""
+    versions = {ARTIFACT_NAME: _file_versions(artifact)}
+    for suffix in ARTIFACT_SIDECARS:
+        if os.path.isfile(artifact + suffix):
+            versions[ARTIFACT_NAME + suffix] = _file_versions(artifact + suffix)
+    return versions
+
+class ResultCache:
+    """
+    Content-addressed disk cache of operation results (previews, statistics
+    and exported files), bounded by size with least-recently-used eviction.
+
+    Results are keyed by the identity of the source file (path, size and
+    modification time, or a sampled content digest with `content_keys`) and
+    the normalized operation parameters, so any change to either is a miss.
+    Each entry is a directory under `path`; its modification time is the
+    LRU clock, so several processes can share a cache.
+
+    Exported files are copied into and out of the cache; with `link` they
+    are hardlinked when possible (copied otherwise, e.g. across file
+    systems), so editing an output in place also edits the cached copy.
+    An entry whose artifact or sidecars were changed is discarded instead
+    of being served.
+
+    Args:
+        path (str, optional): Cache directory (default: DEFAULT_RESULT_CACHE_DIR)
+        max_bytes (int): Size the cache is evicted down to
+        link (bool): Hardlink exported files instead of copying them (opt-in)
+        content_keys (bool): Key sources by a sampled content digest instead of path/size/mtime
+    """
+
+    def __init__(self, path=None, max_bytes=DEFAULT_RESULT_CACHE_SIZE, link=False, content_keys=False):
+        if max_bytes <= 0:
+            raise RasterHandlerError("The result cache size must be positive")
+        self.path = path or DEFAULT_RESULT_CACHE_DIR
+        self.max_bytes = max_bytes
+        self.link = link
+        self.content_keys = content_keys
+        self._lock = threading.Lock()
+        try:
+            os.makedirs(self.path, exist_ok=True)
+        except OSError as e:
+            raise RasterHandlerError(f"Error creating result cache {self.path}: {e}")
+
+    def key(self, operation, filepath, **params):
+        """
+        Key of an operation's result.
+
+        Args:
+            operation (str): Operation name (e.g. 'export', 'preview')
+            filepath (str): Source raster
+            **params: Everything else that determines the result
+
+        Returns:
+            str: Hex digest
+        """
+        source = content_identity(filepath) if self.content_keys else source_identity(filepath)
+        return export_key(operation=operation, source=source, **params)
+
+    def _entry(self, key):
+        return os.path.join(self.path, key)
+
+    def _read_meta(self, entry):
+        try:
+            with open(os.path.join(entry, META_NAME), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _touch(self, entry):
+        try:
+            os.utime(entry)
+        except OSError:
+            pass
+
+    def _discard(self, entry):
+        shutil.rmtree(entry, ignore_errors=True)
+
+    def _place(self, src, dst):
+        """Copies (or, with `link`, hardlinks) a file or directory tree"""
+        if os.path.isdir(src):
+            shutil.copytree(src, dst, copy_function=self._place)
+            return dst
+        if self.link:
+            try:
+                os.link(src, dst)
+                return dst
+            except OSError:
+                pass
+        shutil.copy2(src, dst)
+        return dst
+
+    def _commit(self, key, build):
+        """Builds an entry in a private directory and moves it into place"""
+        staging = os.path.join(self.path, f".{key}.{uuid.uuid4().hex}")
+        entry = self._entry(key)
+        try:
+            os.makedirs(staging)
+            meta = build(staging)
+            meta['bytes'] = _entry_bytes(staging)
+            if meta['bytes'] > self.max_bytes:
+                return False
+            meta['created'] = time.time()
+            with open(os.path.join(staging, META_NAME), 'w', encoding='utf-8') as f:
+                json.dump(meta, f)
+            try:
+                os.rename(staging, entry)
+            except OSError:
+                # Stored meanwhile by another thread or process
+                if not os.path.isdir(entry):
+                    raise
+        except (OSError, TypeError, pickle.PicklingError) as e:
+            raise RasterHandlerError(f"Error storing result in cache: {e}")
+        finally:
+            if os.path.isdir(staging):
+                self._discard(staging)
+        self.evict()
+        return True
+
+    def get(self, key):
+        """
+        Returns a cached value (preview, statistics...), or None on a miss.
+        """
+        entry = self._entry(key)
+        meta = self._read_meta(entry)
+        if meta is None or meta.get('kind') != 'value':
+            return None
+        try:
+            with open(os.path.join(entry, VALUE_NAME), 'rb') as f:
+                value = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+            self._discard(entry)
+            return None
+        self._touch(entry)
+        return value
+
+    def put(self, key, value):
+        """
+        Stores a picklable value.
+
+        Returns:
+            bool: Whether it was stored (values larger than the cache are not)
+        """
+        def build(staging):
+            with open(os.path.join(staging, VALUE_NAME), 'wb') as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            return {'kind': 'value'}
+        return self._commit(key, build)
+
+    def restore(self, key, out_path):
+        """
+        Places a cached exported file (or chunk store directory), with its
+        sidecars, at `out_path`. The output appears atomically, as with an export.
+
+        Returns:
+            The result stored with the artifact (True when none was given), or None on a miss
+        """
+        entry = self._entry(key)
+        meta = self._read_meta(entry)
+        if meta is None or meta.get('kind') != 'artifact':
+            return None
+        artifact = os.path.join(entry, ARTIFACT_NAME)
+        try:
+            if _artifact_versions(artifact) != meta['files']:
+                # Changed in place, e.g. through a hardlinked output
+                self._discard(entry)
+                return None
+            tmp_path = partial_path(out_path)
+            remove_partial(tmp_path)
+            self._place(artifact, tmp_path)
+            finalize(tmp_path, out_path)
+            for suffix in ARTIFACT_SIDECARS:
+                sidecar = out_path + suffix
+                if os.path.isfile(artifact + suffix):
+                    if os.path.exists(sidecar):
+                        os.remove(sidecar)
+                    self._place(artifact + suffix, sidecar)
+                elif os.path.isfile(sidecar):
+                    # Stale sidecar of a previous output
+                    os.remove(sidecar)
+        except (OSError, KeyError):
+            remove_partial(partial_path(out_path))
+            return None
+        self._touch(entry)
+        return meta.get('result', True)
+
+    def store(self, key, out_path, result=True):
+        """
+        Stores an exported file (or chunk store directory) and its sidecars.
+
+        Args:
+            key (str): Key of the export
+            out_path (str): The finished output
+            result: JSON-serializable result returned by restore()
+
+        Returns:
+            bool: Whether it was stored (outputs larger than the cache are not)
+        """
+        def build(staging):
+            artifact = self._place(out_path, os.path.join(staging, ARTIFACT_NAME))
+            for suffix in ARTIFACT_SIDECARS:
+                if os.path.isfile(out_path + suffix):
+                    self._place(out_path + suffix, artifact + suffix)
+            return {'kind': 'artifact', 'result': result, 'files': _artifact_versions(artifact)}
+        return self._commit(key, build)
+
+    def entries(self):
+        """
+        Lists the cache entries, least recently used first.
+
+        Returns:
+            list: (key, bytes, last used timestamp)
+        """
+        listed = []
+        try:
+            names = os.listdir(self.path)
+        except OSError:
+            return listed
+        for name in names:
+            entry = self._entry(name)
+            if name.startswith('.') or not os.path.isdir(entry):
+                continue
+            meta = self._read_meta(entry)
+            if meta is None:
+                continue
+            try:
+                used = os.path.getmtime(entry)
+            except OSError:
+                continue
+            listed.append((name, int(meta.get('bytes', 0)), used))
+        listed.sort(key=lambda item: item[2])
+        return listed
+
+    def size(self):
+        """Bytes used by the cached results"""
+        return sum(item[1] for item in self.entries())
+
+    def evict(self, max_bytes=None):
+        """
+        Removes the least recently used entries until the cache fits `max_bytes`
+        (default: the cache's own limit).
+
+        Returns:
+            int: Number of entries removed
+        """
+        limit = self.max_bytes if max_bytes is None else max_bytes
+        with self._lock:
+            listed = self.entries()
+            total = sum(item[1] for item in listed)
+            removed = 0
+            for name, entry_bytes, _ in listed:
+                if total <= limit:
+                    break
+                self._discard(self._entry(name))
+                total -= entry_bytes
+                removed += 1
+            return removed
+
+    def clear(self):
+        """Removes every cached result"""
+        return self.evict(0)
@@ -0,0 +1,202 @@
+import os
+import numpy as np
+import rasterio
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, closing
+from rasterio.errors import RasterioIOError, RasterioError
+from model import raster_handler
+from model.checkpoint import partial_path, finalize, remove_partial
+from model.gdal_env import gdal_env
+from model.masks import read_validity_mask, has_mask_band
+from model.governor import plan_windows, governed
+from model.windowing import DEFAULT_MEMORY_BUDGET, iter_row_windows, count_windows, check_alignment, read_bands
+from exceptions import RasterHandlerError
+
+def parse_stack_input(spec):
+    """
+    Parses a stacking input of the form 'path' or 'path:1,3'.
+
+    Args:
+        spec (str): Input path, optionally followed by ':' and 1-based band numbers
+
+    Returns:
+        tuple: (path, band_indices) - band_indices is a 0-based list, or None for all bands
+
+    Raises:
+        RasterHandlerError: If the band list is invalid
+    """
+    path, sep, bands = spec.rpartition(':')
+    # Only treat the suffix as a band list when it looks like one (keeps 'C:\\...' paths intact)
+    if not sep or not path or not bands.replace(',', '').isdigit():
+        return spec, None
+
+    try:
+        return path, [int(b) - 1 for b in bands.split(',') if b]
+    except ValueError:
+        raise RasterHandlerError(f"Invalid band list in stack input: {spec}")
+
+def same_nodata(a, b):
+    """Compares NoData values, NaN included (NaN never equals itself)"""
+    if a is None or b is None:
+        return a is None and b is None
+    return a == b or (np.isnan(a) and np.isnan(b))
+
+def stack_rasters(inputs, out_path, memory_budget=DEFAULT_MEMORY_BUDGET, progress_callback=None):
+    """
+    Stacks bands from several aligned rasters into one multi-band GeoTIFF.
+
+    The output is written in strips: for every window all inputs are read
+    concurrently (one thread per input) while the previous window is written,
+    so at most two windows are held in memory.
+
+    When the inputs don't share one NoData value (or use mask bands), the
+    output has no NoData and their validity is written as an internal mask
+    instead, built from each input's validity mask for its own bands (a
+    pixel is valid where every input is). The stack is written to
+    `out_path` + '.partial' and renamed once complete.
+
+    Args:
+        inputs (list): List of (path, band_indices) tuples; band_indices are 0-based
+                       or None to take every band of the file
+        out_path (str): Path to the output file
+        memory_budget (int): Maximum bytes of pixel data kept in memory
+        progress_callback (callable, optional): Called with (done, total) after each window
+
+    Returns:
+        list: Names of the stacked bands, in output order
+
+    Raises:
+        RasterHandlerError: If inputs are missing, misaligned or can't be read/written
+    """
+    tmp_path = None
+    completed = False
+    try:
+        if not inputs:
+            raise RasterHandlerError("No inputs provided for stacking")
+
+        for path, _ in inputs:
+            if not os.path.isfile(path):
+                raise RasterHandlerError(f"File not found: {path}")
+
+        raster_handler.check_output_path(out_path)
+        tmp_path = partial_path(out_path)
+
+        with ExitStack() as stack:
+            stack.enter_context(gdal_env('export'))
+            datasets = [stack.enter_context(rasterio.open(path)) for path, _ in inputs]
+            check_alignment(datasets, [path for path, _ in inputs])
+
+            # Resolve the band list of every input
+            sources = []
+            for src, (path, band_indices) in zip(datasets, inputs):
+                if band_indices is None:
+                    band_indices = list(range(src.count))
+                for idx in band_indices:
+                    if idx < 0 or idx >= src.count:
+                        raise RasterHandlerError(f"Invalid band index {idx + 1} for {path}. Available bands: 1-{src.count}")
+                sources.append((src, [idx + 1 for idx in band_indices]))
+
+            band_names = []
+            band_metadata = []
+            dtypes = []
+            nodata_values = []
+            scales, offsets, units = [], [], []
+            for src, band_list in sources:
+                for band_idx in band_list:
+                    band_names.append(raster_handler._get_band_name(src, band_idx))
+                    band_metadata.append(raster_handler._get_band_metadata(src, band_idx))
+                    dtypes.append(src.dtypes[band_idx - 1])
+                    if not any(same_nodata(src.nodata, value) for value in nodata_values):
+                        nodata_values.append(src.nodata)
+                    scales.append(src.scales[band_idx - 1])
+                    offsets.append(src.offsets[band_idx - 1])
+                    units.append(src.units[band_idx - 1] or '')
+
+            if not band_names:
+                raise RasterHandlerError("No bands were selected")
+
+            out_dtype = np.result_type(*dtypes)
+
+            # Inputs with different NoData values can't share a single one: their
+            # validity is carried over as an internal mask instead
+            write_mask = len(nodata_values) > 1 or \
+                any(has_mask_band(src, band_list) for src, band_list in sources)
+
+            meta = datasets[0].meta.copy()
+            meta.update({
+                'driver': 'GTiff',
+                'count': len(band_names),
+                'dtype': out_dtype.name,
+                'nodata': nodata_values[0] if len(nodata_values) == 1 else None,
+            })
+            raster_handler.apply_default_creation_options(meta)
+
+            file_metadata = {
+                'tags': dict(datasets[0].tags()),
+                'scales': scales,
+                'offsets': offsets,
+                'units': units,
+            }
+
+            block_height = datasets[0].block_shapes[0][0]
+            plan = plan_windows(meta['width'], len(band_names), out_dtype, memory_budget,
+                                block_height=block_height, operation='stack', height=meta['height'])
+            rows = plan.rows
+            windows = list(iter_row_windows(meta['width'], meta['height'], rows))
+            total = count_windows(meta['height'], rows)
+
+            def read_input(src, band_list, window):
+                data = read_bands(src, band_list, window=window, views=True)
+                valid = None
+                if write_mask:
+                    validity = read_validity_mask(src, band_list, window=window, data=data, use_cache=False)
+                    valid = None if validity.all_valid else validity.to_array()
+                return data, valid
+
+            with rasterio.Env(GDAL_TIFF_INTERNAL_MASK=True), \
+                    rasterio.open(tmp_path, 'w', **meta) as dst, \
+                    ThreadPoolExecutor(max_workers=len(sources)) as executor, \
+                    closing(governed(windows, plan.window_bytes)) as governed_windows:
+
+                def submit(window):
+                    return [executor.submit(read_input, src, band_list, window) for src, band_list in sources]
+
+                pending = submit(windows[0])
+                for done, window in enumerate(governed_windows, start=1):
+                    arrays = [future.result() for future in pending]
+
+                    # Prefetch the next window while this one is written
+                    pending = submit(windows[done]) if done < len(windows) else []
+
+                    out_band = 1
+                    mask = None
+                    for data, valid in arrays:
+                        for band in data:
+                            dst.write(band.astype(out_dtype, copy=False), out_band, window=window)
+                            out_band += 1
+                        if valid is not None:
+                            mask = valid if mask is None else mask & valid
+                    if write_mask:
+                        dst.write_mask(np.full((window.height, window.width), 255, dtype=np.uint8)
+                                       if mask is None else mask.astype(np.uint8) * np.uint8(255), window=window)
+
+                    if progress_callback:
+                        progress_callback(done, total)
+
+                raster_handler.write_band_metadata(dst, band_names, band_metadata, file_metadata)
+
+        finalize(tmp_path, out_path)
+        completed = True
+        return band_names
+
+    except RasterioIOError as e:
+        raise RasterHandlerError(f"I/O error stacking rasters: {e}")
+    except RasterioError as e:
+        raise RasterHandlerError(f"Error processing stack: {e}")
+    except RasterHandlerError:
+        raise
+    except Exception as e:
+        raise RasterHandlerError(f"Unexpected error stacking rasters: {e}")
+    finally:
+        if tmp_path is not None and not completed:
+            remove_partial(tmp_path)
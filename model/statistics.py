@@ -0,0 +1,418 @@
+import os
+import math
+import threading
+import numpy as np
+import rasterio
+from rasterio.enums import Resampling
+from exceptions import RasterHandlerError
+from logger import get_logger
+from model.gdal_env import open_raster
+from model.histogram import (
+    BandHistogram, HistogramResult, supports_exact_histogram, accumulate_fixed_range
+)
+from model.masks import read_validity_mask
+from model.governor import get_governor, plan_windows
+from model.windowing import DEFAULT_MEMORY_BUDGET, iter_row_windows
+
+# Number of random blocks read for the first estimate when a band has no overviews
+SAMPLE_BLOCKS = 32
+
+# Number of intermediate results yielded during the exact pass
+REFINEMENT_STEPS = 10
+
+# z-score of the confidence interval reported for estimated means (95%)
+CONFIDENCE_Z = 1.96
+
+# GDAL statistics tags (the same names gdalinfo -stats writes)
+STATISTICS_TAGS = {
+    'minimum': 'STATISTICS_MINIMUM',
+    'maximum': 'STATISTICS_MAXIMUM',
+    'mean': 'STATISTICS_MEAN',
+    'std': 'STATISTICS_STDDEV',
+}
+
+class StatisticsAccumulator:
+    """
+    Running count, min, max, mean and sum of squared deviations of a band.
+
+    Chunks are merged with the parallel variance formula (Chan et al.), so
+    windows can be added in any order without losing precision.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.minimum = None
+        self.maximum = None
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def add(self, values):
+        """Adds a 1D array of valid values"""
+        n = int(values.size)
+        if n == 0:
+            return
+        chunk_mean = float(values.mean(dtype=np.float64))
+        chunk_m2 = float(values.var(dtype=np.float64)) * n
+        chunk_min = values.min().item()
+        chunk_max = values.max().item()
+
+        if self.count == 0:
+            self.count, self.mean, self.m2 = n, chunk_mean, chunk_m2
+            self.minimum, self.maximum = chunk_min, chunk_max
+            return
+
+        total = self.count + n
+        delta = chunk_mean - self.mean
+        self.mean += delta * n / total
+        self.m2 += chunk_m2 + delta * delta * self.count * n / total
+        self.count = total
+        self.minimum = min(self.minimum, chunk_min)
+        self.maximum = max(self.maximum, chunk_max)
+
+    @property
+    def std(self):
+        return math.sqrt(self.m2 / self.count) if self.count else None
+
+class BandStatistics:
+    """
+    Statistics of one band, exact or estimated.
+
+    Args:
+        band_index (int): Band index (0-based)
+        minimum, maximum, mean, std (float): Statistics of the valid pixels (None if there are none)
+        valid_percent (float): Percentage of valid pixels
+        approximate (bool): True for estimates
+        source (str): 'tags', 'overview', 'blocks', 'partial' or 'full'
+        coverage (float): Fraction of the band's pixels the values come from
+        mean_margin (float): Half-width of the 95% confidence interval of the mean (0 when exact)
+    """
+
+    def __init__(self, band_index, minimum, maximum, mean, std, valid_percent,
+                 approximate, source, coverage=1.0, mean_margin=0.0):
+        self.band_index = band_index
+        self.minimum = minimum
+        self.maximum = maximum
+        self.mean = mean
+        self.std = std
+        self.valid_percent = valid_percent
+        self.approximate = approximate
+        self.source = source
+        self.coverage = coverage
+        self.mean_margin = mean_margin
+
+    @classmethod
+    def from_accumulator(cls, band_index, accumulator, pixels, total_pixels, approximate, source):
+        """
+        Builds the statistics of `pixels` read pixels (of `total_pixels` in the band).
+
+        For estimates, the margin of the mean uses the finite population correction.
+        """
+        coverage = pixels / total_pixels if total_pixels else 1.0
+        valid_percent = 100.0 * accumulator.count / pixels if pixels else 0.0
+        margin = 0.0
+        if approximate and accumulator.count > 1:
+            correction = math.sqrt(max(0.0, 1.0 - coverage))
+            margin = CONFIDENCE_Z * accumulator.std / math.sqrt(accumulator.count) * correction
+        return cls(band_index, accumulator.minimum, accumulator.maximum,
+                   accumulator.mean if accumulator.count else None, accumulator.std,
+                   valid_percent, approximate, source, coverage, margin)
+
+    def to_tags(self):
+        """Returns the GDAL statistics tags of exact statistics"""
+        if self.minimum is None:
+            return {}
+        tags = {STATISTICS_TAGS[key]: repr(float(getattr(self, key))) for key in STATISTICS_TAGS}
+        tags['STATISTICS_VALID_PERCENT'] = repr(float(self.valid_percent))
+        return tags
+
+def read_statistics_tags(src, band_idx):
+    """
+    Reads exact GDAL statistics tags of a band.
+
+    Args:
+        src: Open rasterio dataset
+        band_idx (int): 1-based band index
+
+    Returns:
+        BandStatistics or None: None when the tags are missing or approximate
+    """
+    tags = src.tags(band_idx)
+    if not all(name in tags for name in STATISTICS_TAGS.values()):
+        return None
+    if tags.get('STATISTICS_APPROXIMATE', '').upper() == 'YES':
+        return None
+    try:
+        values = {key: float(tags[name]) for key, name in STATISTICS_TAGS.items()}
+        valid_percent = float(tags.get('STATISTICS_VALID_PERCENT', 100.0))
+    except ValueError:
+        return None
+    return BandStatistics(band_idx - 1, values['minimum'], values['maximum'], values['mean'], values['std'],
+                          valid_percent, False, 'tags')
+
+def write_statistics_tags(filepath, statistics):
+    """
+    Writes exact statistics into the file as GDAL statistics tags.
+
+    Args:
+        filepath (str): Path to the raster file (opened in update mode)
+        statistics (list): BandStatistics of the bands to write
+
+    Raises:
+        RasterHandlerError: If the file can't be updated
+    """
+    try:
+        with rasterio.open(filepath, 'r+') as dst:
+            for band_stats in statistics:
+                tags = band_stats.to_tags()
+                if tags:
+                    dst.update_tags(band_stats.band_index + 1, **tags)
+    except Exception as e:
+        raise RasterHandlerError(f"Error writing statistics to {filepath}: {e}")
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+def _cache_key(filepath, band_idx):
+    stat = os.stat(filepath)
+    return (os.path.abspath(filepath), stat.st_size, stat.st_mtime, band_idx)
+
+def clear_cache():
+    """Empties the statistics cache"""
+    with _cache_lock:
+        _cache.clear()
+
+def _valid_values(src, band_idx, window=None, out_shape=None, use_cache=True):
+    kwargs = {'window': window}
+    if out_shape is not None:
+        kwargs['out_shape'] = out_shape
+        kwargs['resampling'] = Resampling.nearest
+    values = src.read(band_idx, **kwargs)
+    validity = read_validity_mask(src, [band_idx], window=window, out_shape=out_shape,
+                                  data=[values], use_cache=use_cache)
+    return values.size, (values.ravel() if validity.all_valid else values[validity.to_array()])
+
+def _estimate(src, band_idx, rng):
+    """Quick estimate from the coarsest overview, or from a random sample of blocks"""
+    total_pixels = src.width * src.height
+    accumulator = StatisticsAccumulator()
+
+    overviews = src.overviews(band_idx)
+    if overviews:
+        factor = max(overviews)
+        out_shape = (max(1, src.height // factor), max(1, src.width // factor))
+        pixels, values = _valid_values(src, band_idx, out_shape=out_shape)
+        accumulator.add(values)
+        return BandStatistics.from_accumulator(band_idx - 1, accumulator, pixels, total_pixels,
+                                               True, 'overview')
+
+    windows = [window for _, window in src.block_windows(band_idx)]
+    if len(windows) > SAMPLE_BLOCKS:
+        chosen = rng.choice(len(windows), SAMPLE_BLOCKS, replace=False)
+        windows = [windows[i] for i in sorted(chosen)]
+    pixels = 0
+    for window in windows:
+        window_pixels, values = _valid_values(src, band_idx, window=window, use_cache=False)
+        pixels += window_pixels
+        accumulator.add(values)
+    return BandStatistics.from_accumulator(band_idx - 1, accumulator, pixels, total_pixels,
+                                           pixels < total_pixels, 'blocks' if pixels < total_pixels else 'full')
+
+def iter_band_statistics(filepath, band_indices, memory_budget=DEFAULT_MEMORY_BUDGET, write_tags=False,
+                         cancel_event=None, progress_callback=None, seed=None, cache=None):
+    """
+    Computes band statistics progressively.
+
+    First yields, for every band, either the exact values already known
+    (GDAL statistics tags in the file or the in-memory cache) or a quick
+    estimate from the coarsest overview or a random sample of blocks. Then
+    refines each band with a full-resolution pass over strips bounded by
+    `memory_budget`, read in random order so the intermediate results
+    (source 'partial') are unbiased samples whose mean margin shrinks as the
+    coverage grows. The last result of each band is exact.
+
+    Args:
+        filepath (str): Path to the raster file
+        band_indices (list): Band indices (0-based)
+        memory_budget (int): Maximum bytes of pixel data read at once
+        write_tags (bool): Write the exact results into the file as GDAL statistics tags
+        cancel_event (threading.Event, optional): Stops the computation when set
+        progress_callback (callable, optional): Called with (done, total) after each strip of the exact pass
+        seed (int, optional): Seed of the random sampling (for reproducible estimates)
+        cache (ResultCache, optional): Disk cache of exact results, shared across processes
+                                       (checked after the in-memory cache)
+
+    Yields:
+        BandStatistics: Estimates and exact statistics, in the order they become available
+
+    Raises:
+        RasterHandlerError: If the file can't be read or written
+    """
+    if not os.path.exists(filepath):
+        raise RasterHandlerError(f"File not found: {filepath}")
+
+    def cancelled():
+        return cancel_event is not None and cancel_event.is_set()
+
+    rng = np.random.default_rng(seed)
+    exact_results = []
+
+    try:
+        with open_raster(filepath, 'statistics') as src:
+            for band_index in band_indices:
+                if band_index < 0 or band_index >= src.count:
+                    raise RasterHandlerError(f"Invalid band index: {band_index}. Available bands: 0-{src.count-1}")
+
+            pending = []
+            for band_index in band_indices:
+                if cancelled():
+                    return
+                band_idx = band_index + 1
+                with _cache_lock:
+                    known = _cache.get(_cache_key(filepath, band_idx))
+                if known is None and cache is not None:
+                    known = cache.get(cache.key('statistics', filepath, band=band_idx))
+                    if known is not None:
+                        with _cache_lock:
+                            _cache[_cache_key(filepath, band_idx)] = known
+                if known is None:
+                    known = read_statistics_tags(src, band_idx)
+                if known is not None:
+                    if known.source != 'tags':
+                        exact_results.append(known)
+                    yield known
+                    continue
+                estimate = _estimate(src, band_idx, rng)
+                yield estimate
+                if estimate.approximate:
+                    pending.append(band_index)
+                else:
+                    exact_results.append(estimate)
+
+            # Exact pass, band by band, strips in random order
+            governor = get_governor()
+            strips_per_band = []
+            for band_index in pending:
+                band_idx = band_index + 1
+                plan = plan_windows(src.width, 1, src.dtypes[band_idx - 1], memory_budget,
+                                    block_height=src.block_shapes[band_idx - 1][0], operation='read',
+                                    height=src.height)
+                strips_per_band.append((list(iter_row_windows(src.width, src.height, plan.rows)),
+                                        plan.window_bytes))
+            total = sum(len(strips) for strips, _ in strips_per_band)
+            done = 0
+
+            for band_index, (strips, strip_bytes) in zip(pending, strips_per_band):
+                band_idx = band_index + 1
+                total_pixels = src.width * src.height
+                accumulator = StatisticsAccumulator()
+                pixels = 0
+                step = max(1, len(strips) // REFINEMENT_STEPS)
+
+                for position, i in enumerate(rng.permutation(len(strips)), start=1):
+                    if cancelled():
+                        return
+                    with governor.reserve(strip_bytes):
+                        strip_pixels, values = _valid_values(src, band_idx, window=strips[i], use_cache=False)
+                        pixels += strip_pixels
+                        accumulator.add(values)
+                    done += 1
+                    if progress_callback:
+                        progress_callback(done, total)
+                    if position < len(strips) and position % step == 0:
+                        yield BandStatistics.from_accumulator(band_index, accumulator, pixels, total_pixels,
+                                                              True, 'partial')
+
+                result = BandStatistics.from_accumulator(band_index, accumulator, pixels, total_pixels,
+                                                         False, 'full')
+                exact_results.append(result)
+                with _cache_lock:
+                    _cache[_cache_key(filepath, band_idx)] = result
+                if cache is not None:
+                    try:
+                        cache.put(cache.key('statistics', filepath, band=band_idx), result)
+                    except RasterHandlerError as e:
+                        get_logger('igcv_raster_utility.cache').warning("%s", e)
+                yield result
+
+    except RasterHandlerError:
+        raise
+    except Exception as e:
+        raise RasterHandlerError(f"Error computing band statistics: {e}")
+
+    if write_tags and exact_results:
+        write_statistics_tags(filepath, exact_results)
+        # The file changed: key the cache by its new version
+        with _cache_lock:
+            for result in exact_results:
+                _cache[_cache_key(filepath, result.band_index + 1)] = result
+
+class StreamingBandSummary:
+    """
+    Statistics and optional histogram of one band, accumulated window by window
+    while the band is written (e.g. by stream_export).
+
+    8/16-bit integer bands get an exact histogram; other types are binned
+    over `histogram_range` (values outside it are counted in the edge bins)
+    and get no histogram when the range is unknown.
+
+    Args:
+        dtype: Data type of the band
+        histogram_bins (int, optional): Maximum number of histogram bins (None = no histogram)
+        histogram_range (tuple, optional): (min, max) used to bin non-integer bands
+    """
+
+    def __init__(self, dtype, histogram_bins=None, histogram_range=None):
+        self.dtype = np.dtype(dtype)
+        self.accumulator = StatisticsAccumulator()
+        self.pixels = 0
+        self.histogram_bins = histogram_bins
+        self._exact = None
+        self._counts = None
+        self._clipped = 0
+        self._range = None
+        if histogram_bins and not supports_exact_histogram(self.dtype) and histogram_range is not None:
+            low, high = histogram_range
+            if high <= low:
+                low, high = low - 0.5, high + 0.5
+            self._range = (low, high)
+            self._counts = np.zeros(histogram_bins, dtype=np.int64)
+
+    def add(self, values, valid=None):
+        """
+        Adds a window of the band.
+
+        Args:
+            values (ndarray): 2D values of the window
+            valid (ndarray, optional): Boolean validity mask (True = valid)
+        """
+        self.pixels += values.size
+        valid_values = values[valid] if valid is not None else values.ravel()
+        self.accumulator.add(valid_values)
+
+        if self.histogram_bins and supports_exact_histogram(self.dtype):
+            window_histogram = BandHistogram.from_array(values, valid)
+            if self._exact is None:
+                self._exact = window_histogram
+            else:
+                self._exact.add(window_histogram)
+        elif self._counts is not None and valid_values.size:
+            self._clipped += accumulate_fixed_range(self._counts, valid_values, *self._range)
+
+    def statistics(self, band_index):
+        """Returns the exact BandStatistics of the accumulated windows"""
+        return BandStatistics.from_accumulator(band_index, self.accumulator, self.pixels, self.pixels,
+                                               False, 'full')
+
+    def histogram(self):
+        """Returns the exact HistogramResult, or None when no histogram was accumulated"""
+        if self._exact is not None:
+            return self._exact.to_result(self.histogram_bins)
+        if self._counts is not None:
+            low, high = self._range
+            return HistogramResult(self._counts, np.linspace(low, high, self._counts.size + 1),
+                                   False, 1, self._clipped)
+        return None
+
+def strip_statistics_tags(tags):
+    """Returns band tags without GDAL statistics (which describe the pixels they were computed from)"""
+    return {key: value for key, value in tags.items() if not key.startswith('STATISTICS_')}
@@ -0,0 +1,178 @@
+from functools import lru_cache
+import numpy as np
+
+# Integer types stretched through a lookup table (one entry per possible value)
+LUT_DTYPES = (np.uint8, np.int8, np.uint16, np.int16)
+
+def _index_view(band):
+    """
+    Returns an unsigned view of an 8/16-bit integer band usable as LUT index.
+
+    Signed values are reinterpreted (two's complement), which matches the
+    order used by build_lut, so no converted copy is needed.
+    """
+    if band.dtype == np.int8:
+        return band.view(np.uint8)
+    if band.dtype == np.int16:
+        return band.view(np.uint16)
+    return band
+
+def build_lut(dtype, low, high):
+    """
+    Builds a uint8 lookup table that linearly stretches [low, high] to [0, 255].
+
+    Args:
+        dtype: 8 or 16-bit integer data type of the band
+        low (float): Value mapped to 0
+        high (float): Value mapped to 255
+
+    Returns:
+        ndarray: uint8 table indexed by the unsigned view of the band values
+    """
+    dtype = np.dtype(dtype)
+    unsigned = np.dtype(f'uint{dtype.itemsize * 8}')
+    # Every possible value, in the order of the unsigned view
+    values = np.arange(np.iinfo(unsigned).max + 1, dtype=np.uint32).astype(unsigned).view(dtype)
+    values = values.astype(np.float32)
+
+    np.subtract(values, np.float32(low), out=values)
+    np.multiply(values, np.float32(255.0 / (high - low)), out=values)
+    np.clip(values, 0, 255, out=values)
+    return values.astype(np.uint8)
+
+@lru_cache(maxsize=32)
+def _cached_lut(dtype, low, high):
+    lut = build_lut(dtype, low, high)
+    lut.flags.writeable = False
+    return lut
+
+def stretch_band(band, low, high, out=None, scratch=None):
+    """
+    Linearly stretches a band to uint8, keeping the math at the band's native width.
+
+    - 8/16-bit integers go through a lookup table (no float temporaries)
+    - float32 is computed in float32, float64 in float64
+    - other integer types are computed in float64
+
+    All float math runs in place (ufuncs with out=), so with `out` and
+    `scratch` provided nothing is allocated per call besides the LUT.
+
+    Args:
+        band (ndarray): 2D band values
+        low (float): Value mapped to 0
+        high (float): Value mapped to 255
+        out (ndarray, optional): uint8 output array with the band's shape
+        scratch (ndarray, optional): Float work buffer with the band's shape
+
+    Returns:
+        ndarray: The uint8 output array
+    """
+    if out is None:
+        out = np.empty(band.shape, dtype=np.uint8)
+
+    if band.dtype in LUT_DTYPES:
+        # Tables are reused while the limits don't change (e.g. other band combinations)
+        lut = _cached_lut(band.dtype, float(low), float(high))
+        np.take(lut, _index_view(band), out=out)
+        return out
+
+    work_dtype = np.float32 if band.dtype == np.float32 else np.float64
+    if scratch is None or scratch.dtype != work_dtype or scratch.shape != band.shape:
+        scratch = np.empty(band.shape, dtype=work_dtype)
+
+    np.subtract(band, work_dtype(low), out=scratch, casting='unsafe')
+    np.multiply(scratch, work_dtype(255.0 / (high - low)), out=scratch)
+    np.clip(scratch, 0, 255, out=scratch)
+    # Truncates towards zero, like astype(np.uint8)
+    np.copyto(out, scratch, casting='unsafe')
+    return out
+
+def stretch_limits(band, valid=None, histogram=None):
+    """
+    Computes the preview stretch limits of a band from its valid, non-zero values.
+
+    Float bands use the 1-99 percentiles (falling back to min/max when they
+    are too close); integer bands use the 2-98 percentiles. When the band's
+    histogram is given (8/16-bit integers), the percentiles come from its
+    cumulative counts instead of sorting the pixels.
+
+    Args:
+        band (ndarray): 2D band values
+        valid (ndarray, optional): Boolean validity mask (True = valid)
+        histogram (BandHistogram, optional): Histogram of the band's valid pixels
+
+    Returns:
+        tuple or None: (low, high), or None when the band should be drawn black
+    """
+    if histogram is not None:
+        nonzero = histogram.without_zero()
+        value_range = nonzero.min_max()
+        if value_range is None:
+            return None
+        # A band with one value everywhere carries nothing to show
+        if nonzero.total == band.size and value_range[0] == value_range[1]:
+            return None
+        low, high = nonzero.percentiles((2, 98))
+        return float(low), float(high)
+
+    sample = band[valid] if valid is not None else band.ravel()
+    sample = sample[sample != 0]
+    if sample.size == 0:
+        return None
+
+    # A band with one value everywhere carries nothing to show
+    if sample.size == band.size and sample.min() == sample.max():
+        return None
+
+    if np.issubdtype(band.dtype, np.floating):
+        low, high = np.percentile(sample, (1, 99))
+        if high - low < 1e-10:
+            low, high = sample.min(), sample.max()
+    else:
+        low, high = np.percentile(sample, (2, 98))
+
+    return float(low), float(high)
+
+def preview_channel_map(band_count):
+    """
+    Maps the 3 display channels to 1-3 bands: one band is drawn in gray,
+    two bands as (band1, band2, band1), three bands as (band1, band2, band3).
+
+    Returns:
+        list: Band position shown in each channel
+    """
+    return {1: [0, 0, 0], 2: [0, 1, 0]}.get(band_count, [0, 1, 2])
+
+def stretch_preview_band(band, valid=None, out=None, scratch=None, histogram=None):
+    """
+    Stretches a band to uint8 for the preview, with invalid pixels drawn black.
+
+    Args:
+        band (ndarray): 2D band values
+        valid (ndarray, optional): Boolean validity mask (True = valid)
+        histogram (BandHistogram, optional): Cached histogram used for the limits
+        out (ndarray, optional): uint8 output array with the band's shape
+        scratch (ndarray, optional): Float work buffer reused between bands
+
+    Returns:
+        ndarray: The uint8 output array
+    """
+    if out is None:
+        out = np.empty(band.shape, dtype=np.uint8)
+
+    limits = stretch_limits(band, valid, histogram)
+    if limits is None:
+        out.fill(0)
+        return out
+
+    low, high = limits
+    if high <= low:
+        # All valid values are the same: middle gray
+        out.fill(128)
+    else:
+        with np.errstate(invalid='ignore'):
+            stretch_band(band, low, high, out=out, scratch=scratch)
+
+    if valid is not None:
+        np.multiply(out, valid, out=out)
+    return out
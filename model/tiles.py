@@ -0,0 +1,253 @@
+import os
+import math
+import struct
+import threading
+import zlib
+import numpy as np
+import rasterio
+from rasterio.crs import CRS
+from rasterio.enums import Resampling
+from rasterio.errors import RasterioError
+from rasterio.transform import from_bounds
+from rasterio.vrt import WarpedVRT
+from rasterio.warp import transform_bounds
+from exceptions import RasterHandlerError
+from model.gdal_env import gdal_env
+from model.histogram import get_band_histogram, supports_exact_histogram
+from model.masks import read_validity_mask
+from model.reproject import RESAMPLING_METHODS
+from model.stretch import preview_channel_map, stretch_band, stretch_limits
+
+# Web Mercator (EPSG:3857) XYZ tiling scheme
+TILE_SIZE = 256
+WEB_MERCATOR = CRS.from_epsg(3857)
+WEB_MERCATOR_EXTENT = 20037508.342789244
+MAX_ZOOM = 24
+# Longest side of the decimated read used for the display stretch of a whole band
+DISPLAY_SAMPLE_SIZE = 1024
+
+# Stretch limits per (file version, band), shared by every tile of the band
+_limits_cache = {}
+_limits_lock = threading.Lock()
+
+def tile_bounds(z, x, y):
+    """
+    Returns the Web Mercator bounds of an XYZ tile.
+
+    Args:
+        z (int): Zoom level
+        x (int): Tile column (0 at the west edge)
+        y (int): Tile row (0 at the north edge)
+
+    Returns:
+        tuple: (left, bottom, right, top) in EPSG:3857 meters
+
+    Raises:
+        RasterHandlerError: If the tile doesn't exist at this zoom level
+    """
+    if z < 0 or z > MAX_ZOOM:
+        raise RasterHandlerError(f"Invalid zoom level: {z}. Valid levels: 0-{MAX_ZOOM}")
+    tiles = 2 ** z
+    if not (0 <= x < tiles and 0 <= y < tiles):
+        raise RasterHandlerError(f"Invalid tile {z}/{x}/{y}: x and y must be within 0-{tiles - 1}")
+    size = 2 * WEB_MERCATOR_EXTENT / tiles
+    left = -WEB_MERCATOR_EXTENT + x * size
+    top = WEB_MERCATOR_EXTENT - y * size
+    return left, top - size, left + size, top
+
+def tile_info(filepath):
+    """
+    Describes how a raster maps to the XYZ tiling scheme.
+
+    Args:
+        filepath (str): Path to the raster file
+
+    Returns:
+        dict: 'bounds' (west, south, east, north) in degrees, 'center' (lon, lat, zoom),
+              'minzoom' (whole raster in about one tile) and 'maxzoom' (native resolution)
+
+    Raises:
+        RasterHandlerError: If the raster has no CRS or can't be read
+    """
+    try:
+        with rasterio.open(filepath) as src:
+            if src.crs is None:
+                raise RasterHandlerError("The raster has no CRS; it can't be tiled")
+            left, bottom, right, top = transform_bounds(src.crs, WEB_MERCATOR, *src.bounds)
+            west, south, east, north = transform_bounds(src.crs, 'EPSG:4326', *src.bounds)
+            pixel_size = max((right - left) / src.width, (top - bottom) / src.height)
+    except RasterioError as e:
+        raise RasterHandlerError(f"Error reading raster for tiling: {e}")
+
+    def zoom_for(meters_per_pixel):
+        zoom = math.log2(2 * WEB_MERCATOR_EXTENT / TILE_SIZE / meters_per_pixel)
+        return min(MAX_ZOOM, max(0, int(math.ceil(zoom))))
+
+    maxzoom = zoom_for(pixel_size)
+    minzoom = min(maxzoom, zoom_for(max(right - left, top - bottom) / TILE_SIZE))
+    return {
+        'bounds': (west, south, east, north),
+        'center': ((west + east) / 2, (south + north) / 2, minzoom),
+        'minzoom': minzoom,
+        'maxzoom': maxzoom,
+    }
+
+def clear_cache():
+    """Drops the cached display limits"""
+    with _limits_lock:
+        _limits_cache.clear()
+
+def display_limits(src, band_idx):
+    """
+    Returns the stretch limits of a band over its full extent.
+
+    Tiles must share one stretch, otherwise each tile would be stretched to
+    its own values and the mosaic would show seams. The limits come from a
+    decimated read of the whole band (8/16-bit bands use the cached
+    histogram of that read, like the preview) and are cached per file
+    version and band.
+
+    Args:
+        src: Open rasterio dataset
+        band_idx (int): 1-based band index
+
+    Returns:
+        tuple or None: (low, high), or None when the band should be drawn black
+    """
+    try:
+        key = (os.path.abspath(src.name), os.path.getmtime(src.name), band_idx)
+    except OSError:
+        key = None
+    if key is not None:
+        with _limits_lock:
+            if key in _limits_cache:
+                return _limits_cache[key]
+
+    scale = max(1.0, max(src.width, src.height) / DISPLAY_SAMPLE_SIZE)
+    out_shape = (max(1, int(src.height / scale)), max(1, int(src.width / scale)))
+    data = src.read(band_idx, out_shape=out_shape, resampling=Resampling.average)
+    validity = read_validity_mask(src, [band_idx], out_shape=out_shape, data=[data])
+    valid = None if validity.all_valid else validity.to_array()
+    histogram = None
+    if supports_exact_histogram(data.dtype):
+        histogram = get_band_histogram(src, band_idx, out_shape=out_shape, data=data, valid=valid)
+    limits = stretch_limits(data, valid, histogram)
+
+    if key is not None:
+        with _limits_lock:
+            _limits_cache[key] = limits
+    return limits
+
+def render_tile(filepath, band_indices, z, x, y, resampling='nearest'):
+    """
+    Renders an XYZ tile of 1-3 bands as an RGBA image.
+
+    The tile is warped from the source on the fly (only the source pixels
+    under the tile are read) and stretched with the band-wide display
+    limits; pixels outside the raster or invalid (NoData, mask, NaN) are
+    transparent. Bands are mapped to channels as in the preview.
+
+    Args:
+        filepath (str): Path to the raster file
+        band_indices (list): 1-3 band indices (0-based)
+        z (int): Zoom level
+        x (int): Tile column
+        y (int): Tile row
+        resampling (str): Resampling method name (see RESAMPLING_METHODS)
+
+    Returns:
+        numpy.ndarray or None: (TILE_SIZE, TILE_SIZE, 4) uint8 image, or None if the
+                               tile doesn't intersect the raster
+
+    Raises:
+        RasterHandlerError: If the arguments are invalid or the raster can't be read
+    """
+    if len(band_indices) < 1 or len(band_indices) > 3:
+        raise RasterHandlerError("Tiles require 1 to 3 bands")
+    if resampling not in RESAMPLING_METHODS:
+        raise RasterHandlerError(f"Invalid resampling method: {resampling}. Options: {', '.join(RESAMPLING_METHODS)}")
+    left, bottom, right, top = tile_bounds(z, x, y)
+
+    try:
+        with gdal_env('preview'), rasterio.open(filepath) as src:
+            if src.crs is None:
+                raise RasterHandlerError("The raster has no CRS; it can't be tiled")
+            for idx in band_indices:
+                if idx < 0 or idx >= src.count:
+                    raise RasterHandlerError(f"Invalid band index: {idx}. Available bands: 0-{src.count-1}")
+
+            # Tiles outside the raster are answered without warping
+            r_left, r_bottom, r_right, r_top = transform_bounds(src.crs, WEB_MERCATOR, *src.bounds)
+            if r_left >= right or r_right <= left or r_bottom >= top or r_top <= bottom:
+                return None
+
+            band_list = [idx + 1 for idx in band_indices]
+            limits = [display_limits(src, band_idx) for band_idx in band_list]
+
+            # Without a NoData value the validity of the warped pixels comes in an alpha band
+            add_alpha = src.nodata is None
+            with WarpedVRT(src, crs=WEB_MERCATOR, transform=from_bounds(left, bottom, right, top, TILE_SIZE, TILE_SIZE),
+                           width=TILE_SIZE, height=TILE_SIZE, resampling=RESAMPLING_METHODS[resampling],
+                           add_alpha=add_alpha) as vrt:
+                data = vrt.read(band_list)
+                validity = read_validity_mask(vrt, band_list, data=data, use_cache=False,
+                                              alpha_band=src.count + 1 if add_alpha else None)
+
+            tile = np.zeros((TILE_SIZE, TILE_SIZE, 4), dtype=np.uint8)
+            stretched = np.empty((TILE_SIZE, TILE_SIZE), dtype=np.uint8)
+            channel_map = preview_channel_map(len(band_list))
+            for position, (values, band_limits) in enumerate(zip(data, limits)):
+                if band_limits is None:
+                    stretched.fill(0)
+                elif band_limits[1] <= band_limits[0]:
+                    stretched.fill(128)
+                else:
+                    with np.errstate(invalid='ignore'):
+                        stretch_band(values, band_limits[0], band_limits[1], out=stretched)
+                for channel, source in enumerate(channel_map):
+                    if source == position:
+                        tile[:, :, channel] = stretched
+
+            tile[:, :, 3] = validity.to_array() * np.uint8(255)
+            if not tile[:, :, 3].any():
+                return None
+            return tile
+
+    except RasterioError as e:
+        raise RasterHandlerError(f"Error rendering tile {z}/{x}/{y}: {e}")
+    except RasterHandlerError:
+        raise
+    except Exception as e:
+        raise RasterHandlerError(f"Unexpected error rendering tile {z}/{x}/{y}: {e}")
+
+def encode_png(image):
+    """
+    Encodes an image as PNG (no imaging library needed).
+
+    Args:
+        image (ndarray): (height, width, channels) uint8 or uint16 array with 1 (gray),
+                         2 (gray + alpha), 3 (RGB) or 4 (RGBA) channels, or a 2D gray image
+
+    Returns:
+        bytes: PNG file contents
+    """
+    if image.ndim == 2:
+        image = image[:, :, np.newaxis]
+    height, width, channels = image.shape
+    color_type = {1: 0, 2: 4, 3: 2, 4: 6}[channels]
+    # PNG stores 16-bit samples big-endian
+    sample = np.dtype('>u2') if image.dtype == np.uint16 else np.dtype(np.uint8)
+    bit_depth = sample.itemsize * 8
+    # Every scanline starts with filter type 0 (none)
+    row_bytes = width * channels * sample.itemsize
+    rows = np.empty((height, 1 + row_bytes), dtype=np.uint8)
+    rows[:, 0] = 0
+    rows[:, 1:] = np.ascontiguousarray(image, dtype=sample).view(np.uint8).reshape(height, row_bytes)
+
+    def chunk(kind, payload):
+        return (struct.pack('>I', len(payload)) + kind + payload
+                + struct.pack('>I', zlib.crc32(kind + payload) & 0xFFFFFFFF))
+
+    header = struct.pack('>IIBBBBB', width, height, bit_depth, color_type, 0, 0, 0)
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header)
+            + chunk(b'IDAT', zlib.compress(rows.tobytes(), 6)) + chunk(b'IEND', b''))
@@ -0,0 +1,188 @@
+import os
+import math
+import numpy as np
+from rasterio.enums import Resampling
+from rasterio.windows import Window, from_bounds
+from rasterio.errors import WindowError
+from exceptions import RasterHandlerError
+
+# Fraction of a pixel ignored when snapping fractional windows to the pixel grid
+PIXEL_TOLERANCE = 1e-6
+
+# Environment variable overriding the default memory budget (in MB)
+MEMORY_BUDGET_ENV = 'IGCV_MEMORY_BUDGET'
+
+def _budget_from_env():
+    try:
+        value = float(os.environ.get(MEMORY_BUDGET_ENV, ''))
+    except ValueError:
+        return None
+    return int(value * 1024 * 1024) if value > 0 else None
+
+# Default amount of pixel data kept in memory by streaming operations (bytes)
+DEFAULT_MEMORY_BUDGET = _budget_from_env() or 256 * 1024 * 1024
+
+def rows_for_budget(width, band_count, dtype, memory_budget=DEFAULT_MEMORY_BUDGET, block_height=1, buffers=2):
+    """
+    Computes how many rows fit in one window for a given memory budget.
+
+    Args:
+        width (int): Window width in pixels
+        band_count (int): Number of bands held per window
+        dtype: Data type of the window arrays
+        memory_budget (int): Maximum bytes of pixel data in memory
+        block_height (int): Source block height; the result is aligned to it when possible
+        buffers (int): Number of windows alive at the same time (e.g. one being read
+                       while the previous one is written)
+
+    Returns:
+        int: Number of rows per window (at least 1)
+    """
+    itemsize = np.dtype(dtype).itemsize
+    bytes_per_row = max(1, width * band_count * itemsize * max(1, buffers))
+    rows = max(1, int(memory_budget // bytes_per_row))
+
+    # Keep windows aligned to whole source blocks to avoid decoding them twice
+    if block_height and block_height > 1 and rows >= block_height:
+        rows = (rows // block_height) * block_height
+
+    return rows
+
+def iter_row_windows(width, height, rows, col_off=0, row_off=0):
+    """
+    Yields full-width strips of at most `rows` rows covering a region.
+
+    Args:
+        width (int): Region width in pixels
+        height (int): Region height in pixels
+        rows (int): Maximum rows per window
+        col_off (int): Column offset of the region
+        row_off (int): Row offset of the region
+
+    Yields:
+        Window: Consecutive windows from top to bottom
+    """
+    rows = max(1, int(rows))
+    for start in range(0, height, rows):
+        yield Window(col_off, row_off + start, width, min(rows, height - start))
+
+def read_bands(src, band_list, window=None, out_shape=None, resampling=Resampling.nearest, views=False):
+    """
+    Reads several bands of a region with one decode per source block.
+
+    Reading band by band (src.read(b) for each b) decodes every block of a
+    pixel-interleaved file, where a block holds all bands, once per band.
+    Here the distinct bands are read in one dataset-level call: GDAL then
+    decodes each pixel-interleaved block once for all of them, and reads
+    the planes of a band-interleaved file once each in file (band index)
+    order. Repeated bands (e.g. a grayscale preview) are read once.
+
+    Args:
+        src: Open rasterio dataset (or WarpedVRT)
+        band_list (list): 1-based band indices, in output order (repeats allowed)
+        window (Window, optional): Region to read (default: full extent)
+        out_shape (tuple, optional): (rows, cols) of a decimated read
+        resampling (Resampling): Resampling of decimated reads
+        views (bool): Return a list of per-band views of the single read instead,
+                      which avoids copying when the output order differs from file order
+
+    Returns:
+        ndarray or list: (len(band_list), rows, cols) array in output order, or one 2D view per band
+    """
+    distinct = sorted(set(band_list))
+    kwargs = {'window': window}
+    if out_shape is not None:
+        kwargs['out_shape'] = (len(distinct),) + tuple(out_shape)
+        kwargs['resampling'] = resampling
+    data = src.read(distinct, **kwargs)
+    positions = [distinct.index(b) for b in band_list]
+    if views:
+        return [data[position] for position in positions]
+    if distinct == list(band_list):
+        return data
+    # Output order differs from file order (or has repeats): only an in-memory copy
+    return data[positions]
+
+def count_windows(height, rows):
+    """Returns the number of strips produced by iter_row_windows"""
+    return max(1, math.ceil(height / max(1, int(rows))))
+
+def check_alignment(datasets, names=None):
+    """
+    Verifies that several open datasets share the same pixel grid.
+
+    Args:
+        datasets (list): Open rasterio datasets
+        names (list, optional): Labels used in the error message (default: dataset names)
+
+    Raises:
+        RasterHandlerError: If the CRS, size or transform differ
+    """
+    if not datasets:
+        return
+
+    names = names or [src.name for src in datasets]
+    reference = datasets[0]
+
+    for name, src in zip(names[1:], datasets[1:]):
+        problems = []
+        if src.crs != reference.crs:
+            problems.append(f"CRS {src.crs} != {reference.crs}")
+        if (src.width, src.height) != (reference.width, reference.height):
+            problems.append(f"size {src.width}x{src.height} != {reference.width}x{reference.height}")
+        if not src.transform.almost_equals(reference.transform):
+            problems.append(f"transform {tuple(src.transform)[:6]} != {tuple(reference.transform)[:6]}")
+
+        if problems:
+            raise RasterHandlerError(
+                f"Input {name} is not aligned with {names[0]}: " + "; ".join(problems)
+            )
+
+def resolve_window(src, window=None, bbox=None):
+    """
+    Converts a pixel window or a bounding box into a window inside the dataset.
+
+    Args:
+        src: Open rasterio dataset
+        window (tuple or Window, optional): Pixel window (col_off, row_off, width, height)
+        bbox (tuple, optional): Bounding box (left, bottom, right, top) in the raster's CRS
+
+    Returns:
+        Window or None: Integer window clipped to the dataset, or None for the full extent
+
+    Raises:
+        RasterHandlerError: If both are given or the region doesn't intersect the raster
+    """
+    if window is None and bbox is None:
+        return None
+
+    if window is not None and bbox is not None:
+        raise RasterHandlerError("Use either a pixel window or a bounding box, not both")
+
+    if bbox is not None:
+        left, bottom, right, top = bbox
+        if right <= left or top <= bottom:
+            raise RasterHandlerError(f"Invalid bounding box: {bbox}")
+        window = from_bounds(left, bottom, right, top, transform=src.transform)
+    elif not isinstance(window, Window):
+        col_off, row_off, width, height = window
+        if width <= 0 or height <= 0:
+            raise RasterHandlerError(f"Invalid pixel window: {tuple(window)}")
+        window = Window(col_off, row_off, width, height)
+
+    # Snap to whole pixels (outwards) and clip to the raster extent
+    # (start floored, end ceiled; bounds off a pixel edge by float noise don't grab an extra pixel)
+    col_start = math.floor(window.col_off + PIXEL_TOLERANCE)
+    row_start = math.floor(window.row_off + PIXEL_TOLERANCE)
+    col_end = math.ceil(window.col_off + window.width - PIXEL_TOLERANCE)
+    row_end = math.ceil(window.row_off + window.height - PIXEL_TOLERANCE)
+    window = Window(col_start, row_start, col_end - col_start, row_end - row_start)
+    try:
+        window = window.intersection(Window(0, 0, src.width, src.height))
+    except WindowError:
+        raise RasterHandlerError("The requested region does not intersect the raster")
+
+    if window.width <= 0 or window.height <= 0:
+        raise RasterHandlerError("The requested region does not intersect the raster")
+
+    return Window(int(window.col_off), int(window.row_off), int(window.width), int(window.height))
@@ -0,0 +1,365 @@
+import os
+import sys
+import json
+import shutil
+import argparse
+import tempfile
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+import numpy as np
+from model import raster_handler, statistics, tiles
+from model.governor import set_memory_budget
+from model.result_cache import ResultCache, DEFAULT_RESULT_CACHE_DIR, DEFAULT_RESULT_CACHE_SIZE
+from model.gdal_env import GDAL_CONFIG_ENV, DEFAULT_CONFIG_PATH, set_config_path, set_env_overrides, parse_env_options
+from model.windowing import DEFAULT_MEMORY_BUDGET, MEMORY_BUDGET_ENV
+from exceptions import RasterHandlerError, ValidationError, FileOperationError
+from logger import get_logger
+
+# Rendered tiles/previews kept in memory, in bytes
+DEFAULT_CACHE_SIZE = 64 * 1024 * 1024
+# Bytes sent per write when streaming downloads
+STREAM_CHUNK_SIZE = 1024 * 1024
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8080
+
+class ResponseCache:
+    """Thread-safe LRU cache of response bodies, bounded by their total size"""
+
+    def __init__(self, max_bytes=DEFAULT_CACHE_SIZE):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, content_type, body):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                return
+            self._entries[key] = (content_type, body)
+            self._bytes += len(body)
+            while self._bytes > self.max_bytes and self._entries:
+                _, (_, old) = self._entries.popitem(last=False)
+                self._bytes -= len(old)
+
+def raster_ids(paths):
+    """
+    Names the served rasters by their file stem (with a suffix for repeated stems).
+
+    Args:
+        paths (list): Raster file paths
+
+    Returns:
+        dict: Raster id -> absolute path
+    """
+    rasters = {}
+    for path in paths:
+        stem = os.path.splitext(os.path.basename(path))[0]
+        raster_id, n = stem, 1
+        while raster_id in rasters:
+            n += 1
+            raster_id = f"{stem}_{n}"
+        rasters[raster_id] = os.path.abspath(path)
+    return rasters
+
+def _parse_bands(query, count=None, default=None):
+    """Reads the 1-based 'bands' parameter (e.g. bands=4,3,2) as 0-based indices"""
+    if 'bands' not in query:
+        if default is None:
+            raise ValidationError("Missing 'bands' parameter")
+        return default
+    try:
+        indices = [int(b) - 1 for b in query['bands'][0].split(',') if b.strip()]
+    except ValueError:
+        raise ValidationError(f"Invalid 'bands' parameter: {query['bands'][0]}")
+    if not indices:
+        raise ValidationError("Empty 'bands' parameter")
+    if count is not None:
+        for idx in indices:
+            if idx < 0 or idx >= count:
+                raise ValidationError(f"Invalid band: {idx+1}. Valid bands: 1-{count}")
+    return indices
+
+def _parse_numbers(query, name, size, kind):
+    """Reads an optional comma-separated parameter with `size` numbers"""
+    if name not in query:
+        return None
+    try:
+        values = tuple(kind(v) for v in query[name][0].split(','))
+    except ValueError:
+        values = ()
+    if len(values) != size:
+        raise ValidationError(f"Invalid '{name}' parameter: expected {size} comma-separated numbers")
+    return values
+
+class TileRequestHandler(BaseHTTPRequestHandler):
+    """
+    Routes of the tile server (band numbers in query strings are 1-based):
+
+    - GET /rasters: served rasters
+    - GET /rasters/<id>: file/band metadata and tiling information
+    - GET /rasters/<id>/preview.png?bands=&size=: preview image of 1-3 bands
+    - GET /rasters/<id>/tiles/<z>/<x>/<y>.png?bands=: Web Mercator XYZ tile
+    - GET /rasters/<id>/statistics?bands=: exact band statistics (JSON)
+    - GET /rasters/<id>/download?bands=&window=&bbox=: GeoTIFF with a band subset
+    """
+
+    server_version = 'IGCVTileServer/1.0'
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        self.server.logger.info("%s - %s", self.address_string(), format % args)
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        parts = [p for p in url.path.split('/') if p]
+        try:
+            if parts == ['rasters']:
+                return self._send_json({
+                    raster_id: f"/rasters/{raster_id}" for raster_id in self.server.rasters
+                })
+            if len(parts) < 2 or parts[0] != 'rasters' or parts[1] not in self.server.rasters:
+                return self._send_error(404, f"Not found: {url.path}")
+
+            raster_id, path = parts[1], self.server.rasters[parts[1]]
+            route = parts[2:]
+            if not route:
+                return self._describe(raster_id, path)
+            if route == ['preview.png']:
+                return self._preview(path, query)
+            if len(route) == 4 and route[0] == 'tiles' and route[3].endswith('.png'):
+                return self._tile(path, route[1], route[2], route[3][:-len('.png')], query)
+            if route == ['statistics']:
+                return self._statistics(path, query)
+            if route == ['download']:
+                return self._download(raster_id, path, query)
+            return self._send_error(404, f"Not found: {url.path}")
+        except (RasterHandlerError, ValidationError) as e:
+            return self._send_error(400, str(e))
+        except FileOperationError as e:
+            return self._send_error(404, str(e))
+        except (BrokenPipeError, ConnectionResetError):
+            # Client went away mid-response
+            return
+        except Exception as e:
+            self.server.logger.error(f"Error serving {url.path}: {e}", exc_info=True)
+            return self._send_error(500, f"Unexpected error: {e}")
+
+    # Responses
+
+    def _send(self, status, content_type, body, cacheable=False):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Access-Control-Allow-Origin', '*')
+        if cacheable:
+            self.send_header('Cache-Control', 'max-age=3600')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, data, status=200):
+        self._send(status, 'application/json', json.dumps(data).encode('utf-8'))
+
+    def _send_error(self, status, message):
+        self._send_json({'error': message}, status)
+
+    def _cached(self, key, render):
+        """Serves a rendered image from the shared cache, rendering it on a miss"""
+        entry = self.server.cache.get(key)
+        if entry is None:
+            entry = ('image/png', render())
+            self.server.cache.put(key, *entry)
+        self._send(200, entry[0], entry[1], cacheable=True)
+
+    def _file_version(self, path):
+        if not os.path.isfile(path):
+            raise FileOperationError(f"File not found: {path}")
+        return path, os.path.getmtime(path)
+
+    # Routes
+
+    def _describe(self, raster_id, path):
+        info = raster_handler.describe_raster(path)
+        info['id'] = raster_id
+        try:
+            info['tiles'] = tiles.tile_info(path)
+            info['tiles']['url'] = f"/rasters/{raster_id}/tiles/{{z}}/{{x}}/{{y}}.png"
+        except RasterHandlerError:
+            # Rasters without CRS can still be previewed and downloaded
+            info['tiles'] = None
+        self._send_json(info)
+
+    def _preview(self, path, query):
+        version = self._file_version(path)
+        meta, _ = raster_handler.load_raster(path)
+        bands = _parse_bands(query, meta['count'], default=list(range(min(3, meta['count']))))
+        size = _parse_numbers(query, 'size', 1, int)
+        size = size[0] if size else 500
+        if size < 1 or size > 4096:
+            raise ValidationError("Invalid 'size' parameter: expected 1-4096")
+        self._cached(('preview', version, tuple(bands), size), lambda: tiles.encode_png(
+            raster_handler.generate_preview_image(path, bands, max_size=size, cache=self.server.results)))
+
+    def _tile(self, path, z, x, y, query):
+        try:
+            z, x, y = int(z), int(x), int(y)
+        except ValueError:
+            raise ValidationError(f"Invalid tile: {z}/{x}/{y}")
+        version = self._file_version(path)
+        meta, _ = raster_handler.load_raster(path)
+        bands = _parse_bands(query, meta['count'], default=list(range(min(3, meta['count']))))
+
+        def render():
+            tile = tiles.render_tile(path, bands, z, x, y)
+            return self.server.empty_tile if tile is None else tiles.encode_png(tile)
+
+        self._cached(('tile', version, tuple(bands), z, x, y), render)
+
+    def _statistics(self, path, query):
+        self._file_version(path)
+        meta, band_names = raster_handler.load_raster(path)
+        bands = _parse_bands(query, meta['count'], default=list(range(meta['count'])))
+        exact = {}
+        for result in statistics.iter_band_statistics(path, bands, cache=self.server.results):
+            if not result.approximate:
+                exact[result.band_index] = result
+        self._send_json([
+            {
+                'band': idx + 1,
+                'name': band_names[idx],
+                'min': exact[idx].minimum,
+                'max': exact[idx].maximum,
+                'mean': exact[idx].mean,
+                'std': exact[idx].std,
+                'valid_percent': exact[idx].valid_percent,
+            }
+            for idx in bands
+        ])
+
+    def _download(self, raster_id, path, query):
+        self._file_version(path)
+        meta, _ = raster_handler.load_raster(path)
+        bands = _parse_bands(query, meta['count'], default=list(range(meta['count'])))
+        window = _parse_numbers(query, 'window', 4, int)
+        bbox = _parse_numbers(query, 'bbox', 4, float)
+        if window and bbox:
+            raise ValidationError("Use either 'window' or 'bbox', not both")
+
+        # The subset is streamed to a temporary file, then streamed to the client
+        temp_dir = tempfile.mkdtemp(prefix='igcv_download_')
+        try:
+            out_path = os.path.join(temp_dir, f"{raster_id}.tif")
+            raster_handler.stream_export(path, bands, out_path, window=window, bbox=bbox,
+                                         memory_budget=self.server.memory_budget, cache=self.server.results)
+            self.send_response(200)
+            self.send_header('Content-Type', 'image/tiff')
+            self.send_header('Content-Length', str(os.path.getsize(out_path)))
+            self.send_header('Content-Disposition', f'attachment; filename="{raster_id}_subset.tif"')
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.end_headers()
+            with open(out_path, 'rb') as f:
+                while True:
+                    chunk = f.read(STREAM_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    self.wfile.write(chunk)
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+class TileServer(ThreadingHTTPServer):
+    """
+    HTTP server over the model layer: every request runs on its own thread
+    and all threads share the rendered-response cache and the model caches
+    (validity masks, histograms, statistics, display limits).
+
+    Args:
+        address (tuple): (host, port); port 0 picks a free port
+        paths (list): Raster files to serve
+        cache_size (int): Bytes of rendered tiles/previews kept in memory
+        memory_budget (int): Memory budget of downloads
+        results (ResultCache, optional): Disk cache of previews, statistics and downloads,
+                                         shared with other servers and CLI runs
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, paths, cache_size=DEFAULT_CACHE_SIZE,
+                 memory_budget=DEFAULT_MEMORY_BUDGET, results=None):
+        self.rasters = raster_ids(paths)
+        self.results = results
+        self.cache = ResponseCache(cache_size)
+        self.memory_budget = memory_budget
+        self.logger = get_logger('igcv_raster_utility.server')
+        self.empty_tile = tiles.encode_png(np.zeros((tiles.TILE_SIZE, tiles.TILE_SIZE, 4), dtype=np.uint8))
+        super().__init__(address, TileRequestHandler)
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="IGCVRasterTool tile server: serves previews, XYZ tiles, statistics and band downloads"
+    )
+    parser.add_argument('inputs', nargs='+', help="Raster files to serve")
+    parser.add_argument('--host', default=DEFAULT_HOST, help=f"Address to listen on (default: {DEFAULT_HOST})")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f"Port to listen on (default: {DEFAULT_PORT})")
+    parser.add_argument('--cache-size', type=float, default=64, help="Memory for rendered tiles in MB (default: 64)")
+    parser.add_argument('--result-cache', nargs='?', const=DEFAULT_RESULT_CACHE_DIR, metavar='DIR', help=f"Keep previews, statistics and downloads on disk and reuse them across requests and restarts (default directory: {DEFAULT_RESULT_CACHE_DIR})")
+    parser.add_argument('--result-cache-link', action='store_true', help="Hardlink downloads into the --result-cache instead of copying them")
+    parser.add_argument('--result-cache-size', type=float, default=DEFAULT_RESULT_CACHE_SIZE / (1024 * 1024), help=f"Disk space of --result-cache in MB (default: {DEFAULT_RESULT_CACHE_SIZE // (1024 * 1024)})")
+    parser.add_argument('--memory-budget', type=float, help=f"Memory budget in MB shared by concurrent downloads (default: {MEMORY_BUDGET_ENV} or 256)")
+    parser.add_argument('--gdal-config', nargs='+', metavar='KEY=VALUE', help="GDAL options applied on top of every operation profile")
+    parser.add_argument('--gdal-config-file', metavar='JSON', help=f"GDAL profile overrides file (default: {GDAL_CONFIG_ENV} or {DEFAULT_CONFIG_PATH})")
+    args = parser.parse_args(argv)
+
+    for path in args.inputs:
+        if not os.path.isfile(path):
+            print(f"Error: Input file not found: {path}")
+            sys.exit(1)
+
+    try:
+        if args.gdal_config_file:
+            set_config_path(args.gdal_config_file)
+        if args.gdal_config:
+            set_env_overrides(parse_env_options(args.gdal_config))
+        results = None
+        if args.result_cache:
+            results = ResultCache(args.result_cache, int(args.result_cache_size * 1024 * 1024),
+                                  link=args.result_cache_link)
+    except RasterHandlerError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    memory_budget = DEFAULT_MEMORY_BUDGET
+    if args.memory_budget is not None:
+        memory_budget = int(args.memory_budget * 1024 * 1024)
+        set_memory_budget(memory_budget)
+
+    server = TileServer((args.host, args.port), args.inputs,
+                        cache_size=int(args.cache_size * 1024 * 1024),
+                        memory_budget=memory_budget, results=results)
+    print(f"Serving {len(server.rasters)} raster(s) on {server.url}")
+    for raster_id in server.rasters:
+        print(f"  {server.url}/rasters/{raster_id}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nServer stopped.")
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -343,6 +343,111 @@
         <source>Erro ao aplicar correções:</source>
         <translation>Error applying corrections:</translation>
     </message>
+    <message>
+        <location filename="../view/main_window.py" line="92"/>
+        <source>Arraste sobre o preview para selecionar uma área de exportação</source>
+        <translation>Drag over the preview to select an export area</translation>
+    </message>
+    <message>
+        <location filename="../view/main_window.py" line="95"/>
+        <source>Limpar Seleção</source>
+        <translation>Clear Selection</translation>
+    </message>
+    <message>
+        <location filename="../view/main_window.py" line="388"/>
+        <source>Erro ao selecionar área:</source>
+        <translation>Error selecting area:</translation>
+    </message>
+    <message>
+        <location filename="../controller/main_controller.py" line="241"/>
+        <source>Área selecionada (col, lin, largura, altura):</source>
+        <translation>Selected area (col, row, width, height):</translation>
+    </message>
+    <message>
+        <location filename="../controller/main_controller.py" line="250"/>
+        <source>Seleção removida. A extensão completa será usada.</source>
+        <translation>Selection cleared. The full extent will be used.</translation>
+    </message>
+    <message>
+        <location filename="../view/main_window.py" line="413"/>
+        <source>Erro ao calcular histograma:</source>
+        <translation>Error computing histogram:</translation>
+    </message>
+    <message>
+        <location filename="../view/main_window.py" line="428"/>
+        <source>Erro ao calcular estatísticas:</source>
+        <translation>Error computing statistics:</translation>
+    </message>
+    <message>
+        <location filename="../view/main_window.py" line="102"/>
+        <source>Verificar Dados (Completo)</source>
+        <translation>Check Data (Full)</translation>
+    </message>
+    <message>
+        <location filename="../view/main_window.py" line="103"/>
+        <source>Verifica NaN, infinitos e valores extremos em todos os pixels das bandas selecionadas</source>
+        <translation>Checks NaN, infinite and extreme values in every pixel of the selected bands</translation>
+    </message>
+    <message>
+        <location filename="../view/main_window.py" line="429"/>
+        <source>Erro na verificação completa:</source>
+        <translation>Full check error:</translation>
+    </message>
+    <message>
+        <location filename="../controller/main_controller.py" line="153"/>
+        <source>Resultado de uma amostra (overview e blocos aleatórios); a verificação completa continua em segundo plano.</source>
+        <translation>Result from a sample (overview and random blocks); the full check continues in the background.</translation>
+    </message>
+    <message>
+        <location filename="../controller/main_controller.py" line="372"/>
+        <source>Verificação completa:</source>
+        <translation>Full check:</translation>
+    </message>
+    <message>
+        <location filename="../controller/main_controller.py" line="372"/>
+        <source>problema(s) encontrado(s).</source>
+        <translation>issue(s) found.</translation>
+    </message>
+    <message>
+        <location filename="../controller/main_controller.py" line="375"/>
+        <source>Verificação completa: nenhum problema encontrado.</source>
+        <translation>Full check: no issues found.</translation>
+    </message>
+    <message>
+        <location filename="../controller/main_controller.py" line="381"/>
+        <source>Verificação Completa</source>
+        <translation>Full Check</translation>
+    </message>
+    <message>
+        <location filename="../controller/main_controller.py" line="387"/>
+        <source>Nenhum problema encontrado em todos os pixels das bandas verificadas.</source>
+        <translation>No issues found in any pixel of the checked bands.</translation>
+    </message>
+    <message>
+        <location filename="../controller/main_controller.py" line="393"/>
+        <source>Verificando todos os pixels...</source>
+        <translation>Checking every pixel...</translation>
+    </message>
+    <message>
+        <location filename="../view/main_window.py" line="197"/>
+        <source>Configurações</source>
+        <translation>Settings</translation>
+    </message>
+    <message>
+        <location filename="../view/main_window.py" line="198"/>
+        <source>Ambiente GDAL...</source>
+        <translation>GDAL Environment...</translation>
+    </message>
+    <message>
+        <location filename="../view/main_window.py" line="210"/>
+        <source>Erro na configuração do GDAL:</source>
+        <translation>GDAL configuration error:</translation>
+    </message>
+    <message>
+        <location filename="../view/main_window.py" line="1"/>
+        <source>Configuração do GDAL salva.</source>
+        <translation>GDAL configuration saved.</translation>
+    </message>
 </context>
 <context>
     <name>BandReorderWindow</name>
@@ -387,4 +492,213 @@
         <translation>Confirm Order</translation>
     </message>
 </context>
+<context>
+    <name>HistogramPanel</name>
+    <message>
+        <location filename="../view/histogram_panel.py" line="97"/>
+        <source>Histograma</source>
+        <translation>Histogram</translation>
+    </message>
+    <message>
+        <location filename="../view/histogram_panel.py" line="98"/>
+        <source>Banda:</source>
+        <translation>Band:</translation>
+    </message>
+    <message>
+        <location filename="../view/histogram_panel.py" line="142"/>
+        <source>Carregue um raster para ver o histograma.</source>
+        <translation>Load a raster to see the histogram.</translation>
+    </message>
+    <message>
+        <location filename="../view/histogram_panel.py" line="146"/>
+        <source>Calculando histograma...</source>
+        <translation>Computing histogram...</translation>
+    </message>
+    <message>
+        <location filename="../view/histogram_panel.py" line="148"/>
+        <source>Aproximação (overview 1:</source>
+        <translation>Approximation (overview 1:</translation>
+    </message>
+    <message>
+        <location filename="../view/histogram_panel.py" line="149"/>
+        <source>Refinando com a resolução total...</source>
+        <translation>Refining with full resolution...</translation>
+    </message>
+    <message>
+        <location filename="../view/histogram_panel.py" line="151"/>
+        <source>Exato (resolução total).</source>
+        <translation>Exact (full resolution).</translation>
+    </message>
+    <message>
+        <location filename="../view/histogram_panel.py" line="153"/>
+        <source>pixels fora do intervalo contados nas extremidades.</source>
+        <translation>pixels outside the range counted at the edges.</translation>
+    </message>
+    <message>
+        <location filename="../view/histogram_panel.py" line="156"/>
+        <source>Erro ao calcular histograma:</source>
+        <translation>Error computing histogram:</translation>
+    </message>
+</context>
+<context>
+    <name>StatisticsPanel</name>
+    <message>
+        <location filename="../view/statistics_panel.py" line="48"/>
+        <source>Estatísticas das Bandas</source>
+        <translation>Band Statistics</translation>
+    </message>
+    <message>
+        <location filename="../view/statistics_panel.py" line="48"/>
+        <source>Banda</source>
+        <translation>Band</translation>
+    </message>
+    <message>
+        <location filename="../view/statistics_panel.py" line="50"/>
+        <source>Mín</source>
+        <translation>Min</translation>
+    </message>
+    <message>
+        <location filename="../view/statistics_panel.py" line="50"/>
+        <source>Máx</source>
+        <translation>Max</translation>
+    </message>
+    <message>
+        <location filename="../view/statistics_panel.py" line="50"/>
+        <source>Média</source>
+        <translation>Mean</translation>
+    </message>
+    <message>
+        <location filename="../view/statistics_panel.py" line="51"/>
+        <source>Desvio Padrão</source>
+        <translation>Std Dev</translation>
+    </message>
+    <message>
+        <location filename="../view/statistics_panel.py" line="51"/>
+        <source>Confiança</source>
+        <translation>Confidence</translation>
+    </message>
+    <message>
+        <location filename="../view/statistics_panel.py" line="53"/>
+        <source>Gravar no arquivo (tags de estatísticas GDAL)</source>
+        <translation>Write to file (GDAL statistics tags)</translation>
+    </message>
+    <message>
+        <location filename="../view/statistics_panel.py" line="54"/>
+        <source>Recalcular</source>
+        <translation>Recompute</translation>
+    </message>
+    <message>
+        <location filename="../view/statistics_panel.py" line="58"/>
+        <source>Carregue um raster para ver as estatísticas.</source>
+        <translation>Load a raster to see the statistics.</translation>
+    </message>
+    <message>
+        <location filename="../view/statistics_panel.py" line="73"/>
+        <source>Calculando estimativas...</source>
+        <translation>Computing estimates...</translation>
+    </message>
+    <message>
+        <location filename="../view/statistics_panel.py" line="94"/>
+        <source>Estatísticas exatas gravadas no arquivo.</source>
+        <translation>Exact statistics written to the file.</translation>
+    </message>
+    <message>
+        <location filename="../view/statistics_panel.py" line="96"/>
+        <source>Estatísticas exatas calculadas.</source>
+        <translation>Exact statistics computed.</translation>
+    </message>
+    <message>
+        <location filename="../view/statistics_panel.py" line="99"/>
+        <source>Refinando estatísticas...</source>
+        <translation>Refining statistics...</translation>
+    </message>
+    <message>
+        <location filename="../view/statistics_panel.py" line="102"/>
+        <source>Erro ao calcular estatísticas:</source>
+        <translation>Error computing statistics:</translation>
+    </message>
+    <message>
+        <location filename="../view/statistics_panel.py" line="107"/>
+        <source>Exato (tags GDAL)</source>
+        <translation>Exact (GDAL tags)</translation>
+    </message>
+    <message>
+        <location filename="../view/statistics_panel.py" line="107"/>
+        <source>Exato</source>
+        <translation>Exact</translation>
+    </message>
+    <message>
+        <location filename="../view/statistics_panel.py" line="111"/>
+        <source>Estimativa (overview)</source>
+        <translation>Estimate (overview)</translation>
+    </message>
+    <message>
+        <location filename="../view/statistics_panel.py" line="113"/>
+        <source>Estimativa (amostra de blocos</source>
+        <translation>Estimate (block sample</translation>
+    </message>
+    <message>
+        <location filename="../view/statistics_panel.py" line="99"/>
+        <source>Refinando</source>
+        <translation>Refining</translation>
+    </message>
+    <message>
+        <location filename="../view/statistics_panel.py" line="117"/>
+        <source>± indica a margem de 95% da média estimada</source>
+        <translation>± is the 95% margin of the estimated mean</translation>
+    </message>
+</context>
+<context>
+    <name>GdalEnvDialog</name>
+    <message>
+        <location filename="../view/gdal_env_dialog.py" line="17"/>
+        <source>Ambiente GDAL</source>
+        <translation>GDAL Environment</translation>
+    </message>
+    <message>
+        <location filename="../view/gdal_env_dialog.py" line="1"/>
+        <source>Opções do GDAL aplicadas em cada tipo de operação. Remova uma opção para usar o padrão do GDAL.</source>
+        <translation>GDAL options applied to each operation type. Remove an option to use the GDAL default.</translation>
+    </message>
+    <message>
+        <location filename="../view/gdal_env_dialog.py" line="40"/>
+        <source>Perfil:</source>
+        <translation>Profile:</translation>
+    </message>
+    <message>
+        <location filename="../view/gdal_env_dialog.py" line="49"/>
+        <source>Opção</source>
+        <translation>Option</translation>
+    </message>
+    <message>
+        <location filename="../view/gdal_env_dialog.py" line="49"/>
+        <source>Valor</source>
+        <translation>Value</translation>
+    </message>
+    <message>
+        <location filename="../view/gdal_env_dialog.py" line="56"/>
+        <source>Adicionar Opção</source>
+        <translation>Add Option</translation>
+    </message>
+    <message>
+        <location filename="../view/gdal_env_dialog.py" line="58"/>
+        <source>Remover Opção</source>
+        <translation>Remove Option</translation>
+    </message>
+    <message>
+        <location filename="../view/gdal_env_dialog.py" line="66"/>
+        <source>Arquivo de configuração:</source>
+        <translation>Configuration file:</translation>
+    </message>
+    <message>
+        <location filename="../view/gdal_env_dialog.py" line="72"/>
+        <source>Salvar</source>
+        <translation>Save</translation>
+    </message>
+    <message>
+        <location filename="../view/gdal_env_dialog.py" line="74"/>
+        <source>Cancelar</source>
+        <translation>Cancel</translation>
+    </message>
+</context>
 </TS>
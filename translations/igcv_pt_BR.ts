@@ -268,6 +268,111 @@
         <source>Erro ao aplicar correções:</source>
         <translation>Erro ao aplicar correções:</translation>
     </message>
+    <message>
+        <location filename="../view/main_window.py" line="92"/>
+        <source>Arraste sobre o preview para selecionar uma área de exportação</source>
+        <translation>Arraste sobre o preview para selecionar uma área de exportação</translation>
+    </message>
+    <message>
+        <location filename="../view/main_window.py" line="95"/>
+        <source>Limpar Seleção</source>
+        <translation>Limpar Seleção</translation>
+    </message>
+    <message>
+        <location filename="../view/main_window.py" line="388"/>
+        <source>Erro ao selecionar área:</source>
+        <translation>Erro ao selecionar área:</translation>
+    </message>
+    <message>
+        <location filename="../controller/main_controller.py" line="241"/>
+        <source>Área selecionada (col, lin, largura, altura):</source>
+        <translation>Área selecionada (col, lin, largura, altura):</translation>
+    </message>
+    <message>
+        <location filename="../controller/main_controller.py" line="250"/>
+        <source>Seleção removida. A extensão completa será usada.</source>
+        <translation>Seleção removida. A extensão completa será usada.</translation>
+    </message>
+    <message>
+        <location filename="../view/main_window.py" line="413"/>
+        <source>Erro ao calcular histograma:</source>
+        <translation>Erro ao calcular histograma:</translation>
+    </message>
+    <message>
+        <location filename="../view/main_window.py" line="428"/>
+        <source>Erro ao calcular estatísticas:</source>
+        <translation>Erro ao calcular estatísticas:</translation>
+    </message>
+    <message>
+        <location filename="../view/main_window.py" line="102"/>
+        <source>Verificar Dados (Completo)</source>
+        <translation>Verificar Dados (Completo)</translation>
+    </message>
+    <message>
+        <location filename="../view/main_window.py" line="103"/>
+        <source>Verifica NaN, infinitos e valores extremos em todos os pixels das bandas selecionadas</source>
+        <translation>Verifica NaN, infinitos e valores extremos em todos os pixels das bandas selecionadas</translation>
+    </message>
+    <message>
+        <location filename="../view/main_window.py" line="429"/>
+        <source>Erro na verificação completa:</source>
+        <translation>Erro na verificação completa:</translation>
+    </message>
+    <message>
+        <location filename="../controller/main_controller.py" line="153"/>
+        <source>Resultado de uma amostra (overview e blocos aleatórios); a verificação completa continua em segundo plano.</source>
+        <translation>Resultado de uma amostra (overview e blocos aleatórios); a verificação completa continua em segundo plano.</translation>
+    </message>
+    <message>
+        <location filename="../controller/main_controller.py" line="372"/>
+        <source>Verificação completa:</source>
+        <translation>Verificação completa:</translation>
+    </message>
+    <message>
+        <location filename="../controller/main_controller.py" line="372"/>
+        <source>problema(s) encontrado(s).</source>
+        <translation>problema(s) encontrado(s).</translation>
+    </message>
+    <message>
+        <location filename="../controller/main_controller.py" line="375"/>
+        <source>Verificação completa: nenhum problema encontrado.</source>
+        <translation>Verificação completa: nenhum problema encontrado.</translation>
+    </message>
+    <message>
+        <location filename="../controller/main_controller.py" line="381"/>
+        <source>Verificação Completa</source>
+        <translation>Verificação Completa</translation>
+    </message>
+    <message>
+        <location filename="../controller/main_controller.py" line="387"/>
+        <source>Nenhum problema encontrado em todos os pixels das bandas verificadas.</source>
+        <translation>Nenhum problema encontrado em todos os pixels das bandas verificadas.</translation>
+    </message>
+    <message>
+        <location filename="../controller/main_controller.py" line="393"/>
+        <source>Verificando todos os pixels...</source>
+        <translation>Verificando todos os pixels...</translation>
+    </message>
+    <message>
+        <location filename="../view/main_window.py" line="197"/>
+        <source>Configurações</source>
+        <translation>Configurações</translation>
+    </message>
+    <message>
+        <location filename="../view/main_window.py" line="198"/>
+        <source>Ambiente GDAL...</source>
+        <translation>Ambiente GDAL...</translation>
+    </message>
+    <message>
+        <location filename="../view/main_window.py" line="210"/>
+        <source>Erro na configuração do GDAL:</source>
+        <translation>Erro na configuração do GDAL:</translation>
+    </message>
+    <message>
+        <location filename="../view/main_window.py" line="1"/>
+        <source>Configuração do GDAL salva.</source>
+        <translation>Configuração do GDAL salva.</translation>
+    </message>
 </context>
 <context>
     <name>BandReorderWindow</name>
@@ -312,4 +417,213 @@
         <translation>Confirmar Ordem</translation>
     </message>
 </context>
+<context>
+    <name>HistogramPanel</name>
+    <message>
+        <location filename="../view/histogram_panel.py" line="97"/>
+        <source>Histograma</source>
+        <translation>Histograma</translation>
+    </message>
+    <message>
+        <location filename="../view/histogram_panel.py" line="98"/>
+        <source>Banda:</source>
+        <translation>Banda:</translation>
+    </message>
+    <message>
+        <location filename="../view/histogram_panel.py" line="142"/>
+        <source>Carregue um raster para ver o histograma.</source>
+        <translation>Carregue um raster para ver o histograma.</translation>
+    </message>
+    <message>
+        <location filename="../view/histogram_panel.py" line="146"/>
+        <source>Calculando histograma...</source>
+        <translation>Calculando histograma...</translation>
+    </message>
+    <message>
+        <location filename="../view/histogram_panel.py" line="148"/>
+        <source>Aproximação (overview 1:</source>
+        <translation>Aproximação (overview 1:</translation>
+    </message>
+    <message>
+        <location filename="../view/histogram_panel.py" line="149"/>
+        <source>Refinando com a resolução total...</source>
+        <translation>Refinando com a resolução total...</translation>
+    </message>
+    <message>
+        <location filename="../view/histogram_panel.py" line="151"/>
+        <source>Exato (resolução total).</source>
+        <translation>Exato (resolução total).</translation>
+    </message>
+    <message>
+        <location filename="../view/histogram_panel.py" line="153"/>
+        <source>pixels fora do intervalo contados nas extremidades.</source>
+        <translation>pixels fora do intervalo contados nas extremidades.</translation>
+    </message>
+    <message>
+        <location filename="../view/histogram_panel.py" line="156"/>
+        <source>Erro ao calcular histograma:</source>
+        <translation>Erro ao calcular histograma:</translation>
+    </message>
+</context>
+<context>
+    <name>StatisticsPanel</name>
+    <message>
+        <location filename="../view/statistics_panel.py" line="48"/>
+        <source>Estatísticas das Bandas</source>
+        <translation>Estatísticas das Bandas</translation>
+    </message>
+    <message>
+        <location filename="../view/statistics_panel.py" line="48"/>
+        <source>Banda</source>
+        <translation>Banda</translation>
+    </message>
+    <message>
+        <location filename="../view/statistics_panel.py" line="50"/>
+        <source>Mín</source>
+        <translation>Mín</translation>
+    </message>
+    <message>
+        <location filename="../view/statistics_panel.py" line="50"/>
+        <source>Máx</source>
+        <translation>Máx</translation>
+    </message>
+    <message>
+        <location filename="../view/statistics_panel.py" line="50"/>
+        <source>Média</source>
+        <translation>Média</translation>
+    </message>
+    <message>
+        <location filename="../view/statistics_panel.py" line="51"/>
+        <source>Desvio Padrão</source>
+        <translation>Desvio Padrão</translation>
+    </message>
+    <message>
+        <location filename="../view/statistics_panel.py" line="51"/>
+        <source>Confiança</source>
+        <translation>Confiança</translation>
+    </message>
+    <message>
+        <location filename="../view/statistics_panel.py" line="53"/>
+        <source>Gravar no arquivo (tags de estatísticas GDAL)</source>
+        <translation>Gravar no arquivo (tags de estatísticas GDAL)</translation>
+    </message>
+    <message>
+        <location filename="../view/statistics_panel.py" line="54"/>
+        <source>Recalcular</source>
+        <translation>Recalcular</translation>
+    </message>
+    <message>
+        <location filename="../view/statistics_panel.py" line="58"/>
+        <source>Carregue um raster para ver as estatísticas.</source>
+        <translation>Carregue um raster para ver as estatísticas.</translation>
+    </message>
+    <message>
+        <location filename="../view/statistics_panel.py" line="73"/>
+        <source>Calculando estimativas...</source>
+        <translation>Calculando estimativas...</translation>
+    </message>
+    <message>
+        <location filename="../view/statistics_panel.py" line="94"/>
+        <source>Estatísticas exatas gravadas no arquivo.</source>
+        <translation>Estatísticas exatas gravadas no arquivo.</translation>
+    </message>
+    <message>
+        <location filename="../view/statistics_panel.py" line="96"/>
+        <source>Estatísticas exatas calculadas.</source>
+        <translation>Estatísticas exatas calculadas.</translation>
+    </message>
+    <message>
+        <location filename="../view/statistics_panel.py" line="99"/>
+        <source>Refinando estatísticas...</source>
+        <translation>Refinando estatísticas...</translation>
+    </message>
+    <message>
+        <location filename="../view/statistics_panel.py" line="102"/>
+        <source>Erro ao calcular estatísticas:</source>
+        <translation>Erro ao calcular estatísticas:</translation>
+    </message>
+    <message>
+        <location filename="../view/statistics_panel.py" line="107"/>
+        <source>Exato (tags GDAL)</source>
+        <translation>Exato (tags GDAL)</translation>
+    </message>
+    <message>
+        <location filename="../view/statistics_panel.py" line="107"/>
+        <source>Exato</source>
+        <translation>Exato</translation>
+    </message>
+    <message>
+        <location filename="../view/statistics_panel.py" line="111"/>
+        <source>Estimativa (overview)</source>
+        <translation>Estimativa (overview)</translation>
+    </message>
+    <message>
+        <location filename="../view/statistics_panel.py" line="113"/>
+        <source>Estimativa (amostra de blocos</source>
+        <translation>Estimativa (amostra de blocos</translation>
+    </message>
+    <message>
+        <location filename="../view/statistics_panel.py" line="99"/>
+        <source>Refinando</source>
+        <translation>Refinando</translation>
+    </message>
+    <message>
+        <location filename="../view/statistics_panel.py" line="117"/>
+        <source>± indica a margem de 95% da média estimada</source>
+        <translation>± indica a margem de 95% da média estimada</translation>
+    </message>
+</context>
+<context>
+    <name>GdalEnvDialog</name>
+    <message>
+        <location filename="../view/gdal_env_dialog.py" line="17"/>
+        <source>Ambiente GDAL</source>
+        <translation>Ambiente GDAL</translation>
+    </message>
+    <message>
+        <location filename="../view/gdal_env_dialog.py" line="1"/>
+        <source>Opções do GDAL aplicadas em cada tipo de operação. Remova uma opção para usar o padrão do GDAL.</source>
+        <translation>Opções do GDAL aplicadas em cada tipo de operação. Remova uma opção para usar o padrão do GDAL.</translation>
+    </message>
+    <message>
+        <location filename="../view/gdal_env_dialog.py" line="40"/>
+        <source>Perfil:</source>
+        <translation>Perfil:</translation>
+    </message>
+    <message>
+        <location filename="../view/gdal_env_dialog.py" line="49"/>
+        <source>Opção</source>
+        <translation>Opção</translation>
+    </message>
+    <message>
+        <location filename="../view/gdal_env_dialog.py" line="49"/>
+        <source>Valor</source>
+        <translation>Valor</translation>
+    </message>
+    <message>
+        <location filename="../view/gdal_env_dialog.py" line="56"/>
+        <source>Adicionar Opção</source>
+        <translation>Adicionar Opção</translation>
+    </message>
+    <message>
+        <location filename="../view/gdal_env_dialog.py" line="58"/>
+        <source>Remover Opção</source>
+        <translation>Remover Opção</translation>
+    </message>
+    <message>
+        <location filename="../view/gdal_env_dialog.py" line="66"/>
+        <source>Arquivo de configuração:</source>
+        <translation>Arquivo de configuração:</translation>
+    </message>
+    <message>
+        <location filename="../view/gdal_env_dialog.py" line="72"/>
+        <source>Salvar</source>
+        <translation>Salvar</translation>
+    </message>
+    <message>
+        <location filename="../view/gdal_env_dialog.py" line="74"/>
+        <source>Cancelar</source>
+        <translation>Cancelar</translation>
+    </message>
+</context>
 </TS>
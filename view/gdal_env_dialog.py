@@ -0,0 +1,130 @@
+from PyQt5.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QPushButton, QLabel, QComboBox,
+    QTableWidget, QTableWidgetItem, QHeaderView, QAbstractItemView
+)
+from PyQt5.QtGui import QIcon
+import os
+
+class GdalEnvDialog(QDialog):
+    """Janela para editar as opções do GDAL de cada perfil de operação"""
+
+    def __init__(self, parent=None, settings=None, config_path=None):
+        super().__init__(parent)
+        # Cópia editável das opções de cada perfil
+        self.settings = {profile: dict(options) for profile, options in (settings or {}).items()}
+        self.current_profile = None
+
+        self.setWindowTitle(self.tr("Ambiente GDAL"))
+        self.setMinimumSize(480, 360)
+        self.setModal(True)
+
+        icon_path = os.path.join(os.path.dirname(__file__), '..', 'assets', 'icon.png')
+        if os.path.exists(icon_path):
+            self.setWindowIcon(QIcon(icon_path))
+
+        self._setup_ui(config_path)
+        if self.settings:
+            self._show_profile(self.profile_combo.currentText())
+
+    def _setup_ui(self, config_path):
+        """Configura a interface da janela"""
+        layout = QVBoxLayout()
+
+        instruction_label = QLabel(self.tr("Opções do GDAL aplicadas em cada tipo de operação. "
+                                           "Remova uma opção para usar o padrão do GDAL."))
+        instruction_label.setWordWrap(True)
+        instruction_label.setStyleSheet("color: #666; margin-bottom: 10px;")
+        layout.addWidget(instruction_label)
+
+        profile_layout = QHBoxLayout()
+        profile_layout.addWidget(QLabel(self.tr("Perfil:")))
+        self.profile_combo = QComboBox()
+        self.profile_combo.addItems(list(self.settings))
+        self.profile_combo.currentTextChanged.connect(self._show_profile)
+        profile_layout.addWidget(self.profile_combo)
+        profile_layout.addStretch()
+        layout.addLayout(profile_layout)
+
+        self.options_table = QTableWidget(0, 2)
+        self.options_table.setHorizontalHeaderLabels([self.tr("Opção"), self.tr("Valor")])
+        self.options_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.options_table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.options_table.verticalHeader().setVisible(False)
+        layout.addWidget(self.options_table)
+
+        rows_layout = QHBoxLayout()
+        self.add_button = QPushButton(self.tr("Adicionar Opção"))
+        self.add_button.clicked.connect(self._add_option)
+        self.remove_button = QPushButton(self.tr("Remover Opção"))
+        self.remove_button.clicked.connect(self._remove_option)
+        rows_layout.addWidget(self.add_button)
+        rows_layout.addWidget(self.remove_button)
+        rows_layout.addStretch()
+        layout.addLayout(rows_layout)
+
+        if config_path:
+            path_label = QLabel(f"{self.tr('Arquivo de configuração:')} {config_path}")
+            path_label.setWordWrap(True)
+            path_label.setStyleSheet("color: #666;")
+            layout.addWidget(path_label)
+
+        confirm_layout = QHBoxLayout()
+        self.save_button = QPushButton(self.tr("Salvar"))
+        self.save_button.clicked.connect(self._save)
+        self.cancel_button = QPushButton(self.tr("Cancelar"))
+        self.cancel_button.clicked.connect(self.reject)
+        confirm_layout.addStretch()
+        confirm_layout.addWidget(self.save_button)
+        confirm_layout.addWidget(self.cancel_button)
+        layout.addLayout(confirm_layout)
+
+        self.setLayout(layout)
+
+    def _show_profile(self, profile):
+        """Exibe as opções do perfil selecionado, guardando as edições do anterior"""
+        self._store_current()
+        self.current_profile = profile
+        options = self.settings.get(profile, {})
+        self.options_table.setRowCount(0)
+        for key, value in sorted(options.items()):
+            row = self.options_table.rowCount()
+            self.options_table.insertRow(row)
+            self.options_table.setItem(row, 0, QTableWidgetItem(str(key)))
+            self.options_table.setItem(row, 1, QTableWidgetItem(str(value)))
+
+    def _store_current(self):
+        """Guarda as opções da tabela no perfil exibido"""
+        if self.current_profile is None:
+            return
+        options = {}
+        for row in range(self.options_table.rowCount()):
+            key_item = self.options_table.item(row, 0)
+            value_item = self.options_table.item(row, 1)
+            key = key_item.text().strip().upper() if key_item else ''
+            value = value_item.text().strip() if value_item else ''
+            if key and value:
+                options[key] = value
+        self.settings[self.current_profile] = options
+
+    def _add_option(self):
+        """Adiciona uma linha vazia para uma nova opção"""
+        row = self.options_table.rowCount()
+        self.options_table.insertRow(row)
+        self.options_table.setItem(row, 0, QTableWidgetItem(""))
+        self.options_table.setItem(row, 1, QTableWidgetItem(""))
+        self.options_table.editItem(self.options_table.item(row, 0))
+
+    def _remove_option(self):
+        """Remove as opções selecionadas"""
+        rows = sorted({index.row() for index in self.options_table.selectedIndexes()}, reverse=True)
+        for row in rows:
+            self.options_table.removeRow(row)
+
+    def _save(self):
+        """Confirma as opções de todos os perfis"""
+        self._store_current()
+        self.accept()
+
+    def get_settings(self):
+        """Retorna as opções editadas de cada perfil"""
+        return self.settings
@@ -0,0 +1,160 @@
+from PyQt5.QtWidgets import QGroupBox, QVBoxLayout, QHBoxLayout, QWidget, QLabel, QComboBox, QProgressBar
+from PyQt5.QtCore import Qt, QRectF, pyqtSignal
+from PyQt5.QtGui import QPainter, QColor, QPen
+
+class HistogramChart(QWidget):
+    """Gráfico de barras simples de um histograma (desenhado com QPainter)"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.counts = None
+        self.edges = None
+        self.approximate = False
+        self.setMinimumHeight(140)
+
+    def set_histogram(self, counts, edges, approximate=False):
+        self.counts = counts
+        self.edges = edges
+        self.approximate = approximate
+        self.update()
+
+    def clear(self):
+        self.counts = None
+        self.edges = None
+        self.update()
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), QColor('#f0f0f0'))
+        painter.setPen(QPen(QColor('gray')))
+        painter.drawRect(self.rect().adjusted(0, 0, -1, -1))
+
+        if self.counts is None or len(self.counts) == 0 or self.counts.max() <= 0:
+            painter.end()
+            return
+
+        label_height = self.fontMetrics().height() + 4
+        plot = QRectF(self.rect().adjusted(4, 4, -4, -label_height))
+        peak = float(self.counts.max())
+        bar_width = plot.width() / len(self.counts)
+
+        # Aproximações em cinza, resultado exato em azul
+        color = QColor('#9e9e9e') if self.approximate else QColor('#1f77b4')
+        for i, count in enumerate(self.counts):
+            if count <= 0:
+                continue
+            bar_height = plot.height() * count / peak
+            painter.fillRect(QRectF(plot.left() + i * bar_width, plot.bottom() - bar_height,
+                                    max(bar_width, 1.0), bar_height), color)
+
+        painter.setPen(QPen(QColor('black')))
+        text_top = int(plot.bottom()) + 2
+        painter.drawText(4, text_top, self.width() // 2, label_height, Qt.AlignLeft,
+                         f"{self.edges[0]:.6g}")
+        painter.drawText(self.width() // 2, text_top, self.width() // 2 - 4, label_height, Qt.AlignRight,
+                         f"{self.edges[-1]:.6g}")
+        painter.end()
+
+class HistogramPanel(QGroupBox):
+    """Painel com o histograma de uma banda, atualizado progressivamente"""
+
+    # Sinal emitido com o índice (0-based) da banda escolhida
+    band_selected = pyqtSignal(int)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        layout = QVBoxLayout()
+
+        band_layout = QHBoxLayout()
+        self.band_label = QLabel()
+        self.band_combo = QComboBox()
+        self.band_combo.setEnabled(False)
+        self.band_combo.currentIndexChanged.connect(self._on_band_changed)
+        band_layout.addWidget(self.band_label)
+        band_layout.addWidget(self.band_combo, 1)
+
+        self.chart = HistogramChart()
+
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setTextVisible(False)
+        self.progress_bar.setMaximumHeight(8)
+        self.progress_bar.hide()
+
+        self.info_label = QLabel()
+        self.info_label.setWordWrap(True)
+
+        layout.addLayout(band_layout)
+        layout.addWidget(self.chart)
+        layout.addWidget(self.progress_bar)
+        layout.addWidget(self.info_label)
+        self.setLayout(layout)
+
+        self._status = None
+        self.retranslate()
+
+    def retranslate(self):
+        """Atualiza os textos do painel após troca de idioma"""
+        self.setTitle(self.tr("Histograma"))
+        self.band_label.setText(self.tr("Banda:"))
+        self._refresh_info()
+
+    def set_bands(self, band_names):
+        """Preenche a lista de bandas e seleciona a primeira"""
+        self.band_combo.blockSignals(True)
+        self.band_combo.clear()
+        self.band_combo.addItems(band_names)
+        self.band_combo.blockSignals(False)
+        self.band_combo.setEnabled(bool(band_names))
+        self.chart.clear()
+        if band_names:
+            self.band_combo.setCurrentIndex(0)
+            self.band_selected.emit(0)
+
+    def show_histogram(self, counts, edges, approximate, level=1, clipped=0):
+        """Exibe um histograma (aproximado ou exato)"""
+        self.chart.set_histogram(counts, edges, approximate)
+        if approximate:
+            self._status = ('approximate', level)
+        else:
+            self.progress_bar.hide()
+            self._status = ('exact', clipped)
+        self._refresh_info()
+
+    def show_progress(self, done, total):
+        """Exibe o progresso da passada em resolução total"""
+        self.progress_bar.setMaximum(max(1, total))
+        self.progress_bar.setValue(done)
+        self.progress_bar.show()
+
+    def show_loading(self):
+        self.chart.clear()
+        self.progress_bar.hide()
+        self._status = ('loading', None)
+        self._refresh_info()
+
+    def show_error(self, message):
+        self.progress_bar.hide()
+        self._status = ('error', message)
+        self._refresh_info()
+
+    def _refresh_info(self):
+        if self._status is None:
+            self.info_label.setText(self.tr("Carregue um raster para ver o histograma."))
+            return
+        kind, value = self._status
+        if kind == 'loading':
+            self.info_label.setText(self.tr("Calculando histograma..."))
+        elif kind == 'approximate':
+            self.info_label.setText(f"{self.tr('Aproximação (overview 1:')}{value}). "
+                                    f"{self.tr('Refinando com a resolução total...')}")
+        elif kind == 'exact':
+            text = self.tr("Exato (resolução total).")
+            if value:
+                text += f" {value} {self.tr('pixels fora do intervalo contados nas extremidades.')}"
+            self.info_label.setText(text)
+        else:
+            self.info_label.setText(f"{self.tr('Erro ao calcular histograma:')} {value}")
+
+    def _on_band_changed(self, index):
+        if index >= 0:
+            self.band_selected.emit(index)
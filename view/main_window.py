@@ -2,6 +2,9 @@ from PyQt5.QtWidgets import (
     QMainWindow, QAction, QMenuBar, QVBoxLayout, QHBoxLayout, QWidget, QPushButton, QLabel, QListWidget, QListWidgetItem, QMessageBox, QTextEdit, QSplitter, QGroupBox, QCheckBox
 )
 from view.band_reorder_window import BandReorderWindow
+from view.preview_label import PreviewLabel
+from view.histogram_panel import HistogramPanel
+from view.statistics_panel import StatisticsPanel
 from PyQt5.QtCore import Qt, QTranslator, QLocale, QLibraryInfo, QCoreApplication
 from PyQt5.QtGui import QPixmap, QImage, QIcon
 import os
@@ -55,6 +58,8 @@ class MainWindow(QMainWindow):
                 
                 self.action_portuguese.triggered.connect(lambda: self.switch_language('pt_BR'))
                 self.action_english.triggered.connect(lambda: self.switch_language('en'))
+                if menubar is not None:
+                    self._add_settings_menu(menubar)
             except Exception as e:
                 print(f"Erro ao criar menu: {e}")
                 self.action_portuguese = QAction(self.tr("Português"), self)
@@ -84,13 +89,27 @@ class MainWindow(QMainWindow):
                 self.preview_button.clicked.connect(self._generate_preview)
                 self.preview_button.setEnabled(False)
                 
-                self.preview_label = QLabel(self.tr("Selecione 1 a 3 bandas para preview"))
+                self.preview_label = PreviewLabel(self.tr("Selecione 1 a 3 bandas para preview"))
                 self.preview_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
                 self.preview_label.setMinimumHeight(200)
                 self.preview_label.setStyleSheet("border: 1px solid gray; background-color: #f0f0f0; color: black;")
+                self.preview_label.setToolTip(self.tr("Arraste sobre o preview para selecionar uma área de exportação"))
+                self.preview_label.region_selected.connect(self._on_preview_region_selected)
+                
+                self.clear_selection_button = QPushButton(self.tr("Limpar Seleção"))
+                self.clear_selection_button.clicked.connect(self._clear_preview_selection)
+                self.clear_selection_button.setEnabled(False)
+                
+                # Verificação de todos os pixels (o preview usa apenas uma amostra)
+                self.check_data_button = QPushButton(self.tr("Verificar Dados (Completo)"))
+                self.check_data_button.setToolTip(self.tr("Verifica NaN, infinitos e valores extremos em todos os pixels das bandas selecionadas"))
+                self.check_data_button.clicked.connect(self._check_data_issues)
+                self.check_data_button.setEnabled(False)
                 
                 preview_layout.addWidget(self.preview_button)
                 preview_layout.addWidget(self.preview_label)
+                preview_layout.addWidget(self.clear_selection_button)
+                preview_layout.addWidget(self.check_data_button)
                 preview_group.setLayout(preview_layout)
                 
                 self.export_button = QPushButton(self.tr("Exportar Selecionadas"))
@@ -130,7 +149,17 @@ class MainWindow(QMainWindow):
                 metadata_layout.addWidget(self.metadata_text)
                 metadata_group.setLayout(metadata_layout)
                 
+                # Histogram panel (computed in the background by the controller)
+                self.histogram_panel = HistogramPanel()
+                self.histogram_panel.band_selected.connect(self._on_histogram_band_selected)
+                
+                # Statistics panel (estimates first, refined in the background)
+                self.statistics_panel = StatisticsPanel()
+                self.statistics_panel.refresh_requested.connect(self._on_statistics_refresh)
+                
                 right_layout.addWidget(metadata_group)
+                right_layout.addWidget(self.histogram_panel)
+                right_layout.addWidget(self.statistics_panel)
                 right_layout.addStretch()  # Add stretch to push metadata to top
                 right_panel.setLayout(right_layout)
                 
@@ -163,6 +192,23 @@ class MainWindow(QMainWindow):
         else:
             QCoreApplication.instance().removeTranslator(self.translator)
 
+    def _add_settings_menu(self, menubar):
+        """Cria o menu de configurações"""
+        settings_menu = menubar.addMenu(self.tr("Configurações"))
+        self.action_gdal_env = QAction(self.tr("Ambiente GDAL..."), self)
+        self.action_gdal_env.triggered.connect(self._open_gdal_settings)
+        settings_menu.addAction(self.action_gdal_env)
+
+    def _open_gdal_settings(self):
+        """Método interno para abrir a configuração do ambiente GDAL"""
+        try:
+            if self.controller:
+                self.controller.open_gdal_settings()
+            else:
+                QMessageBox.warning(self, self.tr("Erro"), self.tr("Controller não inicializado"))
+        except Exception as e:
+            QMessageBox.critical(self, self.tr("Erro"), f"{self.tr('Erro na configuração do GDAL:')}\n{str(e)}")
+
     def switch_language(self, lang_code):
         """Alterna o idioma da interface e reinicializa os textos."""
         self._load_language(lang_code)
@@ -182,6 +228,7 @@ class MainWindow(QMainWindow):
             language_menu.addAction(self.action_english)
             self.action_portuguese.triggered.connect(lambda: self.switch_language('pt_BR'))
             self.action_english.triggered.connect(lambda: self.switch_language('en'))
+            self._add_settings_menu(menubar)
         self.open_button.setText(self.tr("Abrir Raster"))
         self.export_button.setText(self.tr("Exportar Selecionadas"))
         self.reorder_button.setText(self.tr("Reordenar Bandas"))
@@ -227,6 +274,14 @@ class MainWindow(QMainWindow):
                         preview_label = preview_layout.itemAt(1).widget()
                         if isinstance(preview_label, QLabel) and not preview_label.pixmap():
                             preview_label.setText(self.tr("Selecione 1 a 3 bandas para preview"))
+                        if isinstance(preview_label, QLabel):
+                            preview_label.setToolTip(self.tr("Arraste sobre o preview para selecionar uma área de exportação"))
+                        self.clear_selection_button.setText(self.tr("Limpar Seleção"))
+                        self.check_data_button.setText(self.tr("Verificar Dados (Completo)"))
+                        self.check_data_button.setToolTip(self.tr("Verifica NaN, infinitos e valores extremos em todos os pixels das bandas selecionadas"))
+        
+        self.histogram_panel.retranslate()
+        self.statistics_panel.retranslate()
         
         # Re-update metadata display if there's loaded data
         if hasattr(self, 'controller') and self.controller and hasattr(self.controller, 'meta') and self.controller.meta:
@@ -343,6 +398,7 @@ class MainWindow(QMainWindow):
             
             self.preview_label.setPixmap(scaled_pixmap)
             self.preview_label.setText("")  # Clear text
+            self.preview_label.clear_selection()
             
         except Exception as e:
             self.preview_label.setText(f"{self.tr('Erro ao exibir preview:')} {str(e)}")
@@ -367,6 +423,47 @@ class MainWindow(QMainWindow):
         except Exception as e:
             QMessageBox.critical(self, self.tr("Erro"), f"{self.tr('Erro ao gerar preview:')}\n{str(e)}")
 
+    def _on_preview_region_selected(self, x0, y0, x1, y1):
+        """Método interno chamado quando uma área é selecionada no preview"""
+        try:
+            if self.controller:
+                self.controller.select_preview_region(x0, y0, x1, y1)
+        except Exception as e:
+            QMessageBox.critical(self, self.tr("Erro"), f"{self.tr('Erro ao selecionar área:')}\n{str(e)}")
+
+    def _clear_preview_selection(self):
+        """Método interno para limpar a área selecionada"""
+        try:
+            self.preview_label.clear_selection()
+            if self.controller:
+                self.controller.clear_subset()
+        except Exception as e:
+            QMessageBox.critical(self, self.tr("Erro"), f"{self.tr('Erro ao selecionar área:')}\n{str(e)}")
+
+    def _check_data_issues(self):
+        """Método interno para verificar os dados em todos os pixels (em segundo plano)"""
+        try:
+            if self.controller:
+                self.controller.scan_data_issues()
+        except Exception as e:
+            QMessageBox.critical(self, self.tr("Erro"), f"{self.tr('Erro na verificação completa:')}\n{str(e)}")
+
+    def _on_histogram_band_selected(self, band_index):
+        """Método interno chamado quando uma banda é escolhida no painel de histograma"""
+        try:
+            if self.controller:
+                self.controller.show_histogram(band_index)
+        except Exception as e:
+            QMessageBox.critical(self, self.tr("Erro"), f"{self.tr('Erro ao calcular histograma:')}\n{str(e)}")
+
+    def _on_statistics_refresh(self, write_tags):
+        """Método interno para recalcular as estatísticas das bandas"""
+        try:
+            if self.controller:
+                self.controller.show_statistics(write_tags)
+        except Exception as e:
+            QMessageBox.critical(self, self.tr("Erro"), f"{self.tr('Erro ao calcular estatísticas:')}\n{str(e)}")
+
     def _export_selected_bands(self):
         """Método interno para exportar bandas selecionadas"""
         try:
@@ -404,6 +501,9 @@ class MainWindow(QMainWindow):
     def closeEvent(self, event):
         """Tratamento do evento de fechamento da janela"""
         try:
+            # Interrompe as tarefas em segundo plano antes de fechar
+            if self.controller and hasattr(self.controller, 'cancel_background_tasks'):
+                self.controller.cancel_background_tasks()
             event.accept()
         except Exception as e:
             print(f"Erro ao fechar janela: {e}")
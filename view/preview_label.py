@@ -0,0 +1,63 @@
+from PyQt5.QtWidgets import QLabel, QRubberBand
+from PyQt5.QtCore import Qt, QRect, QSize, pyqtSignal
+
+class PreviewLabel(QLabel):
+    """Label de preview que permite selecionar uma área com o mouse (rubber band)"""
+
+    # Sinal emitido com a área selecionada, normalizada (0-1) em relação à imagem exibida:
+    # (x0, y0, x1, y1)
+    region_selected = pyqtSignal(float, float, float, float)
+
+    # Tamanho mínimo (em pixels de tela) para considerar uma seleção válida
+    MIN_SELECTION_SIZE = 4
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._rubber_band = QRubberBand(QRubberBand.Rectangle, self)
+        self._origin = None
+
+    def _image_rect(self):
+        """Retorna o retângulo ocupado pela imagem (centralizada) dentro do label"""
+        pixmap = self.pixmap()
+        if pixmap is None or pixmap.isNull():
+            return None
+        x = (self.width() - pixmap.width()) // 2
+        y = (self.height() - pixmap.height()) // 2
+        return QRect(x, y, pixmap.width(), pixmap.height())
+
+    def clear_selection(self):
+        """Remove o retângulo de seleção exibido"""
+        self._rubber_band.hide()
+        self._origin = None
+
+    def mousePressEvent(self, event):
+        image_rect = self._image_rect()
+        if event.button() == Qt.LeftButton and image_rect is not None and image_rect.contains(event.pos()):
+            self._origin = event.pos()
+            self._rubber_band.setGeometry(QRect(self._origin, QSize()))
+            self._rubber_band.show()
+        super().mousePressEvent(event)
+
+    def mouseMoveEvent(self, event):
+        if self._origin is not None:
+            self._rubber_band.setGeometry(QRect(self._origin, event.pos()).normalized())
+        super().mouseMoveEvent(event)
+
+    def mouseReleaseEvent(self, event):
+        image_rect = self._image_rect()
+        if self._origin is not None and event.button() == Qt.LeftButton and image_rect is not None:
+            selection = QRect(self._origin, event.pos()).normalized().intersected(image_rect)
+            self._origin = None
+
+            if selection.width() < self.MIN_SELECTION_SIZE or selection.height() < self.MIN_SELECTION_SIZE:
+                self._rubber_band.hide()
+            else:
+                self._rubber_band.setGeometry(selection)
+                offset = selection.topLeft() - image_rect.topLeft()
+                self.region_selected.emit(
+                    offset.x() / image_rect.width(),
+                    offset.y() / image_rect.height(),
+                    (offset.x() + selection.width()) / image_rect.width(),
+                    (offset.y() + selection.height()) / image_rect.height()
+                )
+        super().mouseReleaseEvent(event)
@@ -0,0 +1,121 @@
+from PyQt5.QtWidgets import (
+    QGroupBox, QVBoxLayout, QHBoxLayout, QLabel, QTableWidget, QTableWidgetItem,
+    QHeaderView, QCheckBox, QPushButton, QAbstractItemView
+)
+from PyQt5.QtCore import Qt, pyqtSignal
+from PyQt5.QtGui import QColor, QFont
+
+class StatisticsPanel(QGroupBox):
+    """Painel com as estatísticas das bandas: estimativas rápidas refinadas até os valores exatos"""
+
+    # Sinal emitido para recalcular as estatísticas (com a opção de gravar as tags GDAL)
+    refresh_requested = pyqtSignal(bool)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        layout = QVBoxLayout()
+
+        self.table = QTableWidget(0, 6)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.setSelectionMode(QAbstractItemView.NoSelection)
+        self.table.verticalHeader().setVisible(False)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        self.table.setMinimumHeight(120)
+
+        options_layout = QHBoxLayout()
+        self.write_tags_checkbox = QCheckBox()
+        self.refresh_button = QPushButton()
+        self.refresh_button.setEnabled(False)
+        self.refresh_button.clicked.connect(self._on_refresh)
+        options_layout.addWidget(self.write_tags_checkbox, 1)
+        options_layout.addWidget(self.refresh_button)
+
+        self.info_label = QLabel()
+        self.info_label.setWordWrap(True)
+
+        layout.addWidget(self.table)
+        layout.addLayout(options_layout)
+        layout.addWidget(self.info_label)
+        self.setLayout(layout)
+
+        # Estatísticas exibidas por linha, para retraduzir a coluna de confiança
+        self._rows = {}
+        self.retranslate()
+
+    def retranslate(self):
+        """Atualiza os textos do painel após troca de idioma"""
+        self.setTitle(self.tr("Estatísticas das Bandas"))
+        self.table.setHorizontalHeaderLabels([
+            self.tr("Banda"), self.tr("Mín"), self.tr("Máx"), self.tr("Média"),
+            self.tr("Desvio Padrão"), self.tr("Confiança")
+        ])
+        self.write_tags_checkbox.setText(self.tr("Gravar no arquivo (tags de estatísticas GDAL)"))
+        self.refresh_button.setText(self.tr("Recalcular"))
+        for row, stats in self._rows.items():
+            self._set_confidence(row, *stats)
+        if not self._rows:
+            self.info_label.setText(self.tr("Carregue um raster para ver as estatísticas."))
+
+    @property
+    def write_tags(self):
+        return self.write_tags_checkbox.isChecked()
+
+    def set_bands(self, band_names):
+        """Prepara uma linha por banda"""
+        self._rows = {}
+        self.table.setRowCount(len(band_names))
+        for row, name in enumerate(band_names):
+            self.table.setItem(row, 0, QTableWidgetItem(name))
+            for column in range(1, 6):
+                self.table.setItem(row, column, QTableWidgetItem("..."))
+        self.refresh_button.setEnabled(bool(band_names))
+        self.info_label.setText(self.tr("Calculando estimativas..."))
+
+    def show_statistics(self, band_index, minimum, maximum, mean, std, approximate, source, coverage, mean_margin):
+        """Exibe as estatísticas (estimadas ou exatas) de uma banda"""
+        if band_index < 0 or band_index >= self.table.rowCount():
+            return
+        values = [minimum, maximum, mean, std]
+        font = QFont()
+        font.setItalic(approximate)
+        color = QColor('gray') if approximate else QColor('black')
+        for column, value in enumerate(values, start=1):
+            item = QTableWidgetItem("-" if value is None else f"{value:.6g}")
+            item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+            item.setFont(font)
+            item.setForeground(color)
+            self.table.setItem(band_index, column, item)
+        self._rows[band_index] = (approximate, source, coverage, mean_margin)
+        self._set_confidence(band_index, approximate, source, coverage, mean_margin)
+
+    def show_completed(self, tags_written):
+        if tags_written:
+            self.info_label.setText(self.tr("Estatísticas exatas gravadas no arquivo."))
+        else:
+            self.info_label.setText(self.tr("Estatísticas exatas calculadas."))
+
+    def show_progress(self, done, total):
+        self.info_label.setText(f"{self.tr('Refinando estatísticas...')} {100 * done // max(1, total)}%")
+
+    def show_error(self, message):
+        self.info_label.setText(f"{self.tr('Erro ao calcular estatísticas:')} {message}")
+
+    def _set_confidence(self, row, approximate, source, coverage, mean_margin):
+        percent = f"{100 * coverage:.0f}%"
+        if source == 'tags':
+            text = self.tr("Exato (tags GDAL)")
+        elif not approximate:
+            text = self.tr("Exato")
+        elif source == 'overview':
+            text = f"{self.tr('Estimativa (overview)')} ±{mean_margin:.3g}"
+        elif source == 'blocks':
+            text = f"{self.tr('Estimativa (amostra de blocos')} {percent}) ±{mean_margin:.3g}"
+        else:
+            text = f"{self.tr('Refinando')} ({percent}) ±{mean_margin:.3g}"
+        item = QTableWidgetItem(text)
+        item.setToolTip(self.tr("± indica a margem de 95% da média estimada"))
+        self.table.setItem(row, 5, item)
+
+    def _on_refresh(self):
+        self.refresh_requested.emit(self.write_tags)